@@ -6,7 +6,8 @@
 
 import json
 import os
-from typing import Dict, Any, Optional, List
+import time
+from typing import Dict, Any, Optional, List, AsyncIterator, Tuple
 from dotenv import load_dotenv
 
 # 加载环境变量
@@ -20,9 +21,13 @@ from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.documents import Document
 from langchain_core.output_parsers import JsonOutputParser
 from langchain_core.runnables import RunnablePassthrough
-from langchain_dashscope import ChatDashScope
 
+from app.core.llm import AsyncChatDashScope
+from app.core.llm_gateway import LLMError
 from app.core.vector_store import SurveyVectorStore
+from app.utils.json_stream import IncrementalSurveyParser
+from app.utils.async_storage import run_io
+from app.utils.llm_cache import llm_response_cache, make_cache_key
 
 
 class SurveyCreationChain:
@@ -59,8 +64,8 @@ class SurveyCreationChain:
         else:
             self.vector_store = vector_store
         
-        # 初始化DashScope LLM
-        self.llm = ChatDashScope(
+        # 初始化DashScope LLM（支持原生异步调用）
+        self.llm = AsyncChatDashScope(
             model=llm_model,
             temperature=temperature
         )
@@ -409,37 +414,31 @@ class SurveyCreationChain:
         # 获取格式指令
         format_instructions = self.output_parser.get_format_instructions()
         
-        # 创建Runnable链
-        chain = (
+        # 启用缓存时检索上下文在链外预先取得（参与计算缓存键），链内不再重复检索
+        self._retrieve_prompt_context = retrieve_context
+        
+        # 检索 + 提示词部分（流式生成直接在其后接 LLM，逐块解析输出）
+        self.prompt_chain = (
             RunnablePassthrough.assign(
-                retrieved_context=lambda x: retrieve_context(x["user_input"]),
+                retrieved_context=lambda x: x.get("retrieved_context") or retrieve_context(x["user_input"]),
             )
             | RunnablePassthrough.assign(
                 format_instructions=lambda x: format_instructions
             )
             | self.prompt_template
-            | self.llm
-            | self.output_parser
         )
         
+        # 创建Runnable链
+        chain = self.prompt_chain | self.llm | self.output_parser
+        
         return chain
     
-    def generate_survey(
+    def _prepare_input(
         self,
         user_input: str,
         additional_context: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
-        """
-        生成问卷
-        
-        Args:
-            user_input: 用户输入的主题和需求
-            additional_context: 额外的上下文信息（可选）
-            
-        Returns:
-            生成的问卷（字典格式）
-        """
-        # 准备输入
+        """准备链的输入（用户需求 + 额外上下文）"""
         input_data = {
             "user_input": user_input
         }
@@ -451,46 +450,174 @@ class SurveyCreationChain:
                 context_str += f"- {key}: {value}\n"
             input_data["user_input"] += context_str
         
+        return input_data
+    
+    @staticmethod
+    def _check_result(result: Any) -> Dict[str, Any]:
+        """验证链的输出"""
+        if not result or not isinstance(result, dict):
+            raise ValueError("链返回结果不是有效的字典")
+        
+        # 确保有必需的字段
+        if 'questions' not in result:
+            raise ValueError("结果中缺少 'questions' 字段")
+        
+        return result
+    
+    def _create_fallback_chain(self):
+        """备用链：不经过 JsonOutputParser，由自定义解析器修复并解析 LLM 原始输出"""
+        return (
+            RunnablePassthrough.assign(
+                retrieved_context=lambda x: x.get("retrieved_context") or self._retrieve_context(x["user_input"]),
+            )
+            | RunnablePassthrough.assign(
+                format_instructions=lambda x: self.output_parser.get_format_instructions()
+            )
+            | self.prompt_template
+            | self.llm
+        )
+    
+    def _lookup_cache(self, input_data: Dict[str, Any]) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """
+        预先检索上下文并查询LLM响应缓存
+        
+        缓存键包含规范化的需求、模型、温度和检索上下文的摘要，知识库内容变化后不会命中旧结果。
+        
+        Returns:
+            (缓存键, 缓存的问卷或 None)
+        """
+        input_data["retrieved_context"] = self._retrieve_prompt_context(input_data["user_input"])
+        cache_key = make_cache_key(
+            "survey",
+            input_data["user_input"],
+            self.llm.model,
+            self.llm.temperature,
+            input_data["retrieved_context"]
+        )
+        cached = llm_response_cache.get_json(cache_key)
+        if isinstance(cached, dict) and cached.get("questions"):
+            print(f"[OK] 命中LLM缓存，复用已生成的 {len(cached['questions'])} 个问题")
+            return cache_key, cached
+        return cache_key, None
+    
+    def _parse_fallback_response(self, response: Any) -> Dict[str, Any]:
+        if hasattr(response, 'content'):
+            return self.custom_parser.parse(response.content)
+        return self.custom_parser.parse(str(response))
+    
+    def generate_survey(
+        self,
+        user_input: str,
+        additional_context: Optional[Dict[str, Any]] = None,
+        use_cache: bool = False
+    ) -> Dict[str, Any]:
+        """
+        生成问卷
+        
+        Args:
+            user_input: 用户输入的主题和需求
+            additional_context: 额外的上下文信息（可选）
+            use_cache: 是否使用LLM响应缓存（相同需求和检索上下文直接复用已生成的问卷）
+            
+        Returns:
+            生成的问卷（字典格式）
+        """
+        input_data = self._prepare_input(user_input, additional_context)
+        
+        if not use_cache:
+            return self._generate(input_data)
+        
+        cache_key, cached = self._lookup_cache(input_data)
+        if cached is not None:
+            return cached
+        start = time.perf_counter()
+        result = self._generate(input_data)
+        llm_response_cache.put_json(cache_key, result, "survey", time.perf_counter() - start)
+        return result
+    
+    def _generate(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """执行生成链，失败时使用备用链"""
         try:
             # 运行链
             print("执行生成链...")
-            result = self.chain.invoke(input_data)
+            result = self._check_result(self.chain.invoke(input_data))
+            print(f"[OK] 链执行成功，生成了 {len(result.get('questions', []))} 个问题")
+            return result
             
-            # 验证结果
-            if not result or not isinstance(result, dict):
-                raise ValueError("链返回结果不是有效的字典")
+        except LLMError:
+            # 调用本身失败（网关已按需重试），备用链也是同一个模型，不再尝试
+            raise
+        except Exception as e:
+            print(f"\n[ERROR] 链执行错误: {e}")
+            print("尝试备用方案...")
             
-            # 确保有必需的字段
-            if 'questions' not in result:
-                raise ValueError("结果中缺少 'questions' 字段")
+            try:
+                # 如果链执行失败，尝试直接调用LLM并手动解析
+                print("调用备用LLM链...")
+                response = self._create_fallback_chain().invoke(input_data)
+                result = self._parse_fallback_response(response)
+                
+                print(f"[OK] 备用方案成功，生成了 {len(result.get('questions', []))} 个问题")
+                return result
+                
+            except Exception as e2:
+                print(f"\n[ERROR] 备用方案也失败了: {e2}")
+                raise
+    
+    async def agenerate_survey(
+        self,
+        user_input: str,
+        additional_context: Optional[Dict[str, Any]] = None,
+        use_cache: bool = False
+    ) -> Dict[str, Any]:
+        """
+        生成问卷（异步版本）
+        
+        LLM 调用走 AsyncChatDashScope 的原生异步接口，不占用线程池；
+        向量检索等同步步骤由 LangChain 放到线程池执行，不阻塞事件循环。
+        多个请求可以在同一个事件循环中并发生成。
+        
+        Args:
+            user_input: 用户输入的主题和需求
+            additional_context: 额外的上下文信息（可选）
+            use_cache: 是否使用LLM响应缓存
             
+        Returns:
+            生成的问卷（字典格式）
+        """
+        input_data = self._prepare_input(user_input, additional_context)
+        
+        if not use_cache:
+            return await self._agenerate(input_data)
+        
+        # 检索和缓存读写都是阻塞IO，放到线程中执行
+        cache_key, cached = await run_io(self._lookup_cache, input_data)
+        if cached is not None:
+            return cached
+        start = time.perf_counter()
+        result = await self._agenerate(input_data)
+        await run_io(llm_response_cache.put_json, cache_key, result, "survey", time.perf_counter() - start)
+        return result
+    
+    async def _agenerate(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """执行生成链，失败时使用备用链（异步版本）"""
+        try:
+            print("执行生成链（异步）...")
+            result = self._check_result(await self.chain.ainvoke(input_data))
             print(f"[OK] 链执行成功，生成了 {len(result.get('questions', []))} 个问题")
             return result
             
+        except LLMError:
+            # 调用本身失败（网关已按需重试），备用链也是同一个模型，不再尝试
+            raise
         except Exception as e:
             print(f"\n[ERROR] 链执行错误: {e}")
             print("尝试备用方案...")
             
             try:
-                # 如果链执行失败，尝试直接调用LLM并手动解析
-                llm_chain = (
-                    RunnablePassthrough.assign(
-                        retrieved_context=lambda x: self._retrieve_context(x["user_input"]),
-                    )
-                    | RunnablePassthrough.assign(
-                        format_instructions=lambda x: self.output_parser.get_format_instructions()
-                    )
-                    | self.prompt_template
-                    | self.llm
-                )
-                
                 print("调用备用LLM链...")
-                response = llm_chain.invoke(input_data)
-                
-                if hasattr(response, 'content'):
-                    result = self.custom_parser.parse(response.content)
-                else:
-                    result = self.custom_parser.parse(str(response))
+                response = await self._create_fallback_chain().ainvoke(input_data)
+                result = self._parse_fallback_response(response)
                 
                 print(f"[OK] 备用方案成功，生成了 {len(result.get('questions', []))} 个问题")
                 return result
@@ -499,6 +626,62 @@ class SurveyCreationChain:
                 print(f"\n[ERROR] 备用方案也失败了: {e2}")
                 raise
     
+    async def astream_survey(
+        self,
+        user_input: str,
+        additional_context: Optional[Dict[str, Any]] = None,
+        use_cache: bool = False
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        流式生成问卷
+        
+        LLM 输出逐块送入增量解析器，顶层字段和每个问题对象一完成就产出，
+        不必等待整份问卷生成完毕。
+        
+        Args:
+            user_input: 用户输入的主题和需求
+            additional_context: 额外的上下文信息（可选）
+            use_cache: 是否使用LLM响应缓存（命中时按相同的事件顺序回放缓存的问卷）
+            
+        Yields:
+            ("field", (字段名, 值))、("question", 问题字典)，最后是 ("complete", 完整问卷)
+        """
+        input_data = self._prepare_input(user_input, additional_context)
+        
+        cache_key = None
+        if use_cache:
+            cache_key, cached = await run_io(self._lookup_cache, input_data)
+            if cached is not None:
+                for key, value in cached.items():
+                    if key != "questions" and not isinstance(value, (dict, list)):
+                        yield "field", (key, value)
+                for question in cached["questions"]:
+                    yield "question", question
+                yield "complete", cached
+                return
+        
+        parser = IncrementalSurveyParser()
+        start = time.perf_counter()
+        
+        print("执行生成链（流式）...")
+        async for chunk in (self.prompt_chain | self.llm).astream(input_data):
+            content = chunk.content if hasattr(chunk, 'content') else str(chunk)
+            if not content:
+                continue
+            for event in parser.feed(content):
+                yield event
+        
+        # 流结束后完整解析一次；容错解析失败时交给自定义解析器修复
+        result = parser.result()
+        if result is None:
+            print("[WARN] 流式输出无法直接解析，使用自定义解析器修复...")
+            result = self.custom_parser.parse(parser.text)
+        result = self._check_result(result)
+        print(f"[OK] 流式生成完成，生成了 {len(result.get('questions', []))} 个问题")
+        if cache_key is not None:
+            await run_io(llm_response_cache.put_json, cache_key, result, "survey", time.perf_counter() - start)
+        yield "complete", result
+    
     def _retrieve_context(self, user_input: str) -> str:
         """从向量库检索相关上下文"""
         try:
@@ -0,0 +1,172 @@
+"""
+DashScope 对话模型的原生异步实现
+
+langchain_dashscope 的 ChatDashScope 只实现了同步调用：
+- ainvoke 退化为在默认线程池中执行同步 HTTP 请求，并发生成受线程池大小限制
+- astream 在事件循环中逐块读取同步迭代器，每读一块都会阻塞事件循环
+
+AsyncChatDashScope 用 dashscope.AioGeneration（aiohttp）实现 _agenerate / _astream，
+dashscope 版本过旧没有 AioGeneration 时退回线程池执行。
+同步、异步和流式调用都经过进程内共享的 LLM 网关（并发/速率控制、重试、结构化错误，见 llm_gateway）。
+"""
+
+import asyncio
+from functools import partial
+from http import HTTPStatus
+from typing import Any, AsyncIterator, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_dashscope import ChatDashScope
+from langchain_dashscope.aigc_generation import (
+    _convert_delta_to_message_chunk,
+    _convert_dict_to_message,
+    _convert_message_to_dict,
+)
+
+from app.core.llm_gateway import error_from_status, llm_gateway
+
+try:
+    from dashscope import AioGeneration
+except ImportError:
+    AioGeneration = None
+
+
+def _raise_for_status(response, model: str):
+    """按状态码/错误码抛出对应的 LLMError（消息格式与 ChatDashScope 同步调用相同）"""
+    if response.status_code != HTTPStatus.OK:
+        raise error_from_status(
+            int(response.status_code),
+            response.code,
+            'Request id: %s, Status code: %s, error code: %s, error message: %s' % (
+                response.request_id, response.status_code,
+                response.code, response.message
+            ),
+            model=model,
+            request_id=response.request_id
+        )
+
+
+class AsyncChatDashScope(ChatDashScope):
+    """支持原生异步调用的 ChatDashScope"""
+
+    def _call_params(self, stop: Optional[List[str]], stream: bool, **kwargs: Any) -> dict:
+        params = self.get_model_kwargs()
+        params.update(kwargs)
+        params.update({"result_format": "message", "stream": stream})
+        if stream:
+            # 流式调用始终使用增量输出
+            params.update({"incremental_output": True})
+        if stop is not None:
+            params.update({"stop": stop})
+        return params
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return llm_gateway.call(
+            self.model,
+            partial(ChatDashScope._generate, self, messages, stop=stop, run_manager=run_manager, **kwargs)
+        )
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return await llm_gateway.acall(
+            self.model,
+            partial(self._agenerate_once, messages, stop=stop, run_manager=run_manager, **kwargs)
+        )
+
+    async def _agenerate_once(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if AioGeneration is None:
+            # 直接调用父类的同步实现（_generate 已经过网关，避免重复占用名额）
+            return await asyncio.get_running_loop().run_in_executor(
+                None, partial(ChatDashScope._generate, self, messages, stop=stop, **kwargs)
+            )
+
+        response = await AioGeneration.call(
+            messages=[_convert_message_to_dict(m) for m in messages],
+            **self._call_params(stop, stream=False, **kwargs)
+        )
+        _raise_for_status(response, self.model)
+
+        if not isinstance(response, dict):
+            response = response.dict()
+        output = response["output"] if "output" in response and isinstance(response["output"], dict) else {}
+        generation_info = dict(finish_reason=output.get("finish_reason"))
+        generations = [
+            ChatGeneration(message=_convert_dict_to_message(choice["message"]), generation_info=generation_info)
+            for choice in output["choices"]
+        ]
+        llm_output = {
+            "request_id": response.get("request_id"),
+            "created": response.get("created"),
+            "token_usage": response.get("usage", {}),
+            "model_name": self.model,
+        }
+        return ChatResult(generations=generations, llm_output=llm_output)
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        async for chunk in llm_gateway.astream(
+            self.model,
+            partial(self._astream_once, messages, stop=stop, run_manager=run_manager, **kwargs)
+        ):
+            yield chunk
+
+    async def _astream_once(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        if AioGeneration is None:
+            # BaseChatModel 的默认实现：在线程池中逐块读取同步流，不阻塞事件循环
+            async for chunk in BaseChatModel._astream(self, messages, stop=stop, run_manager=run_manager, **kwargs):
+                yield chunk
+            return
+
+        responses = await AioGeneration.call(
+            messages=[_convert_message_to_dict(m) for m in messages],
+            **self._call_params(stop, stream=True, **kwargs)
+        )
+        default_chunk_class = AIMessageChunk
+        async for response in responses:
+            _raise_for_status(response, self.model)
+            if not isinstance(response, dict):
+                response = response.dict()
+            output = response["output"] if "output" in response and isinstance(response["output"], dict) else {}
+            if not output.get("choices"):
+                continue
+            choice = output["choices"][0]
+            message_chunk = _convert_delta_to_message_chunk(choice["message"], default_chunk_class)
+            default_chunk_class = message_chunk.__class__
+            generation_info = {}
+            if finish_reason := choice.get("finish_reason"):
+                generation_info["finish_reason"] = finish_reason
+            chunk = ChatGenerationChunk(message=message_chunk, generation_info=generation_info or None)
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
@@ -0,0 +1,543 @@
+"""
+LLM 调用网关
+进程内所有 DashScope 对话调用共用的并发与限流控制（AsyncChatDashScope 的同步、异步、流式调用都经过这里）：
+- 按模型的并发上限：同步调用（线程）和异步调用（协程）排同一个先来先服务队列
+- 令牌桶限速：按模型限制每秒请求数，允许一定突发
+- AIMD：遇到限流（429/Throttling）时并发上限和请求速率减半，之后每次成功缓慢回升，
+  使吞吐稳定在服务端限额附近，而不是在空闲和被限流之间来回震荡
+- 重试：限流、超时、网络和服务端错误按带抖动的指数退避重试；流式调用只在尚未产出内容时重试
+- 结构化错误：失败统一转换为 LLMError 子类，调用方按类型处理，不再匹配错误消息字符串
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    from aiohttp import ClientError as _AioClientError
+    _NETWORK_ERRORS = (OSError, _AioClientError)
+except ImportError:
+    _NETWORK_ERRORS = (OSError,)
+
+
+# ==========================================
+# 结构化错误
+# ==========================================
+
+class LLMError(Exception):
+    """LLM 调用失败
+
+    Attributes:
+        model: 模型名称
+        status_code: 服务端返回的 HTTP 状态码（网络错误等为 None）
+        code: 服务端错误码（如 Throttling、InvalidApiKey）
+        request_id: 服务端请求ID
+    """
+
+    retryable = False
+    http_status = 502
+    user_message = "调用大模型服务失败，请稍后重试"
+
+    def __init__(
+        self,
+        message: str,
+        model: str = "",
+        status_code: Optional[int] = None,
+        code: Optional[str] = None,
+        request_id: Optional[str] = None
+    ):
+        super().__init__(message)
+        self.model = model
+        self.status_code = status_code
+        self.code = code
+        self.request_id = request_id
+
+
+class LLMRateLimitError(LLMError):
+    """请求频率超过限额（429 / Throttling）"""
+    retryable = True
+    http_status = 429
+    user_message = "API请求频率过高，请稍等片刻后重试"
+
+
+class LLMQuotaError(LLMError):
+    """配额用完或账户欠费"""
+    http_status = 403
+
+    @property
+    def user_message(self) -> str:
+        if "free" in str(self).lower():
+            return ("API免费配额已用完。请前往阿里云DashScope控制台升级到付费套餐，或等待配额重置。\n\n"
+                    "解决方案：\n1. 访问 https://dashscope.console.aliyun.com/ 查看配额使用情况\n"
+                    "2. 升级到付费套餐以继续使用\n3. 免费配额通常每月重置，请稍后再试")
+        return "API配额已用完。请前往阿里云DashScope控制台查看配额使用情况并升级套餐。"
+
+
+class LLMAuthError(LLMError):
+    """API Key 缺失或无效"""
+    http_status = 401
+    user_message = "API认证失败，请检查 .env 文件中的 DASHSCOPE_API_KEY 是否正确"
+
+
+class LLMBadRequestError(LLMError):
+    """请求被拒绝（参数错误、内容审核未通过等），重试不会成功"""
+    http_status = 400
+    user_message = "请求被大模型服务拒绝（参数错误或内容审核未通过），请调整输入后重试"
+
+
+class LLMTimeoutError(LLMError):
+    """请求超时"""
+    retryable = True
+    http_status = 504
+    user_message = "请求超时，请稍后重试或尝试更短的提示词"
+
+
+class LLMConnectionError(LLMError):
+    """网络连接失败"""
+    retryable = True
+    http_status = 503
+    user_message = "网络连接失败，请检查网络连接或稍后重试"
+
+
+class LLMServerError(LLMError):
+    """服务端错误（5xx）"""
+    retryable = True
+    http_status = 502
+    user_message = "大模型服务暂时不可用，请稍后重试"
+
+
+class LLMBusyError(LLMError):
+    """网关排队超时（本进程内同一模型的调用过多）"""
+    http_status = 503
+    user_message = "当前生成和分析任务较多，请稍后重试"
+
+
+# langchain_dashscope 和 AsyncChatDashScope 的错误消息格式
+_STATUS_PATTERN = re.compile(
+    r"Request id: (?P<request_id>[^,]*), Status code: (?P<status>\d+), error code: (?P<code>[^,]*),"
+)
+
+
+def error_from_status(
+    status_code: int,
+    code: Optional[str],
+    message: str,
+    model: str = "",
+    request_id: Optional[str] = None
+) -> LLMError:
+    """按服务端状态码和错误码构造对应的错误类型"""
+    code = code or ""
+    if status_code == 429 or code.startswith("Throttling"):
+        cls = LLMRateLimitError
+    elif status_code == 403 or code.startswith("AllocationQuota") or code == "Arrearage":
+        cls = LLMQuotaError
+    elif status_code == 401 or code == "InvalidApiKey":
+        cls = LLMAuthError
+    elif status_code in (408, 504) or "Timeout" in code or "TimeOut" in code:
+        cls = LLMTimeoutError
+    elif status_code >= 500:
+        cls = LLMServerError
+    elif status_code >= 400:
+        cls = LLMBadRequestError
+    else:
+        cls = LLMError
+    return cls(message, model=model, status_code=status_code, code=code or None, request_id=request_id)
+
+
+def classify_error(error: BaseException, model: str = "") -> Optional[LLMError]:
+    """把底层异常转换为 LLMError；与 LLM 调用无关的异常（如解析错误）返回 None"""
+    if isinstance(error, LLMError):
+        return error
+    message = str(error)
+    match = _STATUS_PATTERN.search(message)
+    if match:
+        return error_from_status(
+            int(match.group("status")), match.group("code").strip(), message, model,
+            match.group("request_id").strip() or None
+        )
+    # TimeoutError 是 OSError 的子类，先于网络错误判断
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError)) or "Timeout" in type(error).__name__:
+        return LLMTimeoutError(message or "请求超时", model=model)
+    if isinstance(error, _NETWORK_ERRORS):
+        return LLMConnectionError(message or type(error).__name__, model=model)
+    return None
+
+
+# ==========================================
+# 按模型的并发与速率控制
+# ==========================================
+
+class ModelLimiter:
+    """单个模型的并发上限 + 令牌桶，两者都按 AIMD 调整
+
+    等待队列中的同步调用方用 threading.Event、异步调用方用所在事件循环的 Future，
+    释放名额时按先来先服务的顺序直接移交给下一个等待者。
+    """
+
+    def __init__(
+        self,
+        model: str,
+        max_concurrency: int = 8,
+        min_concurrency: int = 1,
+        rate_per_second: float = 10.0,
+        burst: Optional[float] = None
+    ):
+        """
+        Args:
+            model: 模型名称
+            max_concurrency: 并发上限（AIMD 回升的上限）
+            min_concurrency: AIMD 减小后的最低并发数
+            rate_per_second: 每秒请求数上限（<= 0 表示不限速）
+            burst: 令牌桶容量（默认与每秒请求数相同，至少为1）
+        """
+        self.model = model
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.limit = float(self.max_concurrency)
+        self.max_rate = max(0.0, rate_per_second)
+        self.min_rate = min(0.2, self.max_rate)
+        self.rate = self.max_rate
+        self.burst = max(1.0, burst if burst is not None else self.max_rate)
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waiters: deque = deque()
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        # 最近一次乘性减小的时间：在此之前发出的请求被限流不再减小（同一波请求只减小一次）
+        self._last_decrease = 0.0
+        self._counters = {
+            "calls": 0, "successes": 0, "failures": 0, "retries": 0,
+            "throttled": 0, "busy_rejections": 0
+        }
+        self._wait_seconds = 0.0
+        self._max_in_flight = 0
+
+    def _capacity(self) -> int:
+        return max(1, int(self.limit))
+
+    def _take_slot(self):
+        """占用一个名额（调用方持有锁）"""
+        self._in_flight += 1
+        self._counters["calls"] += 1
+        self._max_in_flight = max(self._max_in_flight, self._in_flight)
+
+    def _wake(self):
+        """把空出的名额按顺序移交给等待者（调用方持有锁）"""
+        while self._waiters and self._in_flight < self._capacity():
+            waiter = self._waiters.popleft()
+            self._take_slot()
+            if isinstance(waiter, threading.Event):
+                waiter.set()
+            else:
+                loop, future = waiter
+                loop.call_soon_threadsafe(self._resolve, future)
+
+    def _resolve(self, future: asyncio.Future):
+        if future.done():
+            # 等待者已取消或超时，名额交给下一个
+            self.release()
+        else:
+            future.set_result(None)
+
+    def acquire(self, timeout: Optional[float] = None):
+        """占用一个并发名额（阻塞），排队超过 timeout 秒时抛出 LLMBusyError"""
+        started = time.monotonic()
+        with self._lock:
+            if not self._waiters and self._in_flight < self._capacity():
+                self._take_slot()
+                return
+            event = threading.Event()
+            self._waiters.append(event)
+        if not event.wait(timeout):
+            with self._lock:
+                if event in self._waiters:
+                    self._waiters.remove(event)
+                    self._counters["busy_rejections"] += 1
+                    raise LLMBusyError(f"{self.model} 排队超过 {timeout:g} 秒", model=self.model)
+            # 超时的同时拿到了名额，照常执行
+        with self._lock:
+            self._wait_seconds += time.monotonic() - started
+
+    async def aacquire(self, timeout: Optional[float] = None):
+        """占用一个并发名额（异步版本，等待期间不占用线程）"""
+        started = time.monotonic()
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if not self._waiters and self._in_flight < self._capacity():
+                self._take_slot()
+                return
+            future = loop.create_future()
+            waiter = (loop, future)
+            self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(future, timeout)
+        except BaseException as e:
+            with self._lock:
+                queued = waiter in self._waiters
+                if queued:
+                    self._waiters.remove(waiter)
+            if not queued and future.done() and not future.cancelled():
+                # 已拿到名额但调用方不再需要
+                self.release()
+            if isinstance(e, asyncio.TimeoutError):
+                with self._lock:
+                    self._counters["busy_rejections"] += 1
+                raise LLMBusyError(f"{self.model} 排队超过 {timeout:g} 秒", model=self.model) from None
+            raise
+        with self._lock:
+            self._wait_seconds += time.monotonic() - started
+
+    def release(self):
+        with self._lock:
+            self._in_flight -= 1
+            self._wake()
+
+    def reserve_token(self) -> float:
+        """从令牌桶取一个令牌，返回需要等待的秒数（令牌可以透支，按透支量排队）"""
+        with self._lock:
+            if self.rate <= 0:
+                return 0.0
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+    def on_success(self):
+        """加性增加：并发上限每个窗口约加1，速率每次加上限的 1/20"""
+        with self._lock:
+            self._counters["successes"] += 1
+            self.limit = min(float(self.max_concurrency), self.limit + 1.0 / self.limit)
+            if self.max_rate > 0:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+            self._wake()
+
+    def on_failure(self, error: LLMError, will_retry: bool, started: float):
+        """记录失败；限流时乘性减小并发上限和速率，并清空令牌桶
+
+        Args:
+            started: 该次请求发出的时间（time.monotonic）
+        """
+        with self._lock:
+            self._counters["retries" if will_retry else "failures"] += 1
+            if not isinstance(error, LLMRateLimitError):
+                return
+            self._counters["throttled"] += 1
+            if started < self._last_decrease:
+                return
+            self._last_decrease = time.monotonic()
+            self.limit = max(float(self.min_concurrency), self.limit / 2)
+            if self.max_rate > 0:
+                self.rate = max(self.min_rate, self.rate / 2)
+                self._tokens = min(self._tokens, 0.0)
+            rate = f"，速率降为 {self.rate:.2f} 次/秒" if self.max_rate > 0 else ""
+            logger.warning(f"{self.model} 被限流，并发上限降为 {self._capacity()}{rate}")
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = self._counters["calls"]
+            return {
+                **self._counters,
+                "concurrency_limit": self._capacity(),
+                "max_concurrency": self.max_concurrency,
+                "in_flight": self._in_flight,
+                "max_in_flight": self._max_in_flight,
+                "waiting": len(self._waiters),
+                "rate_per_second": round(self.rate, 3),
+                "max_rate_per_second": self.max_rate,
+                "avg_queue_wait_ms": round(self._wait_seconds / calls * 1000, 1) if calls else 0.0
+            }
+
+
+class LLMGateway:
+    """进程内共享的 LLM 调用网关"""
+
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        min_concurrency: int = 1,
+        rate_per_second: float = 10.0,
+        burst: Optional[float] = None,
+        max_retries: int = 3,
+        retry_base_seconds: float = 1.0,
+        retry_max_seconds: float = 20.0,
+        queue_timeout: Optional[float] = 120.0,
+        model_limits: Optional[Dict[str, Dict[str, Any]]] = None
+    ):
+        """
+        Args:
+            max_concurrency: 每个模型的默认并发上限
+            min_concurrency: AIMD 减小后的最低并发数
+            rate_per_second: 每个模型的默认每秒请求数上限（<= 0 表示不限速）
+            burst: 令牌桶容量（默认与每秒请求数相同）
+            max_retries: 可重试错误的最多重试次数
+            retry_base_seconds: 第一次重试的退避时间（之后每次翻倍）
+            retry_max_seconds: 单次退避时间上限
+            queue_timeout: 排队等待并发名额的最长时间（秒），None 表示一直等待
+            model_limits: 按模型覆盖的参数，如 {"qwen-max": {"max_concurrency": 4, "rate_per_second": 2}}
+        """
+        self.defaults = {
+            "max_concurrency": max_concurrency,
+            "min_concurrency": min_concurrency,
+            "rate_per_second": rate_per_second,
+            "burst": burst
+        }
+        self.max_retries = max(0, max_retries)
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.queue_timeout = queue_timeout
+        self.model_limits = dict(model_limits or {})
+        self._limiters: Dict[str, ModelLimiter] = {}
+        self._lock = threading.Lock()
+
+    def limiter(self, model: str) -> ModelLimiter:
+        """获取模型的限流器（第一次使用时创建）"""
+        limiter = self._limiters.get(model)
+        if limiter is None:
+            with self._lock:
+                limiter = self._limiters.get(model)
+                if limiter is None:
+                    limiter = ModelLimiter(model, **{**self.defaults, **self.model_limits.get(model, {})})
+                    self._limiters[model] = limiter
+        return limiter
+
+    def configure(self, model: str, **limits: Any):
+        """覆盖某个模型的限流参数（重新创建该模型的限流器，应在开始调用前设置）"""
+        with self._lock:
+            self.model_limits[model] = {**self.model_limits.get(model, {}), **limits}
+            self._limiters.pop(model, None)
+
+    def _backoff(self, attempt: int) -> float:
+        """带抖动的指数退避：在 [d/2, d] 内均匀取值，d = base * 2^attempt（不超过上限）"""
+        delay = min(self.retry_max_seconds, self.retry_base_seconds * (2 ** attempt))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def _handle_error(
+        self,
+        limiter: ModelLimiter,
+        error: Exception,
+        attempt: int,
+        started: float,
+        can_retry: bool = True
+    ) -> LLMError:
+        """转换并记录错误；不可重试时抛出结构化错误，可重试时返回该错误"""
+        llm_error = classify_error(error, limiter.model)
+        if llm_error is None:
+            # 与 LLM 服务无关的错误原样抛出
+            raise error
+        will_retry = can_retry and llm_error.retryable and attempt < self.max_retries
+        limiter.on_failure(llm_error, will_retry, started)
+        if not will_retry:
+            if llm_error is error:
+                raise llm_error
+            raise llm_error from error
+        logger.info(f"{limiter.model} 调用失败（第 {attempt + 1} 次）: {llm_error}，稍后重试")
+        return llm_error
+
+    def call(self, model: str, fn: Callable[[], Any]) -> Any:
+        """在网关控制下执行一次同步LLM调用（阻塞，失败时按需重试）"""
+        limiter = self.limiter(model)
+        attempt = 0
+        while True:
+            limiter.acquire(self.queue_timeout)
+            try:
+                time.sleep(limiter.reserve_token())
+                started = time.monotonic()
+                result = fn()
+            except Exception as e:
+                self._handle_error(limiter, e, attempt, started)
+            else:
+                limiter.on_success()
+                return result
+            finally:
+                limiter.release()
+            time.sleep(self._backoff(attempt))
+            attempt += 1
+
+    async def acall(self, model: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """在网关控制下执行一次异步LLM调用"""
+        limiter = self.limiter(model)
+        attempt = 0
+        while True:
+            await limiter.aacquire(self.queue_timeout)
+            try:
+                await asyncio.sleep(limiter.reserve_token())
+                started = time.monotonic()
+                result = await fn()
+            except Exception as e:
+                self._handle_error(limiter, e, attempt, started)
+            else:
+                limiter.on_success()
+                return result
+            finally:
+                limiter.release()
+            await asyncio.sleep(self._backoff(attempt))
+            attempt += 1
+
+    async def astream(self, model: str, fn: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """在网关控制下执行一次流式LLM调用；并发名额在整个流期间占用，产出内容后不再重试"""
+        limiter = self.limiter(model)
+        attempt = 0
+        while True:
+            produced = False
+            await limiter.aacquire(self.queue_timeout)
+            try:
+                await asyncio.sleep(limiter.reserve_token())
+                started = time.monotonic()
+                async for chunk in fn():
+                    produced = True
+                    yield chunk
+            except Exception as e:
+                self._handle_error(limiter, e, attempt, started, can_retry=not produced)
+            else:
+                limiter.on_success()
+                return
+            finally:
+                limiter.release()
+            await asyncio.sleep(self._backoff(attempt))
+            attempt += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        """各模型的并发上限、速率、排队情况和重试/限流次数"""
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {
+            "max_retries": self.max_retries,
+            "queue_timeout": self.queue_timeout,
+            "models": {model: limiter.metrics() for model, limiter in limiters.items()}
+        }
+
+
+def _model_limits_from_env() -> Dict[str, Dict[str, Any]]:
+    raw = os.getenv("LLM_MODEL_LIMITS", "").strip()
+    if not raw:
+        return {}
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError as e:
+        logger.warning(f"LLM_MODEL_LIMITS 不是有效的JSON，忽略: {e}")
+        return {}
+
+
+# 全局实例
+llm_gateway = LLMGateway(
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+    min_concurrency=int(os.getenv("LLM_MIN_CONCURRENCY", "1")),
+    rate_per_second=float(os.getenv("LLM_RATE_PER_SECOND", "10")),
+    burst=float(os.environ["LLM_BURST"]) if os.getenv("LLM_BURST") else None,
+    max_retries=int(os.getenv("LLM_MAX_RETRIES", "3")),
+    retry_base_seconds=float(os.getenv("LLM_RETRY_BASE_SECONDS", "1")),
+    retry_max_seconds=float(os.getenv("LLM_RETRY_MAX_SECONDS", "20")),
+    queue_timeout=float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "120")) or None,
+    model_limits=_model_limits_from_env()
+)
@@ -20,8 +20,10 @@ class Theme(BaseModel):
     theme: str = Field(..., description="主题名称，简短短语")
     sentiment: Sentiment = Field(..., description="情感倾向")
     quote: str = Field(..., description="代表性用户原话引述")
-    count: int = Field(..., ge=0, description="提及频次（相对）")
+    count: int = Field(..., ge=0, description="提及频次（归类后为实际回答数）")
     description: Optional[str] = Field(None, description="主题详细描述")
+    percentage: Optional[float] = Field(None, description="归入该主题的回答占比（%）")
+    answers: List[str] = Field(default_factory=list, description="归入该主题的回答（去重后）")
 
 
 class SurveyAnalysisReport(BaseModel):
@@ -29,6 +31,7 @@ class SurveyAnalysisReport(BaseModel):
     summary: str = Field(..., description="总体摘要，概括所有反馈的核心内容")
     themes: List[Theme] = Field(..., description="识别出的核心主题列表")
     recommendation: str = Field(..., description="基于分析结果的具体行动建议")
+    unassigned_count: int = Field(0, description="未能归入任何主题的回答数")
     
     class Config:
         json_schema_extra = {
@@ -71,6 +74,7 @@ class FullAnalysisDataReport(BaseModel):
     survey_description: Optional[str] = Field(None, description="问卷描述")
     total_respondents: int = Field(..., description="总回答人数")
     question_results: List[QuestionResult] = Field(..., description="所有问题的统计结果")
+    associations: List[Dict[str, Any]] = Field(default_factory=list, description="关联最强的问题对（交叉分析）")
 
 
 class FullAnalysisReport(BaseModel):
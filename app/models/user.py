@@ -2,12 +2,13 @@
 用户数据模型
 """
 
-import json
 import hashlib
 from datetime import datetime
 from typing import Optional, Dict, Any
 from pathlib import Path
 
+from app.utils.kv_store import DurableKVStore
+
 
 class User:
     """用户模型"""
@@ -56,35 +57,28 @@ class UserStore:
     
     def __init__(self, db_path: str = "./data/users.json"):
         self.db_path = Path(db_path)
-        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._kv = DurableKVStore(str(self.db_path))
         self._users = {}
         self.load()
     
     def load(self):
-        """从文件加载用户数据"""
-        if self.db_path.exists():
-            try:
-                with open(self.db_path, 'r', encoding='utf-8') as f:
-                    users_data = json.load(f)
-                    for username, data in users_data.items():
-                        self._users[username] = User.from_dict(data)
-            except Exception as e:
-                print(f"加载用户数据失败: {e}")
-                self._users = {}
-        else:
-            self._users = {}
-    
-    def save(self):
-        """保存用户数据到文件"""
+        """从快照和日志加载用户数据"""
         try:
-            users_data = {
-                username: user.to_dict() 
-                for username, user in self._users.items()
+            self._users = {
+                username: User.from_dict(data)
+                for username, data in self._kv.items()
             }
-            with open(self.db_path, 'w', encoding='utf-8') as f:
-                json.dump(users_data, f, ensure_ascii=False, indent=2)
         except Exception as e:
-            print(f"保存用户数据失败: {e}")
+            print(f"加载用户数据失败: {e}")
+            self._users = {}
+    
+    def save(self):
+        """立即把未落盘的用户改动写入磁盘"""
+        self._kv.flush()
+    
+    def _persist(self, user: User, sync: bool = False):
+        """只记录发生变化的用户（sync=True 时立即落盘）"""
+        self._kv.set(user.username, user.to_dict(), sync=sync)
     
     def register(self, username: str, password: str, email: Optional[str] = None) -> bool:
         """注册用户"""
@@ -94,7 +88,8 @@ class UserStore:
         password_hash = User.hash_password(password)
         user = User(username, password_hash, email)
         self._users[username] = user
-        self.save()
+        # 注册不能丢失，立即落盘
+        self._persist(user, sync=True)
         return True
     
     def login(self, username: str, password: str) -> Optional[User]:
@@ -105,7 +100,8 @@ class UserStore:
         user = self._users[username]
         if user.verify_password(password):
             user.last_login = datetime.now().isoformat()
-            self.save()
+            # 最后登录时间由后台定时落盘
+            self._persist(user)
             return user
         
         return None
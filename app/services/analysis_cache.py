@@ -0,0 +1,118 @@
+"""
+分析结果缓存
+以"问卷定义 + 答案数 + 最近提交时间 + 分析类型/模型"的指纹为键，
+指纹未变化（没有新答案、问卷未修改）时直接返回已保存的分析结果，不再调用LLM
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+from app.utils.async_storage import write_json_atomic
+from app.utils.response_saver import get_response_store
+
+logger = logging.getLogger(__name__)
+
+# 分析逻辑或结果格式变化时递增，使旧缓存失效
+CACHE_VERSION = 1
+
+
+def compute_fingerprint(
+    survey: Dict[str, Any],
+    response_count: int,
+    last_submitted_at: Optional[str],
+    analysis_type: str,
+    llm_model: str = ""
+) -> str:
+    """计算分析结果指纹"""
+    survey_digest = hashlib.sha1(
+        json.dumps(survey, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+    key = "|".join([
+        str(CACHE_VERSION),
+        analysis_type,
+        llm_model,
+        survey_digest,
+        str(response_count),
+        last_submitted_at or ""
+    ])
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def survey_fingerprint(survey_id: str, survey: Dict[str, Any], analysis_type: str, llm_model: str = "") -> str:
+    """按答案存储的统计摘要计算指纹（O(1)，不加载回答）"""
+    summary = get_response_store().get_response_summary(survey_id)
+    return compute_fingerprint(
+        survey,
+        summary.get("response_count", 0),
+        summary.get("last_submitted_at"),
+        analysis_type,
+        llm_model
+    )
+
+
+class AnalysisResultCache:
+    """分析结果缓存
+
+    结果保存在 data/analyses/analysis_{survey_id}_{analysis_type}.json（沿用原来的结果文件），
+    额外记录 fingerprint 和 generated_at 字段。
+    """
+
+    def __init__(self, analyses_dir: str = "data/analyses"):
+        self.analyses_dir = Path(analyses_dir)
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "stores": 0}
+
+    def _path(self, survey_id: str, analysis_type: str) -> Path:
+        return self.analyses_dir / f"analysis_{survey_id}_{analysis_type}.json"
+
+    def load(self, survey_id: str, analysis_type: str) -> Optional[Dict[str, Any]]:
+        """读取已保存的分析结果（不校验指纹）"""
+        path = self._path(survey_id, analysis_type)
+        if not path.exists():
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"读取分析结果失败 {path}: {e}")
+            return None
+
+    def lookup(self, survey_id: str, analysis_type: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """指纹一致时返回缓存的分析结果"""
+        result = self.load(survey_id, analysis_type)
+        hit = result is not None and result.get("fingerprint") == fingerprint
+        with self._lock:
+            self._counters["hits" if hit else "misses"] += 1
+        if not hit:
+            return None
+        logger.info(f"命中分析缓存: {survey_id} ({analysis_type})")
+        return {**result, "cached": True}
+
+    def store(self, survey_id: str, analysis_type: str, fingerprint: str, result: Dict[str, Any]) -> Dict[str, Any]:
+        """保存分析结果，返回带指纹的结果"""
+        entry = {
+            **{k: v for k, v in result.items() if k != "cached"},
+            "fingerprint": fingerprint,
+            "generated_at": datetime.now().isoformat()
+        }
+        write_json_atomic(self._path(survey_id, analysis_type), entry)
+        with self._lock:
+            self._counters["stores"] += 1
+        return entry
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "hit_rate": round(self._counters["hits"] / lookups, 4) if lookups else 0.0
+            }
+
+
+# 全局实例
+analysis_cache = AnalysisResultCache()
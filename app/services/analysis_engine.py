@@ -3,14 +3,17 @@
 整合数据处理和分析流程，提供统一的分析接口
 """
 
-import json
 import logging
-from typing import Dict, Any, List, Tuple
-from pathlib import Path
+from typing import Dict, Any, List, Tuple, Optional, Callable
 
+from app.core.llm_gateway import LLMError
 from app.services.qualitative_analyzer import QualitativeAnalyzer
 from app.services.visualization_service import VisualizationService
 from app.models.analysis_models import SurveyAnalysisReport
+from app.services.analysis_cache import analysis_cache, survey_fingerprint
+from app.utils.async_storage import run_io, run_compute
+from app.utils.response_saver import get_response_store
+from app.utils.survey_cache import survey_cache
 
 logger = logging.getLogger(__name__)
 
@@ -26,11 +29,18 @@ class SurveyAnalysisEngine:
             llm_model: LLM模型名称
             temperature: 温度参数
         """
+        self.llm_model = llm_model
         self.qualitative_analyzer = QualitativeAnalyzer(llm_model, temperature)
         self.viz_service = VisualizationService()
         logger.info("问卷分析引擎初始化完成")
     
-    def analyze(self, survey_id: str) -> Dict[str, Any]:
+    def analyze(
+        self,
+        survey_id: str,
+        progress_callback: Optional[Callable] = None,
+        force: bool = False,
+        raise_errors: bool = False
+    ) -> Dict[str, Any]:
         """
         执行完整的问卷分析
         
@@ -43,14 +53,31 @@ class SurveyAnalysisEngine:
         
         Args:
             survey_id: 问卷ID
+            progress_callback: 进度回调 (stage, message, **detail)，由分析任务队列传入
+            force: 忽略缓存，强制重新分析
+            raise_errors: 问卷不存在（FileNotFoundError）和 LLM 调用失败（LLMError）时直接抛出，
+                由分析任务队列按错误类型给出状态码；默认转换为 status 为 error 的结果字典
             
         Returns:
             完整的分析结果字典
         """
+        progress = progress_callback or (lambda *args, **kwargs: None)
         try:
             logger.info(f"开始分析问卷: {survey_id}")
             
+            # 0. 问卷和答案集未变化时直接返回已保存的结果
+            survey = survey_cache.get(survey_id)
+            if not survey:
+                raise FileNotFoundError(f"找不到问卷 {survey_id}")
+            fingerprint = survey_fingerprint(survey_id, survey, "open_ended", self.llm_model)
+            if not force:
+                cached = analysis_cache.lookup(survey_id, "open_ended", fingerprint)
+                if cached is not None:
+                    progress("cache", "答案未变化，使用已保存的分析结果")
+                    return cached
+            
             # 1. 加载数据
+            progress("load", "正在加载问卷和回答数据")
             survey, responses = self._load_data(survey_id)
             if not responses:
                 raise ValueError(f"问卷 {survey_id} 没有找到回答数据")
@@ -61,125 +88,166 @@ class SurveyAnalysisEngine:
             open_ended_responses = self._extract_open_ended_responses(survey, responses)
             
             if not open_ended_responses:
-                return {
-                    "survey_id": survey_id,
-                    "survey_title": survey.get("title", ""),
-                    "total_responses": len(responses),
-                    "analysis_type": "定性分析",
-                    "status": "no_open_ended_questions",
-                    "message": "问卷中没有开放题，无法进行定性分析",
-                    "report": None
-                }
+                return self._no_open_ended_result(survey_id, survey, responses)
             
             logger.info(f"提取到 {len(open_ended_responses)} 条开放题回答")
             
             # 3. 执行定性分析
+            progress("qualitative", f"正在分析 {len(open_ended_responses)} 条开放题回答")
             analysis_report = self.qualitative_analyzer.analyze_open_ended_responses(
                 open_ended_responses
             )
             
-            # 4. 生成Markdown报告
-            markdown_report = self.qualitative_analyzer.generate_report(analysis_report)
-            
-            # 5. 生成可视化图表
+            # 4. 生成可视化图表
             logger.info("生成可视化图表...")
+            progress("charts", "正在生成可视化图表")
             visualizations = self._generate_visualizations(
                 open_ended_responses, 
                 analysis_report,
                 survey.get("title", "")
             )
             
-            # 6. 整合结果
-            result = {
-                "survey_id": survey_id,
-                "survey_title": survey.get("title", ""),
-                "total_responses": len(responses),
-                "open_ended_responses_count": len(open_ended_responses),
-                "analysis_type": "定性分析",
-                "status": "success",
-                "report": {
-                    "summary": analysis_report.summary,
-                    "themes": [
-                        {
-                            "theme": t.theme,
-                            "sentiment": t.sentiment.value,
-                            "quote": t.quote,
-                            "count": t.count,
-                            "description": t.description
-                        }
-                        for t in analysis_report.themes
-                    ],
-                    "recommendation": analysis_report.recommendation
-                },
-                "formatted_report": markdown_report,
-                "visualizations": visualizations  # 添加可视化数据
-            }
+            # 5. 整合结果（含Markdown报告）
+            result = self._build_result(survey_id, survey, responses, open_ended_responses, analysis_report, visualizations)
+            return analysis_cache.store(survey_id, "open_ended", fingerprint, result)
+            
+        except Exception as e:
+            if raise_errors and isinstance(e, (FileNotFoundError, LLMError)):
+                raise
+            return self._error_result(survey_id, e)
+    
+    async def aanalyze(
+        self,
+        survey_id: str,
+        progress_callback: Optional[Callable] = None,
+        force: bool = False,
+        raise_errors: bool = False
+    ) -> Dict[str, Any]:
+        """
+        执行完整的问卷分析（异步版本，参数和返回值同 analyze）
+        
+        定性分析的LLM调用走原生异步接口；加载数据和读写结果缓存放到存储线程池，
+        提取回答和渲染图表放到计算线程池，不阻塞事件循环。
+        """
+        progress = progress_callback or (lambda *args, **kwargs: None)
+        try:
+            logger.info(f"开始分析问卷: {survey_id}")
+            
+            survey = await run_io(survey_cache.get, survey_id)
+            if not survey:
+                raise FileNotFoundError(f"找不到问卷 {survey_id}")
+            fingerprint = await run_io(survey_fingerprint, survey_id, survey, "open_ended", self.llm_model)
+            if not force:
+                cached = await run_io(analysis_cache.lookup, survey_id, "open_ended", fingerprint)
+                if cached is not None:
+                    progress("cache", "答案未变化，使用已保存的分析结果")
+                    return cached
+            
+            progress("load", "正在加载问卷和回答数据")
+            survey, responses = await run_io(self._load_data, survey_id)
+            if not responses:
+                raise ValueError(f"问卷 {survey_id} 没有找到回答数据")
+            logger.info(f"数据加载完成: {len(responses)} 份回答")
+            
+            open_ended_responses = await run_compute(self._extract_open_ended_responses, survey, responses)
+            if not open_ended_responses:
+                return self._no_open_ended_result(survey_id, survey, responses)
+            logger.info(f"提取到 {len(open_ended_responses)} 条开放题回答")
+            
+            progress("qualitative", f"正在分析 {len(open_ended_responses)} 条开放题回答")
+            analysis_report = await self.qualitative_analyzer.aanalyze_open_ended_responses(open_ended_responses)
+            
+            logger.info("生成可视化图表...")
+            progress("charts", "正在生成可视化图表")
+            visualizations = await run_compute(
+                self._generate_visualizations,
+                open_ended_responses,
+                analysis_report,
+                survey.get("title", "")
+            )
             
-            logger.info(f"分析完成，识别出 {len(analysis_report.themes)} 个主题")
-            return result
+            result = self._build_result(survey_id, survey, responses, open_ended_responses, analysis_report, visualizations)
+            return await run_io(analysis_cache.store, survey_id, "open_ended", fingerprint, result)
             
         except Exception as e:
-            logger.error(f"分析失败: {e}", exc_info=True)
-            return {
-                "survey_id": survey_id,
-                "status": "error",
-                "message": str(e),
-                "report": None
-            }
+            if raise_errors and isinstance(e, (FileNotFoundError, LLMError)):
+                raise
+            return self._error_result(survey_id, e)
+    
+    @staticmethod
+    def _no_open_ended_result(survey_id: str, survey: Dict[str, Any], responses: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            "survey_id": survey_id,
+            "survey_title": survey.get("title", ""),
+            "total_responses": len(responses),
+            "analysis_type": "定性分析",
+            "status": "no_open_ended_questions",
+            "message": "问卷中没有开放题，无法进行定性分析",
+            "report": None
+        }
+    
+    def _build_result(
+        self,
+        survey_id: str,
+        survey: Dict[str, Any],
+        responses: List[Dict[str, Any]],
+        open_ended_responses: List[str],
+        analysis_report: SurveyAnalysisReport,
+        visualizations: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """整合分析结果（含Markdown报告）"""
+        logger.info(f"分析完成，识别出 {len(analysis_report.themes)} 个主题")
+        return {
+            "survey_id": survey_id,
+            "survey_title": survey.get("title", ""),
+            "total_responses": len(responses),
+            "open_ended_responses_count": len(open_ended_responses),
+            "analysis_type": "定性分析",
+            "status": "success",
+            "report": {
+                "summary": analysis_report.summary,
+                "themes": [
+                    {
+                        "theme": t.theme,
+                        "sentiment": t.sentiment.value,
+                        "quote": t.quote,
+                        "count": t.count,
+                        "percentage": t.percentage,
+                        "description": t.description
+                    }
+                    for t in analysis_report.themes
+                ],
+                "unassigned_count": analysis_report.unassigned_count,
+                "recommendation": analysis_report.recommendation
+            },
+            "formatted_report": self.qualitative_analyzer.generate_report(analysis_report),
+            "visualizations": visualizations  # 添加可视化数据
+        }
+    
+    @staticmethod
+    def _error_result(survey_id: str, error: Exception) -> Dict[str, Any]:
+        logger.error(f"分析失败: {error}", exc_info=error)
+        return {
+            "survey_id": survey_id,
+            "status": "error",
+            "message": error.user_message if isinstance(error, LLMError) else str(error),
+            "report": None
+        }
     
     def _load_data(self, survey_id: str) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
         """加载问卷和回答数据"""
-        # 加载问卷
-        surveys_dir = Path("data/surveys")
-        survey = None
-        
-        # 查找问卷文件
-        for file_path in surveys_dir.glob(f"*{survey_id}.json"):
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    if data.get("id") == survey_id:
-                        survey = data
-                        break
-            except Exception:
-                continue
-        
-        # 如果没找到，遍历所有文件
-        if not survey:
-            for file_path in surveys_dir.glob("*.json"):
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        if data.get("id") == survey_id:
-                            survey = data
-                            break
-                except Exception:
-                    continue
+        # 通过问卷缓存加载问卷
+        survey = survey_cache.get(survey_id)
         
         if not survey:
             raise FileNotFoundError(f"找不到问卷 {survey_id}")
         
-        # 加载回答
-        responses_dir = Path("data/responses")
+        # 通过答案存储接口加载回答（与存储后端无关）
         responses = []
-        
-        # 查找包含survey_id的目录
-        found_dir = None
-        for item in responses_dir.iterdir():
-            if item.is_dir() and survey_id in item.name:
-                found_dir = item
-                break
-        
-        if found_dir:
-            for response_file in found_dir.glob("*.json"):
-                try:
-                    with open(response_file, 'r', encoding='utf-8') as f:
-                        response_data = json.load(f)
-                        if response_data.get("survey_id") == survey_id:
-                            responses.append(response_data)
-                except Exception as e:
-                    logger.warning(f"无法加载回答文件 {response_file}: {e}")
-                    continue
+        try:
+            responses = get_response_store().get_responses(survey_id)
+        except Exception as e:
+            logger.warning(f"无法加载回答数据 {survey_id}: {e}")
         
         return survey, responses
     
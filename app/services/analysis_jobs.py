@@ -0,0 +1,271 @@
+"""
+问卷分析任务队列
+分析流水线（多次LLM调用 + 图表渲染）作为事件循环中的后台任务执行，走分析服务的异步接口：
+LLM 调用在事件循环中并发等待，统计和图表渲染在计算线程池中执行；
+请求只负责提交任务；进度按阶段记录为事件，供 SSE 推送，客户端断开不影响任务继续执行
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Callable
+
+from app.core.llm_gateway import LLMError
+
+logger = logging.getLogger(__name__)
+
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+ANALYSIS_TYPES = ("open_ended", "full")
+
+
+class AnalysisQueueFull(Exception):
+    """排队中的分析任务过多"""
+
+
+class AnalysisJob:
+    """单个分析任务：状态、阶段事件和最终结果"""
+
+    def __init__(self, survey_id: str, analysis_type: str, force: bool = False):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.survey_id = survey_id
+        self.analysis_type = analysis_type
+        self.force = force
+        self.status = JOB_QUEUED
+        self.created_at = datetime.now().isoformat()
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+        self.events: List[Dict[str, Any]] = []
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.error_code = 500
+        self._lock = threading.Lock()
+        # SSE 订阅者：(事件循环, asyncio.Event)
+        self._subscribers: List[tuple] = []
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (JOB_SUCCEEDED, JOB_FAILED)
+
+    def add_event(self, stage: str, message: str, **detail):
+        """记录一个阶段事件并唤醒所有订阅者（可在任意线程调用）"""
+        event = {
+            "seq": len(self.events),
+            "stage": stage,
+            "message": message,
+            "status": self.status,
+            "time": datetime.now().isoformat(),
+            **detail
+        }
+        with self._lock:
+            self.events.append(event)
+            subscribers = list(self._subscribers)
+        for loop, changed in subscribers:
+            try:
+                loop.call_soon_threadsafe(changed.set)
+            except RuntimeError:
+                # 订阅者所在的事件循环已关闭
+                pass
+
+    def subscribe(self) -> asyncio.Event:
+        changed = asyncio.Event()
+        with self._lock:
+            self._subscribers.append((asyncio.get_running_loop(), changed))
+        return changed
+
+    def unsubscribe(self, changed: asyncio.Event):
+        with self._lock:
+            self._subscribers = [s for s in self._subscribers if s[1] is not changed]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """任务状态（不含结果正文）"""
+        return {
+            "job_id": self.job_id,
+            "survey_id": self.survey_id,
+            "analysis_type": self.analysis_type,
+            "force": self.force,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "stage": self.events[-1]["stage"] if self.events else None,
+            "error": self.error
+        }
+
+
+class AnalysisJobManager:
+    """分析任务管理器
+
+    - 信号量限制同时运行的分析数（ANALYSIS_MAX_CONCURRENCY），超出的任务排队
+    - 同一问卷同一分析类型已有未完成任务时直接返回该任务，不重复分析
+    - 已完成的任务在内存中保留最近 max_finished_jobs 个；结果由分析层按指纹写入 data/analyses/（见 analysis_cache）
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 2,
+        max_pending: int = 20,
+        max_finished_jobs: int = 200
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self.max_finished_jobs = max_finished_jobs
+        # 信号量在第一次提交时于事件循环中创建
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks = set()
+        self._jobs: "OrderedDict[str, AnalysisJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, survey_id: str, analysis_type: str, force: bool = False) -> AnalysisJob:
+        """
+        提交分析任务（force=True 时忽略结果缓存重新分析；需在事件循环中调用）
+
+        Raises:
+            ValueError: 分析类型不支持
+            AnalysisQueueFull: 未完成任务过多
+        """
+        if analysis_type not in ANALYSIS_TYPES:
+            raise ValueError(f"不支持的分析类型: {analysis_type}")
+
+        with self._lock:
+            pending = 0
+            for job in self._jobs.values():
+                if job.finished:
+                    continue
+                if (job.survey_id == survey_id and job.analysis_type == analysis_type
+                        and (job.force or not force)):
+                    return job
+                pending += 1
+            if pending >= self.max_pending:
+                raise AnalysisQueueFull(f"当前分析任务较多（{pending} 个），请稍后重试")
+
+            job = AnalysisJob(survey_id, analysis_type, force)
+            self._jobs[job.job_id] = job
+            self._evict_finished()
+
+        job.add_event("queued", "任务已提交，等待执行")
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        task = asyncio.get_running_loop().create_task(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    def get(self, job_id: str) -> Optional[AnalysisJob]:
+        return self._jobs.get(job_id)
+
+    def _evict_finished(self):
+        """只保留最近的若干个已完成任务（调用方持有 _lock）"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(len(finished) - self.max_finished_jobs, 0)]:
+            del self._jobs[job_id]
+
+    async def _run(self, job: AnalysisJob):
+        """等待空闲名额后执行分析流水线"""
+        async with self._semaphore:
+            await self._run_job(job)
+
+    async def _run_job(self, job: AnalysisJob):
+        job.status = JOB_RUNNING
+        job.started_at = datetime.now().isoformat()
+        started = time.perf_counter()
+        progress = job.add_event
+
+        try:
+            result = await self._execute(job.survey_id, job.analysis_type, progress, job.force)
+
+            job.result = result
+            job.status = JOB_SUCCEEDED
+            job.finished_at = datetime.now().isoformat()
+            job.add_event("done", "分析完成", elapsed_seconds=round(time.perf_counter() - started, 1))
+            logger.info(f"分析任务完成: {job.job_id} ({job.survey_id}, {job.analysis_type})")
+
+        except FileNotFoundError as e:
+            self._fail(job, f"问卷不存在或未找到回答数据: {str(e)}", 404)
+        except LLMError as e:
+            logger.error(f"分析任务失败: {job.job_id}: {e}")
+            self._fail(job, f"分析失败: {e.user_message}", e.http_status)
+        except Exception as e:
+            logger.error(f"分析任务失败: {job.job_id}: {e}", exc_info=True)
+            self._fail(job, f"分析失败: {str(e)}", 500)
+
+    def _fail(self, job: AnalysisJob, message: str, code: int):
+        job.error = message
+        job.error_code = code
+        job.status = JOB_FAILED
+        job.finished_at = datetime.now().isoformat()
+        job.add_event("failed", message)
+
+    @staticmethod
+    async def _execute(survey_id: str, analysis_type: str, progress: Callable, force: bool = False) -> Dict[str, Any]:
+        """运行分析流水线（异步接口），返回与原同步接口相同格式的结果"""
+        from app.services.analysis_engine import SurveyAnalysisEngine
+        from app.utils.async_storage import run_io
+
+        if analysis_type == "full":
+            from app.services.analysis_cache import analysis_cache, survey_fingerprint
+            from app.services.full_analysis_service import FullAnalysisService
+            from app.utils.survey_cache import survey_cache
+
+            # 命中结果缓存时不必加载全部回答
+            survey = await run_io(survey_cache.get, survey_id)
+            if not survey:
+                raise FileNotFoundError(f"找不到问卷 {survey_id}")
+            if not force:
+                fingerprint = await run_io(survey_fingerprint, survey_id, survey, "full", "qwen-flash")
+                cached = await run_io(analysis_cache.lookup, survey_id, "full", fingerprint)
+                if cached is not None:
+                    progress("cache", "答案未变化，使用已保存的分析结果")
+                    return cached
+
+            # 使用SurveyAnalysisEngine加载数据
+            progress("load", "正在加载问卷和回答数据")
+            engine = SurveyAnalysisEngine(llm_model="qwen-flash")
+            survey, responses = await run_io(engine._load_data, survey_id)
+
+            if not responses:
+                raise ValueError(f"问卷 {survey_id} 没有找到回答数据")
+
+            # 执行全量分析
+            full_analyzer = FullAnalysisService(llm_model="qwen-flash", temperature=0.3)
+            return await full_analyzer.aanalyze_full_survey(
+                survey, responses, progress_callback=progress, survey_id=survey_id, force=True
+            )
+
+        # 仅开放题分析模式
+        analyzer = SurveyAnalysisEngine(
+            llm_model="qwen-flash",
+            temperature=0.7
+        )
+        # 问卷不存在和 LLM 调用失败直接抛出，由 _run_job 给出 404 / 对应的状态码
+        result = await analyzer.aanalyze(survey_id, progress_callback=progress, force=force, raise_errors=True)
+        if result.get("status") == "error":
+            raise RuntimeError(result.get("message", "分析失败"))
+        return result
+
+    def metrics(self) -> Dict[str, Any]:
+        counts = {JOB_QUEUED: 0, JOB_RUNNING: 0, JOB_SUCCEEDED: 0, JOB_FAILED: 0}
+        for job in list(self._jobs.values()):
+            counts[job.status] += 1
+        return {"max_concurrency": self.max_concurrency, "max_pending": self.max_pending, **counts}
+
+    def shutdown(self):
+        """取消未完成的任务（服务关闭时调用）"""
+        for task in list(self._tasks):
+            task.cancel()
+
+
+# 全局实例
+analysis_jobs = AnalysisJobManager(
+    max_concurrency=int(os.getenv("ANALYSIS_MAX_CONCURRENCY", "2")),
+    max_pending=int(os.getenv("ANALYSIS_MAX_PENDING", "20"))
+)
@@ -3,20 +3,38 @@
 综合分析问卷的所有题型，生成深度诊断报告
 """
 
+import asyncio
 import json
 import logging
-from typing import Dict, Any, List
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Callable, Tuple
 from collections import Counter
-from langchain_dashscope import ChatDashScope
 from langchain_core.messages import HumanMessage, SystemMessage
 
+from app.core.llm import AsyncChatDashScope
+from app.core.llm_gateway import LLMError
 from app.models.analysis_models import (
     QuestionResult, 
     FullAnalysisDataReport, 
     FullAnalysisReport
 )
+from app.services.analysis_cache import analysis_cache, survey_fingerprint
 from app.services.qualitative_analyzer import QualitativeAnalyzer
 from app.services.visualization_service import VisualizationService
+from app.utils.async_storage import run_io, run_compute
+from app.utils.confidence import BOOTSTRAP_RESAMPLES, column_intervals
+from app.utils.crosstab import strongest_associations
+from app.utils.survey_columns import (
+    SurveyColumns,
+    QuestionColumn,
+    TextColumn,
+    describe,
+    OPEN_ENDED,
+    SCALE,
+    SINGLE_CHOICE,
+    MULTIPLE_CHOICE
+)
 
 logger = logging.getLogger(__name__)
 
@@ -24,19 +42,30 @@ logger = logging.getLogger(__name__)
 class FullAnalysisService:
     """全量分析服务 - 从描述统计到智能诊断"""
     
-    def __init__(self, llm_model: str = "qwen-flash", temperature: float = 0.3):
+    def __init__(
+        self,
+        llm_model: str = "qwen-flash",
+        temperature: float = 0.3,
+        max_concurrency: Optional[int] = None,
+        bootstrap_resamples: Optional[int] = None
+    ):
         """
         初始化全量分析服务
         
         Args:
             llm_model: LLM模型名称
             temperature: 温度参数（分析时用较低温度保证严谨性）
+            max_concurrency: 开放题分析和图表渲染的最大并发数（默认取 FULL_ANALYSIS_CONCURRENCY，4）
+            bootstrap_resamples: 量表题均值区间的 bootstrap 重抽次数（默认取 BOOTSTRAP_RESAMPLES，1000）
         """
         self.llm_model = llm_model
         self.temperature = temperature
+        self.max_concurrency = max(1, max_concurrency or int(os.getenv("FULL_ANALYSIS_CONCURRENCY", "4")))
+        self.bootstrap_resamples = BOOTSTRAP_RESAMPLES if bootstrap_resamples is None else bootstrap_resamples
+        self._progress = lambda *args, **kwargs: None
         
         # 初始化LLM客户端 - 增加max_tokens以支持更长的报告输出
-        self.llm_client = ChatDashScope(
+        self.llm_client = AsyncChatDashScope(
             model=llm_model,
             temperature=temperature,
             model_kwargs={
@@ -56,7 +85,10 @@ class FullAnalysisService:
     def analyze_full_survey(
         self, 
         survey: Dict[str, Any], 
-        responses: List[Dict[str, Any]]
+        responses: List[Dict[str, Any]],
+        progress_callback: Optional[Callable] = None,
+        survey_id: Optional[str] = None,
+        force: bool = False
     ) -> Dict[str, Any]:
         """
         执行全量分析
@@ -71,238 +103,364 @@ class FullAnalysisService:
         Args:
             survey: 问卷数据
             responses: 所有回答数据
+            progress_callback: 进度回调 (stage, message, **detail)，由分析任务队列传入
+            survey_id: 缓存键使用的问卷ID（默认取 survey["id"]）
+            force: 忽略缓存，强制重新分析
             
         Returns:
-            包含report_markdown和visualizations的字典
+            包含report_markdown和visualizations的完整分析结果字典
         """
-        logger.info(f"开始全量分析，问卷: {survey.get('title')}, 回答数: {len(responses)}")
+        self._progress = progress_callback or (lambda *args, **kwargs: None)
+        survey_id = survey_id or survey.get("id", "")
         
-        # 1. 准备数据报告
-        data_report = self._prepare_data_report(survey, responses)
+        # 问卷和答案集未变化时直接返回已保存的结果
+        fingerprint = survey_fingerprint(survey_id, survey, "full", self.llm_model)
+        if not force:
+            cached = analysis_cache.lookup(survey_id, "full", fingerprint)
+            if cached is not None:
+                self._progress("cache", "答案未变化，使用已保存的分析结果")
+                return cached
         
-        # 2. 生成可视化图表
-        logger.info("生成全量分析可视化图表...")
-        visualizations = self._generate_full_visualizations(survey, responses, data_report)
+        logger.info(f"开始全量分析，问卷: {survey.get('title')}, 回答数: {len(responses)}")
+        
+        # 1-2. 准备数据报告并生成可视化图表（开放题分析与图表渲染并发执行）
+        self._progress("stats", f"正在统计 {len(responses)} 份回答")
+        data_report, visualizations = self._prepare_data_report(survey, responses)
         
         # 3. 生成分析提示词
         prompt = self._generate_analysis_prompt(data_report)
         
         # 4. 调用LLM
         logger.info("调用LLM进行全量分析...")
+        self._progress("llm_report", "正在生成深度分析报告")
+        try:
+            response = self.llm_client.invoke(self._report_messages(prompt))
+            return self._finish_report(survey_id, survey, responses, fingerprint, response.content, visualizations)
+        except LLMError:
+            # 网关已按需重试，保留错误类型供上层区分限流、配额等情况
+            raise
+        except Exception as e:
+            logger.error(f"全量分析失败: {e}", exc_info=True)
+            raise RuntimeError(f"全量分析失败: {str(e)}")
+    
+    async def aanalyze_full_survey(
+        self,
+        survey: Dict[str, Any],
+        responses: List[Dict[str, Any]],
+        progress_callback: Optional[Callable] = None,
+        survey_id: Optional[str] = None,
+        force: bool = False
+    ) -> Dict[str, Any]:
+        """
+        执行全量分析（异步版本，参数和返回值同 analyze_full_survey）
+        
+        开放题的定性分析和最终报告走原生异步LLM接口，各开放题在事件循环中并发（最多 max_concurrency 个）；
+        统计和图表渲染放到计算线程池，读写结果缓存放到存储线程池。
+        """
+        self._progress = progress_callback or (lambda *args, **kwargs: None)
+        survey_id = survey_id or survey.get("id", "")
+        
+        fingerprint = await run_io(survey_fingerprint, survey_id, survey, "full", self.llm_model)
+        if not force:
+            cached = await run_io(analysis_cache.lookup, survey_id, "full", fingerprint)
+            if cached is not None:
+                self._progress("cache", "答案未变化，使用已保存的分析结果")
+                return cached
+        
+        logger.info(f"开始全量分析，问卷: {survey.get('title')}, 回答数: {len(responses)}")
+        
+        self._progress("stats", f"正在统计 {len(responses)} 份回答")
+        data_report, visualizations = await self._aprepare_data_report(survey, responses)
+        prompt = self._generate_analysis_prompt(data_report)
+        
+        logger.info("调用LLM进行全量分析...")
+        self._progress("llm_report", "正在生成深度分析报告")
         try:
-            messages = [
-                SystemMessage(content="""你是一位资深的数据分析师与战略顾问，拥有10年以上的调研分析经验。
+            response = await self.llm_client.ainvoke(self._report_messages(prompt))
+            return await run_io(
+                self._finish_report, survey_id, survey, responses, fingerprint, response.content, visualizations
+            )
+        except LLMError:
+            raise
+        except Exception as e:
+            logger.error(f"全量分析失败: {e}", exc_info=True)
+            raise RuntimeError(f"全量分析失败: {str(e)}")
+    
+    @staticmethod
+    def _report_messages(prompt: str) -> list:
+        return [
+            SystemMessage(content="""你是一位资深的数据分析师与战略顾问，拥有10年以上的调研分析经验。
 你擅长从数据中发现深层洞察，善于关联不同维度的信息，能够提出具有战略价值的建议。
 你的分析报告必须使用严格的Markdown格式，结构清晰，论据充分，建议可落地。
 
 重要提示：请务必生成完整的报告，不要截断内容。确保所有章节都完整输出。"""),
-                HumanMessage(content=prompt)
-            ]
-            
-            response = self.llm_client.invoke(messages)
-            markdown_report = response.content.strip()
-            
-            # 清理可能的代码块标记
-            if "```markdown" in markdown_report:
-                markdown_report = markdown_report.split("```markdown")[1].split("```")[0].strip()
-            elif "```" in markdown_report:
-                parts = markdown_report.split("```")
-                for part in parts:
-                    if "#" in part and len(part) > 100:
-                        markdown_report = part.strip()
-                        break
-            
-            # 检查报告完整性
-            is_complete = self._check_report_completeness(markdown_report)
-            
-            logger.info(f"全量分析完成，报告长度: {len(markdown_report)} 字符，完整性: {'✓' if is_complete else '✗ 可能不完整'}, 可视化图表数: {len(visualizations)}")
-            
-            if not is_complete:
-                logger.warning("报告可能不完整，建议检查LLM输出")
-                markdown_report += "\n\n---\n\n**⚠️ 注意**: 由于报告内容较多，部分内容可能未完整显示。完整分析结果请下载PDF报告查看。"
-            
-            return {
-                "report_markdown": markdown_report,
-                "visualizations": visualizations,
-                "is_complete": is_complete
-            }
-            
-        except Exception as e:
-            logger.error(f"全量分析失败: {e}", exc_info=True)
-            raise RuntimeError(f"全量分析失败: {str(e)}")
+            HumanMessage(content=prompt)
+        ]
+    
+    def _finish_report(
+        self,
+        survey_id: str,
+        survey: Dict[str, Any],
+        responses: List[Dict[str, Any]],
+        fingerprint: str,
+        content: str,
+        visualizations: Dict[str, str]
+    ) -> Dict[str, Any]:
+        """清理LLM输出、检查完整性并保存结果"""
+        markdown_report = content.strip()
+        
+        # 清理可能的代码块标记
+        if "```markdown" in markdown_report:
+            markdown_report = markdown_report.split("```markdown")[1].split("```")[0].strip()
+        elif "```" in markdown_report:
+            parts = markdown_report.split("```")
+            for part in parts:
+                if "#" in part and len(part) > 100:
+                    markdown_report = part.strip()
+                    break
+        
+        # 检查报告完整性
+        is_complete = self._check_report_completeness(markdown_report)
+        
+        logger.info(f"全量分析完成，报告长度: {len(markdown_report)} 字符，完整性: {'✓' if is_complete else '✗ 可能不完整'}, 可视化图表数: {len(visualizations)}")
+        
+        if not is_complete:
+            logger.warning("报告可能不完整，建议检查LLM输出")
+            markdown_report += "\n\n---\n\n**⚠️ 注意**: 由于报告内容较多，部分内容可能未完整显示。完整分析结果请下载PDF报告查看。"
+        
+        return analysis_cache.store(survey_id, "full", fingerprint, {
+            "survey_id": survey_id,
+            "survey_title": survey.get("title", ""),
+            "total_responses": len(responses),
+            "analysis_type": "全量分析",
+            "status": "success",
+            "report_markdown": markdown_report,
+            "visualizations": visualizations,
+            "is_complete": is_complete
+        })
     
     def _prepare_data_report(
         self, 
         survey: Dict[str, Any], 
         responses: List[Dict[str, Any]]
-    ) -> FullAnalysisDataReport:
+    ) -> Tuple[FullAnalysisDataReport, Dict[str, str]]:
         """
-        准备数据报告：将所有问题的结果统计出来
+        准备数据报告：将所有问题的结果统计出来，并生成对应的可视化图表
         
-        这是关键一步，要把原始数据变成LLM能理解的"故事梗概"
+        这是关键一步，要把原始数据变成LLM能理解的"故事梗概"。
+        量表题/选择题的统计直接在当前线程完成；开放题的定性分析（每题一次LLM调用）和各题图表渲染
+        提交到线程池并发执行（最多 max_concurrency 个），总耗时接近最慢的一次LLM调用而不是各次之和。
+        单题分析或绘图失败只影响该题。
         """
-        question_results = []
-        
-        for question in survey.get("questions", []):
-            q_id = str(question.get("id", ""))
-            q_type = question.get("type", "")
-            q_text = question.get("text", "")
+        # 一次遍历全部回答，构建各问题的列式视图
+        survey_columns = SurveyColumns(survey, responses)
+        columns = survey_columns.answered()
+        intervals = self._estimate_intervals(columns)
+        
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="full-analysis") as pool:
+            # 先提交全部开放题分析，再提交图表任务：线程池按提交顺序取任务，
+            # 图表任务开始执行时所有分析任务都已在运行，等待分析结果不会占满线程池
+            summary_futures = []
+            for column in columns:
+                if column.question_type == OPEN_ENDED:
+                    summary_futures.append(pool.submit(self._generate_result_summary, column))
+                else:
+                    summary = self._generate_result_summary(column)
+                    if summary and column.position in intervals:
+                        summary["confidence_intervals"] = intervals[column.position]
+                    summary_futures.append(_completed(summary))
             
-            # 收集该问题的所有答案
-            answers = []
-            for response in responses:
-                answer_data = response.get("answers", {}).get(q_id)
-                if answer_data is not None:
-                    answers.append(answer_data)
-            
-            if not answers:
-                continue
+            logger.info("生成全量分析可视化图表...")
+            self._progress("charts", "正在生成可视化图表")
+            chart_futures = [
+                pool.submit(self._render_question_charts, i, column, summary_future)
+                for i, (column, summary_future) in enumerate(zip(columns, summary_futures))
+            ]
             
-            # 根据题型生成统计摘要
-            result_summary = self._generate_result_summary(question, answers)
+            question_results = [
+                QuestionResult(
+                    question_title=column.title,
+                    question_type=column.question_type,
+                    response_count=column.response_count,
+                    result_summary=summary_future.result()
+                )
+                for column, summary_future in zip(columns, summary_futures)
+            ]
             
-            question_results.append(QuestionResult(
-                question_title=q_text,
-                question_type=q_type,
-                response_count=len(answers),
-                result_summary=result_summary
-            ))
-        
-        return FullAnalysisDataReport(
+            visualizations = {}
+            for chart_future in chart_futures:
+                visualizations.update(chart_future.result())
+        
+        return self._assemble_data_report(survey, responses, survey_columns, question_results, visualizations)
+    
+    async def _aprepare_data_report(
+        self,
+        survey: Dict[str, Any],
+        responses: List[Dict[str, Any]]
+    ) -> Tuple[FullAnalysisDataReport, Dict[str, str]]:
+        """
+        准备数据报告（异步版本）
+        
+        开放题的定性分析在事件循环中并发（信号量限制为 max_concurrency）；每题的图表在该题摘要就绪后
+        提交到计算线程池渲染，其他题的分析不必等待
+        """
+        survey_columns = await run_compute(SurveyColumns, survey, responses)
+        columns = survey_columns.answered()
+        intervals = await run_compute(self._estimate_intervals, columns)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        async def summarize(column: QuestionColumn) -> Dict[str, Any]:
+            if column.question_type == OPEN_ENDED:
+                async with semaphore:
+                    return await self._agenerate_result_summary(column)
+            summary = await run_compute(self._generate_result_summary, column)
+            if summary and column.position in intervals:
+                summary["confidence_intervals"] = intervals[column.position]
+            return summary
+        
+        async def render(index: int, column: QuestionColumn, summary_task: asyncio.Task) -> Dict[str, str]:
+            summary = await summary_task
+            return await run_compute(self._render_question_charts, index, column, _completed(summary))
+        
+        summary_tasks = [asyncio.ensure_future(summarize(column)) for column in columns]
+        logger.info("生成全量分析可视化图表...")
+        self._progress("charts", "正在生成可视化图表")
+        charts = await asyncio.gather(*(
+            render(i, column, task) for i, (column, task) in enumerate(zip(columns, summary_tasks))
+        ))
+        
+        question_results = [
+            QuestionResult(
+                question_title=column.title,
+                question_type=column.question_type,
+                response_count=column.response_count,
+                result_summary=task.result()
+            )
+            for column, task in zip(columns, summary_tasks)
+        ]
+        visualizations = {}
+        for chart in charts:
+            visualizations.update(chart)
+        
+        return await run_compute(
+            self._assemble_data_report, survey, responses, survey_columns, question_results, visualizations
+        )
+    
+    def _assemble_data_report(
+        self,
+        survey: Dict[str, Any],
+        responses: List[Dict[str, Any]],
+        survey_columns: SurveyColumns,
+        question_results: List[QuestionResult],
+        visualizations: Dict[str, str]
+    ) -> Tuple[FullAnalysisDataReport, Dict[str, str]]:
+        """汇总各题结果，计算题目间关联并生成整体词云"""
+        data_report = FullAnalysisDataReport(
             survey_title=survey.get("title", ""),
             survey_description=survey.get("description", ""),
             total_respondents=len(responses),
-            question_results=question_results
+            question_results=question_results,
+            associations=self._find_associations(survey_columns)
         )
+        
+        # 全局汇总图表依赖所有开放题的分析结果，最后生成
+        overall_wordcloud = self._render_overall_wordcloud(data_report)
+        if overall_wordcloud:
+            visualizations["overall_wordcloud"] = overall_wordcloud
+        logger.info(f"全量分析可视化完成，共生成 {len(visualizations)} 个图表")
+        
+        return data_report, visualizations
     
-    def _generate_result_summary(
-        self, 
-        question: Dict[str, Any], 
-        answers: List[Any]
-    ) -> Dict[str, Any]:
+    def _estimate_intervals(self, columns: List[QuestionColumn]) -> Dict[int, Dict[str, Any]]:
+        """量表题均值（bootstrap）和选项占比（Wilson）的区间估计，所有题一次批量计算；失败时不附带区间"""
+        try:
+            return column_intervals(columns, resamples=self.bootstrap_resamples)
+        except Exception as e:
+            logger.warning(f"区间估计失败: {e}")
+            return {}
+    
+    def _find_associations(self, survey_columns: SurveyColumns) -> List[Dict[str, Any]]:
+        """选择题/量表题两两交叉分析，取关联最强的几组写入提示词；失败不影响报告生成"""
+        try:
+            associations = strongest_associations(survey_columns)
+            logger.info(f"交叉分析完成，显著关联 {len(associations)} 组")
+            return associations
+        except Exception as e:
+            logger.warning(f"交叉分析失败: {e}")
+            return []
+    
+    def _generate_result_summary(self, column: QuestionColumn) -> Dict[str, Any]:
         """
         为不同题型生成统计摘要
         
-        将枯燥的原始数据变成LLM能轻松理解的"故事梗概"
+        将枯燥的原始数据变成LLM能轻松理解的"故事梗概"。
+        量表题/选择题的描述统计在列上用 NumPy 计算（见 survey_columns.describe），开放题调用定性分析。
         """
-        q_type = question.get("type", "")
         summary = {}
         
         try:
-            if q_type == "量表题":
-                # 处理量表题：计算平均分、分布
-                numeric_answers = []
-                for ans in answers:
-                    try:
-                        if isinstance(ans, dict):
-                            val = float(ans.get("value", 0))
-                        else:
-                            val = float(ans)
-                        numeric_answers.append(val)
-                    except (ValueError, TypeError):
-                        continue
-                
-                if numeric_answers:
-                    avg_score = sum(numeric_answers) / len(numeric_answers)
-                    score_counts = Counter(numeric_answers)
-                    
-                    # 判断整体倾向
-                    scale_min = question.get("scale_min", 1)
-                    scale_max = question.get("scale_max", 5)
-                    mid_point = (scale_min + scale_max) / 2
-                    
-                    if avg_score >= mid_point + 1:
-                        tendency = "正面"
-                    elif avg_score <= mid_point - 1:
-                        tendency = "负面"
-                    else:
-                        tendency = "中性"
-                    
-                    summary = {
-                        "average_score": round(avg_score, 2),
-                        "score_distribution": dict(score_counts),
-                        "scale_range": f"{scale_min}-{scale_max}",
-                        "tendency": tendency,
-                        "insight": f"本题平均得分为{avg_score:.2f}（{scale_min}-{scale_max}分），显示出{tendency}的评价倾向。"
-                    }
-            
-            elif q_type == "单选题":
-                # 处理单选题：统计选项分布
-                text_answers = []
-                for ans in answers:
-                    if isinstance(ans, dict):
-                        text_answers.append(ans.get("value", ""))
-                    else:
-                        text_answers.append(str(ans))
-                
-                option_counts = Counter(text_answers)
-                total = len(text_answers)
-                
-                if option_counts:
-                    top_option, top_count = option_counts.most_common(1)[0]
-                    top_percentage = (top_count / total * 100) if total > 0 else 0
-                    
-                    summary = {
-                        "option_distribution": dict(option_counts),
-                        "top_choice": top_option,
-                        "top_percentage": round(top_percentage, 1),
-                        "insight": f"大多数受访者（{top_percentage:.1f}%）选择了「{top_option}」。"
-                    }
-            
-            elif q_type == "多选题":
-                # 处理多选题：展开所有选项计数
-                all_choices = []
-                for ans in answers:
-                    if isinstance(ans, dict):
-                        choices = ans.get("value", [])
-                    else:
-                        choices = ans if isinstance(ans, list) else [ans]
-                    all_choices.extend(choices)
-                
-                option_counts = Counter(all_choices)
-                if option_counts:
-                    top_3 = option_counts.most_common(3)
-                    summary = {
-                        "selection_frequency": dict(option_counts),
-                        "most_selected": [{"option": opt, "count": cnt} for opt, cnt in top_3],
-                        "insight": f"最常被选择的选项是「{top_3[0][0]}」（{top_3[0][1]}次）。"
-                    }
-            
-            elif q_type == "开放式问题":
+            if isinstance(column, TextColumn) and column.question_type == OPEN_ENDED:
                 # 处理开放题：调用定性分析
-                text_answers = []
-                for ans in answers:
-                    if isinstance(ans, dict):
-                        text = ans.get("value", "")
-                    else:
-                        text = str(ans)
-                    if text and text.strip():
-                        text_answers.append(text.strip())
+                text_answers = column.texts()
                 
                 if text_answers:
                     try:
                         # 调用定性分析引擎
+                        self._progress(
+                            "qualitative",
+                            f"正在分析开放题：{column.title[:30]}",
+                            question_id=column.question_id
+                        )
                         qualitative_report = self.qualitative_analyzer.analyze_open_ended_responses(text_answers)
-                        
-                        summary = {
-                            "main_themes": [t.theme for t in qualitative_report.themes[:5]],
-                            "representative_quotes": [t.quote for t in qualitative_report.themes[:3]],
-                            "sentiment_summary": self._summarize_sentiment(qualitative_report.themes),
-                            "insight": qualitative_report.summary[:200] + "..." if len(qualitative_report.summary) > 200 else qualitative_report.summary
-                        }
+                        summary = self._qualitative_summary(qualitative_report)
                     except Exception as e:
                         logger.warning(f"开放题分析失败: {e}")
-                        summary = {
-                            "insight": f"收集到{len(text_answers)}条文本回答。",
-                            "sample_quote": text_answers[0] if text_answers else ""
-                        }
+                        summary = self._text_fallback_summary(text_answers)
+            else:
+                summary = describe(column)
         
         except Exception as e:
             logger.warning(f"生成统计摘要失败: {e}")
-            summary = {"insight": f"该题共收到{len(answers)}个回答。"}
+            summary = {"insight": f"该题共收到{column.response_count}个回答。"}
         
         return summary
     
+    async def _agenerate_result_summary(self, column: QuestionColumn) -> Dict[str, Any]:
+        """开放题的统计摘要（异步版本，调用异步定性分析）"""
+        text_answers = column.texts()
+        if not text_answers:
+            return {}
+        try:
+            self._progress(
+                "qualitative",
+                f"正在分析开放题：{column.title[:30]}",
+                question_id=column.question_id
+            )
+            qualitative_report = await self.qualitative_analyzer.aanalyze_open_ended_responses(text_answers)
+            return self._qualitative_summary(qualitative_report)
+        except Exception as e:
+            logger.warning(f"开放题分析失败: {e}")
+            return self._text_fallback_summary(text_answers)
+    
+    def _qualitative_summary(self, qualitative_report) -> Dict[str, Any]:
+        return {
+            "main_themes": [t.theme for t in qualitative_report.themes[:5]],
+            "theme_counts": [
+                {"theme": t.theme, "count": t.count, "percentage": t.percentage}
+                for t in qualitative_report.themes[:5]
+            ],
+            "representative_quotes": [t.quote for t in qualitative_report.themes[:3]],
+            "sentiment_summary": self._summarize_sentiment(qualitative_report.themes),
+            "insight": qualitative_report.summary[:200] + "..." if len(qualitative_report.summary) > 200 else qualitative_report.summary
+        }
+    
+    @staticmethod
+    def _text_fallback_summary(text_answers: List[str]) -> Dict[str, Any]:
+        return {
+            "insight": f"收集到{len(text_answers)}条文本回答。",
+            "sample_quote": text_answers[0] if text_answers else ""
+        }
+    
     def _summarize_sentiment(self, themes) -> str:
         """总结主题的情感倾向"""
         sentiments = [t.sentiment.value for t in themes]
@@ -345,28 +503,68 @@ class FullAnalysisService:
             if "insight" in summary:
                 prompt += f"   主要发现：{summary['insight']}\n"
             
+            intervals = summary.get("confidence_intervals") or {}
+            level = f"{intervals.get('level', 0.95) * 100:.0f}%置信区间"
+            option_intervals = intervals.get("options", {})
+            
             if q_result.question_type == "量表题" and "average_score" in summary:
-                prompt += f"   平均分：{summary['average_score']} / {summary.get('scale_range', '')}\n"
+                score_line = f"   平均分：{summary['average_score']} / {summary.get('scale_range', '')}"
+                if "average_score" in intervals:
+                    low, high = intervals["average_score"]
+                    score_line += f"（{level} {low}~{high}）"
+                prompt += score_line + "\n"
                 if "score_distribution" in summary:
                     dist = summary['score_distribution']
                     prompt += f"   分数分布：{dist}\n"
             
             elif q_result.question_type == "单选题" and "top_choice" in summary:
-                prompt += f"   首选：{summary['top_choice']} ({summary.get('top_percentage', 0)}%)\n"
+                top_interval = option_intervals.get(summary['top_choice'])
+                interval_text = f"，{level} {top_interval['low']}%~{top_interval['high']}%" if top_interval else ""
+                prompt += f"   首选：{summary['top_choice']} ({summary.get('top_percentage', 0)}%{interval_text})\n"
             
             elif q_result.question_type == "多选题" and "most_selected" in summary:
                 top_items = summary['most_selected'][:3]
-                prompt += f"   高频选项：{', '.join([f'{item['option']}({item['count']}次)' for item in top_items])}\n"
+                item_texts = []
+                for item in top_items:
+                    option_interval = option_intervals.get(item['option'])
+                    if option_interval:
+                        item_texts.append(
+                            f"{item['option']}({item['count']}次，占{option_interval['percentage']}%，"
+                            f"{level} {option_interval['low']}%~{option_interval['high']}%)"
+                        )
+                    else:
+                        item_texts.append(f"{item['option']}({item['count']}次)")
+                prompt += f"   高频选项：{', '.join(item_texts)}\n"
+            
+            if q_result.question_type != "开放式问题" and 0 < q_result.response_count < 30:
+                prompt += "   注意：样本量较小，区间较宽，结论需谨慎\n"
             
             elif q_result.question_type == "开放式问题":
-                if "main_themes" in summary:
+                if summary.get("theme_counts") and summary["theme_counts"][0].get("percentage") is not None:
+                    theme_texts = [f"{item['theme']}({item['percentage']}%)" for item in summary["theme_counts"][:3]]
+                    prompt += f"   核心主题：{', '.join(theme_texts)}\n"
+                elif "main_themes" in summary:
                     prompt += f"   核心主题：{', '.join(summary['main_themes'][:3])}\n"
                 if "representative_quotes" in summary and summary["representative_quotes"]:
                     prompt += f"   典型引述：「{summary['representative_quotes'][0]}」\n"
                 if "sentiment_summary" in summary:
                     prompt += f"   情感倾向：{summary['sentiment_summary']}\n"
         
-        # 3. 定义分析任务和要求
+        # 3. 题目间的显著关联（交叉分析）
+        if data_report.associations:
+            prompt += "\n【题目间关联（交叉分析）】\n"
+            for item in data_report.associations:
+                p_value = item.get("p_value")
+                significance = "" if p_value is None else ("，p<0.001" if p_value < 0.001 else f"，p={p_value:.3f}")
+                prompt += f"- 「{item['row_question']}」×「{item['col_question']}」：Cramér's V={item['cramers_v']:.2f}{significance}\n"
+                highlight = item.get("highlight")
+                if highlight:
+                    prompt += (
+                        f"  其中选择「{highlight['row_label']}」的受访者有 {highlight['row_percentage']}% "
+                        f"选择了「{highlight['col_label']}」（整体为 {highlight['overall_percentage']}%）\n"
+                    )
+        
+        # 4. 定义分析任务和要求
         prompt += """
 
 【你的分析任务】
@@ -481,138 +679,132 @@ class FullAnalysisService:
         
         return True
     
-    def _generate_full_visualizations(
+    def _render_question_charts(
         self,
-        survey: Dict[str, Any],
-        responses: List[Dict[str, Any]],
-        data_report: FullAnalysisDataReport
+        index: int,
+        column: QuestionColumn,
+        summary_future: Future
     ) -> Dict[str, str]:
         """
-        为全量分析生成综合可视化图表
+        为单个问题生成可视化图表（在线程池中执行）
         
         包含：
-        1. 所有量表题的分布图
-        2. 所有选择题的分布图
-        3. 开放题的词云、主题分布、情感分布
+        1. 量表题的分布图
+        2. 选择题的分布图
+        3. 开放题的词云（不依赖分析结果，先绘制）和主题分布（等待该题的定性分析结果）
         
         Args:
-            survey: 问卷数据
-            responses: 回答数据
-            data_report: 数据报告
+            index: 题目序号（从0开始，用于图表键名）
+            column: 该问题的列式数据
+            summary_future: 该问题统计摘要的 Future
             
         Returns:
-            可视化图表字典
+            该题的可视化图表字典
         """
-        visualizations = {}
+        charts = {}
+        i = index
+        q_type = column.question_type
+        q_title = column.title
         
         try:
-            # 1. 处理每个问题，生成对应的可视化
-            for i, q_result in enumerate(data_report.question_results):
-                q_type = q_result.question_type
-                summary = q_result.result_summary
-                
-                # 量表题：生成分布柱状图
-                if q_type == "量表题" and "score_distribution" in summary:
-                    chart = self.viz_service.generate_scale_distribution_chart(
-                        data=summary["score_distribution"],
-                        question_title=q_result.question_title[:30] + "...",  # 截短标题
-                        scale_range=summary.get("scale_range", "1-5")
-                    )
-                    if chart:
-                        visualizations[f"scale_q{i+1}"] = chart
-                        logger.info(f"✓ 量表题 {i+1} 可视化生成成功")
+            # 开放题：生成词云和主题分布
+            if q_type == OPEN_ENDED:
+                text_answers = column.texts()
+                if len(text_answers) < 5:
+                    return charts
                 
-                # 单选题：生成横向柱状图
-                elif q_type == "单选题" and "option_distribution" in summary:
-                    chart = self.viz_service.generate_choice_distribution_chart(
-                        data=summary["option_distribution"],
-                        question_title=q_result.question_title[:30] + "...",
-                        max_items=10
-                    )
-                    if chart:
-                        visualizations[f"single_choice_q{i+1}"] = chart
-                        logger.info(f"✓ 单选题 {i+1} 可视化生成成功")
+                # 生成词云
+                wordcloud = self.viz_service.generate_wordcloud(
+                    text_answers,
+                    title=f"Q{i+1}: {q_title[:20]}..."
+                )
+                if wordcloud:
+                    charts[f"wordcloud_q{i+1}"] = wordcloud
+                    logger.info(f"✓ 开放题 {i+1} 词云生成成功")
                 
-                # 多选题：生成横向柱状图
-                elif q_type == "多选题" and "selection_frequency" in summary:
-                    chart = self.viz_service.generate_choice_distribution_chart(
-                        data=summary["selection_frequency"],
-                        question_title=q_result.question_title[:30] + "...",
-                        max_items=10
+                # 如果已经有主题分析结果，生成主题分布图（计数为归入各主题的实际回答数）
+                summary = summary_future.result()
+                if summary.get("theme_counts"):
+                    themes_with_count = [
+                        {"theme": item["theme"], "count": item["count"]}
+                        for item in summary["theme_counts"]
+                    ]
+                    theme_chart = self.viz_service.generate_theme_distribution_chart(
+                        themes_with_count,
+                        title=f"Q{i+1} 主题分布"
                     )
-                    if chart:
-                        visualizations[f"multiple_choice_q{i+1}"] = chart
-                        logger.info(f"✓ 多选题 {i+1} 可视化生成成功")
-                
-                # 开放题：生成词云和主题分布
-                elif q_type == "开放式问题":
-                    # 收集该题的所有文本答案
-                    question_id = None
-                    for q in survey.get("questions", []):
-                        if q.get("text") == q_result.question_title or q.get("text", "")[:30] == q_result.question_title[:30]:
-                            question_id = str(q.get("id", ""))
-                            break
-                    
-                    if question_id:
-                        text_answers = []
-                        for response in responses:
-                            answer_data = response.get("answers", {}).get(question_id)
-                            if answer_data:
-                                if isinstance(answer_data, dict):
-                                    text = answer_data.get("value", "")
-                                else:
-                                    text = str(answer_data)
-                                if text and text.strip():
-                                    text_answers.append(text.strip())
-                        
-                        if text_answers and len(text_answers) >= 5:
-                            # 生成词云
-                            wordcloud = self.viz_service.generate_wordcloud(
-                                text_answers,
-                                title=f"Q{i+1}: {q_result.question_title[:20]}..."
-                            )
-                            if wordcloud:
-                                visualizations[f"wordcloud_q{i+1}"] = wordcloud
-                                logger.info(f"✓ 开放题 {i+1} 词云生成成功")
-                            
-                            # 如果已经有主题分析结果，生成主题分布图
-                            if "main_themes" in summary and summary["main_themes"]:
-                                # 为主题添加计数信息（简单估算）
-                                themes_with_count = [
-                                    {"theme": theme, "count": len(text_answers) // len(summary["main_themes"])}
-                                    for theme in summary["main_themes"][:5]
-                                ]
-                                theme_chart = self.viz_service.generate_theme_distribution_chart(
-                                    themes_with_count,
-                                    title=f"Q{i+1} 主题分布"
-                                )
-                                if theme_chart:
-                                    visualizations[f"themes_q{i+1}"] = theme_chart
-                                    logger.info(f"✓ 开放题 {i+1} 主题分布图生成成功")
+                    if theme_chart:
+                        charts[f"themes_q{i+1}"] = theme_chart
+                        logger.info(f"✓ 开放题 {i+1} 主题分布图生成成功")
+                return charts
             
-            # 2. 生成全局汇总图表
-            # 统计所有开放题的文本用于生成总体词云
-            all_open_texts = []
-            for q_result in data_report.question_results:
-                if q_result.question_type == "开放式问题":
-                    summary = q_result.result_summary
-                    if "representative_quotes" in summary:
-                        all_open_texts.extend(summary["representative_quotes"])
+            summary = summary_future.result()
             
-            if all_open_texts:
-                overall_wordcloud = self.viz_service.generate_wordcloud(
-                    all_open_texts,
-                    title=f"{data_report.survey_title} - 整体主题词云"
+            # 量表题：生成分布柱状图
+            if q_type == SCALE and "score_distribution" in summary:
+                chart = self.viz_service.generate_scale_distribution_chart(
+                    data=summary["score_distribution"],
+                    question_title=q_title[:30] + "...",  # 截短标题
+                    scale_range=summary.get("scale_range", "1-5")
                 )
-                if overall_wordcloud:
-                    visualizations["overall_wordcloud"] = overall_wordcloud
-                    logger.info("✓ 整体词云生成成功")
+                if chart:
+                    charts[f"scale_q{i+1}"] = chart
+                    logger.info(f"✓ 量表题 {i+1} 可视化生成成功")
             
-            logger.info(f"全量分析可视化完成，共生成 {len(visualizations)} 个图表")
+            # 单选题：生成横向柱状图
+            elif q_type == SINGLE_CHOICE and "option_distribution" in summary:
+                chart = self.viz_service.generate_choice_distribution_chart(
+                    data=summary["option_distribution"],
+                    question_title=q_title[:30] + "...",
+                    max_items=10
+                )
+                if chart:
+                    charts[f"single_choice_q{i+1}"] = chart
+                    logger.info(f"✓ 单选题 {i+1} 可视化生成成功")
+            
+            # 多选题：生成横向柱状图
+            elif q_type == MULTIPLE_CHOICE and "selection_frequency" in summary:
+                chart = self.viz_service.generate_choice_distribution_chart(
+                    data=summary["selection_frequency"],
+                    question_title=q_title[:30] + "...",
+                    max_items=10
+                )
+                if chart:
+                    charts[f"multiple_choice_q{i+1}"] = chart
+                    logger.info(f"✓ 多选题 {i+1} 可视化生成成功")
             
         except Exception as e:
-            logger.warning(f"生成全量分析可视化时出错: {e}", exc_info=True)
+            logger.warning(f"生成第 {i+1} 题可视化时出错: {e}", exc_info=True)
+        
+        return charts
+    
+    def _render_overall_wordcloud(self, data_report: FullAnalysisDataReport) -> str:
+        """用所有开放题的代表性引用生成整体词云"""
+        all_open_texts = []
+        for q_result in data_report.question_results:
+            if q_result.question_type == "开放式问题":
+                summary = q_result.result_summary
+                if "representative_quotes" in summary:
+                    all_open_texts.extend(summary["representative_quotes"])
         
-        return visualizations
+        if not all_open_texts:
+            return ""
+        
+        try:
+            overall_wordcloud = self.viz_service.generate_wordcloud(
+                all_open_texts,
+                title=f"{data_report.survey_title} - 整体主题词云"
+            )
+            if overall_wordcloud:
+                logger.info("✓ 整体词云生成成功")
+            return overall_wordcloud
+        except Exception as e:
+            logger.warning(f"生成整体词云时出错: {e}", exc_info=True)
+            return ""
 
 
+def _completed(value: Any) -> Future:
+    """已完成的 Future（同步计算的统计摘要与并发任务统一处理）"""
+    future = Future()
+    future.set_result(value)
+    return future
@@ -3,34 +3,81 @@
 核心分析模块：从原始文本数据到结构化洞察
 """
 
+import asyncio
 import json
 import logging
-from typing import List, Optional, Dict, Any
-from langchain_dashscope import ChatDashScope
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Dict, Any, Tuple
 from langchain_core.messages import HumanMessage, SystemMessage
 
+from app.core.llm import AsyncChatDashScope
+from app.core.llm_gateway import LLMError
 from app.models.analysis_models import SurveyAnalysisReport, Theme, Sentiment
+from app.utils.async_storage import run_compute
+from app.utils.text_clustering import select_representatives, assign_to_themes
+from app.utils.text_dedup import deduplicate
 
 logger = logging.getLogger(__name__)
 
+SENTIMENT_VALUES = {s.value for s in Sentiment}
+
+# 回答总量（估算token）超过该值时切换为 map-reduce 分析
+MAP_REDUCE_THRESHOLD_TOKENS = int(os.getenv("QUALITATIVE_MAP_REDUCE_THRESHOLD", "6000"))
+# map 阶段每个分块的token预算
+CHUNK_TOKEN_BUDGET = int(os.getenv("QUALITATIVE_CHUNK_TOKENS", "3000"))
+# map 阶段并发调用LLM的分块数
+MAP_CONCURRENCY = int(os.getenv("QUALITATIVE_MAP_CONCURRENCY", "4"))
+# 近似重复回答的 Jaccard 相似度阈值（字符 3-gram），>= 1 时只做精确去重
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("QUALITATIVE_NEAR_DUP_THRESHOLD", "0.8"))
+# 回答数超过该值时先本地聚类，只把各簇的代表性回答交给LLM
+MAX_REPRESENTATIVES = int(os.getenv("QUALITATIVE_MAX_REPRESENTATIVES", "200"))
+
+ANALYSIS_SYSTEM_PROMPT = "你是一位专业的定性分析专家，擅长从文本中提取主题、分析情感倾向并提供行动建议。你必须严格遵循JSON格式输出。"
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数：中文等非ASCII字符约1字1 token，ASCII约4字符1 token"""
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return non_ascii + (len(text) - non_ascii) // 4 + 1
+
 
 class QualitativeAnalyzer:
     """定性分析引擎 - 核心分析类"""
     
-    def __init__(self, llm_model: str = "qwen-flash", temperature: float = 0.7):
+    def __init__(
+        self,
+        llm_model: str = "qwen-flash",
+        temperature: float = 0.7,
+        map_reduce_threshold: int = MAP_REDUCE_THRESHOLD_TOKENS,
+        chunk_token_budget: int = CHUNK_TOKEN_BUDGET,
+        map_concurrency: int = MAP_CONCURRENCY,
+        max_representatives: int = MAX_REPRESENTATIVES,
+        near_duplicate_threshold: float = NEAR_DUPLICATE_THRESHOLD
+    ):
         """
         初始化定性分析器
         
         Args:
             llm_model: LLM模型名称（默认 qwen-flash）
             temperature: 温度参数（控制输出的创造性）
+            map_reduce_threshold: 回答总量（估算token）超过该值时使用 map-reduce 分析
+            chunk_token_budget: map-reduce 时每个分块的token预算
+            map_concurrency: map 阶段并发的LLM调用数
+            max_representatives: 回答数超过该值时先聚类，最多保留的代表性回答数
+            near_duplicate_threshold: 近似重复回答的相似度阈值（>= 1 时只做精确去重）
         """
         self.llm_model = llm_model
         self.temperature = temperature
+        self.map_reduce_threshold = map_reduce_threshold
+        self.chunk_token_budget = chunk_token_budget
+        self.map_concurrency = max(1, map_concurrency)
+        self.max_representatives = max_representatives
+        self.near_duplicate_threshold = near_duplicate_threshold
         
         # 初始化LLM客户端
         try:
-            self.llm_client = ChatDashScope(
+            self.llm_client = AsyncChatDashScope(
                 model=llm_model,
                 temperature=temperature
             )
@@ -50,6 +97,57 @@ class QualitativeAnalyzer:
         Returns:
             SurveyAnalysisReport: 结构化的分析报告
         """
+        unique_responses, counts, cleaned_responses, weights = self._prepare_analysis(responses)
+        
+        # 3. 调用LLM进行主题编码与内容分析（回答量大时分块 map-reduce）
+        if self._use_map_reduce(cleaned_responses):
+            analysis_result = self._perform_map_reduce_analysis(cleaned_responses, weights)
+        else:
+            analysis_result = self._perform_qualitative_analysis(cleaned_responses, weights)
+        
+        # 4. 把全部回答归入最相近的主题，得到实际的主题回答数
+        self._assign_responses_to_themes(analysis_result, unique_responses, counts)
+        
+        logger.info(f"分析完成，识别出 {len(analysis_result.themes)} 个主题")
+        return analysis_result
+    
+    async def aanalyze_open_ended_responses(self, responses: List[str]) -> SurveyAnalysisReport:
+        """
+        核心分析方法（异步版本）
+        
+        LLM 调用使用原生异步接口，map 阶段各分块在事件循环中并发；
+        去重、聚类、主题归类等CPU密集步骤放到计算线程池执行，不阻塞事件循环。
+        
+        Args:
+            responses: 开放题答案列表
+            
+        Returns:
+            SurveyAnalysisReport: 结构化的分析报告
+        """
+        unique_responses, counts, cleaned_responses, weights = await run_compute(
+            self._prepare_analysis, responses
+        )
+        
+        if self._use_map_reduce(cleaned_responses):
+            analysis_result = await self._aperform_map_reduce_analysis(cleaned_responses, weights)
+        else:
+            analysis_result = await self._aperform_qualitative_analysis(cleaned_responses, weights)
+        
+        await run_compute(self._assign_responses_to_themes, analysis_result, unique_responses, counts)
+        
+        logger.info(f"分析完成，识别出 {len(analysis_result.themes)} 个主题")
+        return analysis_result
+    
+    def _prepare_analysis(
+        self,
+        responses: List[str]
+    ) -> Tuple[List[str], List[int], List[str], Optional[List[int]]]:
+        """
+        分析前的本地处理（不调用LLM）
+        
+        Returns:
+            (去重后的回答, 各回答的重复次数, 交给LLM的回答, 交给LLM的回答权重)
+        """
         if not self.llm_client:
             raise RuntimeError("LLM客户端未初始化，请检查API配置")
         
@@ -58,17 +156,70 @@ class QualitativeAnalyzer:
         
         logger.info(f"开始分析 {len(responses)} 条开放题回答")
         
-        # 1. 数据预处理：清洗、去噪、合并
-        cleaned_responses = self._preprocess_responses(responses)
-        logger.info(f"预处理完成，有效回答: {len(cleaned_responses)} 条")
+        # 1. 数据预处理：清洗、去噪、合并（重复回答合并为一条并记录重复次数）
+        unique_responses, counts = self._preprocess_responses(responses)
+        logger.info(f"预处理完成，有效回答: {len(unique_responses)} 条")
+        cleaned_responses = unique_responses
+        weights = counts if any(c > 1 for c in counts) else None
         
-        # 2. 调用LLM进行主题编码与内容分析
-        analysis_result = self._perform_qualitative_analysis(cleaned_responses)
+        # 2. 回答较多时本地聚类，只把各簇的代表性回答和簇大小交给LLM
+        if len(cleaned_responses) > self.max_representatives:
+            representatives = select_representatives(
+                unique_responses, weights=counts, max_representatives=self.max_representatives
+            )
+            cleaned_responses = [text for text, _ in representatives]
+            weights = [size for _, size in representatives]
+            logger.info(f"聚类完成，使用 {len(cleaned_responses)} 条代表性回答")
         
-        logger.info(f"分析完成，识别出 {len(analysis_result.themes)} 个主题")
-        return analysis_result
+        return unique_responses, counts, cleaned_responses, weights
+    
+    def _use_map_reduce(self, responses: List[str]) -> bool:
+        total_tokens = sum(estimate_tokens(r) for r in responses)
+        if total_tokens > self.map_reduce_threshold:
+            logger.info(f"回答总量约 {total_tokens} tokens，超过阈值 {self.map_reduce_threshold}，使用 map-reduce 分析")
+            return True
+        return False
+    
+    def _assign_responses_to_themes(
+        self,
+        report: SurveyAnalysisReport,
+        responses: List[str],
+        counts: List[int]
+    ):
+        """
+        本地向量化归类：每条回答归入相似度最高的主题（不再调用LLM）
+        
+        归类成功时用实际回答数覆盖主题的提及次数，并填写占比和归入的回答；
+        依赖库不可用时保留LLM给出的提及次数。
+        """
+        if not report.themes:
+            return
+        labels = assign_to_themes(
+            responses,
+            [f"{t.theme} {t.description or ''} {t.quote}" for t in report.themes]
+        )
+        if labels is None:
+            return
+        
+        total = sum(counts)
+        theme_counts = [0] * len(report.themes)
+        theme_answers: List[List[str]] = [[] for _ in report.themes]
+        unassigned = 0
+        for text, count, label in zip(responses, counts, labels):
+            if label < 0:
+                unassigned += count
+                continue
+            theme_counts[label] += count
+            theme_answers[label].append(text)
+        
+        for theme, count, answers in zip(report.themes, theme_counts, theme_answers):
+            theme.count = count
+            theme.percentage = round(count / total * 100, 1) if total else 0.0
+            theme.answers = answers
+        report.unassigned_count = unassigned
+        logger.info(f"主题归类完成: {total - unassigned}/{total} 条回答归入 {len(report.themes)} 个主题")
     
-    def _preprocess_responses(self, responses: List[str]) -> List[str]:
+    def _preprocess_responses(self, responses: List[str]) -> Tuple[List[str], List[int]]:
         """
         数据预处理：清洗、去噪、合并
         
@@ -76,7 +227,7 @@ class QualitativeAnalyzer:
             responses: 原始回答列表
             
         Returns:
-            清洗后的回答列表
+            (清洗后的回答列表, 每条回答代表的原始回答数)
         """
         cleaned = []
         
@@ -91,31 +242,83 @@ class QualitativeAnalyzer:
             if len(cleaned_response) < 3:
                 continue
             
-            # 过滤掉重复的回答（简单的去重）
-            if cleaned_response not in cleaned:
-                cleaned.append(cleaned_response)
+            cleaned.append(cleaned_response)
         
-        return cleaned
+        # 过滤掉重复的回答：哈希精确去重 + MinHash/LSH 近似去重，保留重复次数
+        unique, counts, stats = deduplicate(cleaned, threshold=self.near_duplicate_threshold)
+        if stats["exact_duplicates"] or stats["near_duplicates"]:
+            logger.info(
+                f"去重合并了 {stats['input'] - stats['output']} 条回答"
+                f"（完全重复 {stats['exact_duplicates']} 条，近似重复 {stats['near_duplicates']} 条）"
+            )
+        
+        return unique, counts
     
-    def _perform_qualitative_analysis(self, responses: List[str]) -> SurveyAnalysisReport:
+    def _perform_qualitative_analysis(
+        self,
+        responses: List[str],
+        weights: Optional[List[int]] = None
+    ) -> SurveyAnalysisReport:
         """
-        执行定性分析核心逻辑
+        执行定性分析核心逻辑（提示词见 _build_analysis_prompt）
+        
+        Args:
+            responses: 清洗后的回答列表（或聚类得到的代表性回答）
+            weights: 每条回答代表的原始回答数（簇大小），None 表示未聚类
+            
+        Returns:
+            SurveyAnalysisReport: 分析结果
+        """
+        prompt = self._build_analysis_prompt(responses, weights)
+        try:
+            return self._parse_analysis(self._invoke_json(prompt, required_key="themes"), weights)
+        except LLMError:
+            raise
+        except Exception as e:
+            logger.error(f"定性分析执行失败: {e}", exc_info=True)
+            raise RuntimeError(f"定性分析失败: {str(e)}")
+    
+    async def _aperform_qualitative_analysis(
+        self,
+        responses: List[str],
+        weights: Optional[List[int]] = None
+    ) -> SurveyAnalysisReport:
+        """执行定性分析核心逻辑（异步版本）"""
+        prompt = self._build_analysis_prompt(responses, weights)
+        try:
+            return self._parse_analysis(await self._ainvoke_json(prompt, required_key="themes"), weights)
+        except LLMError:
+            raise
+        except Exception as e:
+            logger.error(f"定性分析执行失败: {e}", exc_info=True)
+            raise RuntimeError(f"定性分析失败: {str(e)}")
+    
+    def _build_analysis_prompt(self, responses: List[str], weights: Optional[List[int]] = None) -> str:
+        """
+        构建单次分析的提示词
         
         核心思路：设计强大的提示词，引导LLM一次性完成：
         - 主题编码：识别并归纳核心主题
         - 情感判断工作量：对每个主题进行情感倾向判断
         - 引述提取：找到代表性用户原话
-        - 频次估算：估算主题提及的相对频次
+        - 频次估算：估算主题提及的相对频次（传入 weights 时改为列出每个主题包含的回答编号，
+          提及次数按编号对应的簇大小在本地统计）
         
         Args:
-            responses: 清洗后的回答列表
-            
-        Returns:
-            SurveyAnalysisReport: 分析结果
+            responses: 清洗后的回答列表（或聚类得到的代表性回答）
+            weights: 每条回答代表的原始回答数（簇大小），None 表示未聚类
         """
         # 合并所有回答，形成分析文本
-        combined_text = "\n".join([f"- {resp}" for resp in responses])
-        total_count = len(responses)
+        if weights is None:
+            combined_text = "\n".join([f"- {resp}" for resp in responses])
+            total_count = len(responses)
+            count_requirement = "4. **频次估算**：基于讨论的强度和提及次数，估算每个主题被提及的相对频次（整数，1-10之间）。"
+            members_field = ""
+        else:
+            combined_text = self._format_weighted(responses, weights)
+            total_count = sum(weights)
+            count_requirement = "4. **回答归属**：每条回答前的编号用于归属，括号中是它代表的相似回答数。列出属于每个主题的回答编号（members），提及次数将按这些编号统计。"
+            members_field = ',\n            "members": [0, 5, 12]'
         
         # 构建分析提示词
         prompt = f"""你是一名专业的定性分析专家，拥有超过10年的问卷设计和数据分析经验。请对以下用户反馈进行深入的主题分析和内容分析。
@@ -131,7 +334,7 @@ class QualitativeAnalyzer:
 
 3. **引述提取**：为每个主题找到1-2句最具代表性的用户原话作为引述，确保引述准确反映主题内容。
 
-4. **频次估算**：基于讨论的强度和提及次数，估算每个主题被提及的相对频次（整数，1-10之间）。
+{count_requirement}
 
 5. **主题描述**：为每个主题提供简短的描述性说明。
 
@@ -151,7 +354,7 @@ class QualitativeAnalyzer:
             "sentiment": "positive|negative|neutral",
             "quote": "代表性用户原话引述",
             "count": 5,
-            "description": "主题的简短描述"
+            "description": "主题的简短描述"{members_field}
         }}
     ],
     "recommendation": "具体的行动建议（200-300字），基于分析结果提出可操作的建议"
@@ -164,65 +367,376 @@ class QualitativeAnalyzer:
 - 情感判断要客观准确
 - 建议要具体、可操作
 """
+        return prompt
+    
+    def _parse_analysis(self, result_dict: Dict[str, Any], weights: Optional[List[int]] = None) -> SurveyAnalysisReport:
+        """把LLM输出转换为分析报告"""
+        themes_data = result_dict.get("themes", [])
+        if weights is not None:
+            # 主题提及次数取自簇大小
+            for theme_data in themes_data:
+                count = self._member_count(theme_data, weights)
+                if count is not None:
+                    theme_data["count"] = count
         
+        # 构建报告对象
+        return SurveyAnalysisReport(
+            summary=result_dict.get("summary", ""),
+            themes=self._parse_themes(themes_data),
+            recommendation=result_dict.get("recommendation", "")
+        )
+    
+    @staticmethod
+    def _json_messages(prompt: str) -> list:
+        return [
+            SystemMessage(content=ANALYSIS_SYSTEM_PROMPT),
+            HumanMessage(content=prompt)
+        ]
+    
+    def _invoke_json(self, prompt: str, required_key: str) -> Dict[str, Any]:
+        """调用LLM并解析JSON输出"""
+        response = self.llm_client.invoke(self._json_messages(prompt))
+        return self._parse_json(response.content, required_key)
+    
+    async def _ainvoke_json(self, prompt: str, required_key: str) -> Dict[str, Any]:
+        """调用LLM并解析JSON输出（异步版本）"""
+        response = await self.llm_client.ainvoke(self._json_messages(prompt))
+        return self._parse_json(response.content, required_key)
+    
+    @staticmethod
+    def _parse_json(content: str, required_key: str) -> Dict[str, Any]:
+        """解析LLM输出中的JSON"""
+        content = content.strip()
+        
+        # 清理响应内容：移除可能的Markdown代码块标记
+        if "```json" in content:
+            content = content.split("```json")[1].split("```")[0].strip()
+        elif "```" in content:
+            # 尝试提取JSON部分
+            parts = content.split("```")
+            for part in parts:
+                if "{" in part and required_key in part:
+                    content = part.strip()
+                    break
+        
+        # 解析JSON
         try:
-            # 调用LLM进行分析
-            messages = [
-                SystemMessage(content="你是一位专业的定性分析专家，擅长从文本中提取主题、分析情感倾向并提供行动建议。你必须严格遵循JSON格式输出。"),
-                HumanMessage(content=prompt)
-            ]
-            
-            response = self.llm_client.invoke(messages)
-            content = response.content.strip()
-            
-            # 清理响应内容：移除可能的Markdown代码块标记
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                # 尝试提取JSON部分
-                parts = content.split("```")
-                for part in parts:
-                    if "{" in part and "themes" in part:
-                        content = part.strip()
-                        break
-            
-            # 解析JSON
+            return json.loads(content)
+        except json.JSONDecodeError as e:
+            logger.error(f"JSON解析失败: {e}")
+            logger.error(f"响应内容: {content[:500]}")
+            raise ValueError(f"LLM返回的JSON格式不正确: {str(e)}")
+    
+    @staticmethod
+    def _format_weighted(responses: List[str], weights: List[int]) -> str:
+        """带编号和簇大小的回答列表"""
+        return "\n".join(
+            f"{i}. （代表{w}条相似回答）{resp}" if w > 1 else f"{i}. {resp}"
+            for i, (resp, w) in enumerate(zip(responses, weights))
+        )
+    
+    @staticmethod
+    def _member_count(theme_data: Dict[str, Any], weights: List[int]) -> Optional[int]:
+        """按主题的 members 编号累加回答数；LLM未给出有效编号时返回 None"""
+        members = set()
+        for index in theme_data.get("members") or []:
             try:
-                result_dict = json.loads(content)
-                
-                # 验证和转换数据
-                themes = []
-                for theme_data in result_dict.get("themes", []):
-                    try:
-                        theme = Theme(
-                            theme=theme_data.get("theme", ""),
-                            sentiment=Sentiment(theme_data.get("sentiment", "neutral")),
-                            quote=theme_data.get("quote", ""),
-                            count=theme_data.get("count", 0),
-                            description=theme_data.get("description", "")
-                        )
-                        themes.append(theme)
-                    except Exception as e:
-                        logger.warning(f"主题数据解析失败: {e}, 数据: {theme_data}")
-                        continue
-                
-                # 构建报告对象
-                report = SurveyAnalysisReport(
-                    summary=result_dict.get("summary", ""),
-                    themes=themes,
-                    recommendation=result_dict.get("recommendation", "")
+                index = int(index)
+            except (TypeError, ValueError):
+                continue
+            if 0 <= index < len(weights):
+                members.add(index)
+        if not members:
+            return None
+        return sum(weights[i] for i in members)
+    
+    def _parse_themes(self, themes_data: List[Dict[str, Any]]) -> List[Theme]:
+        """验证和转换主题数据"""
+        themes = []
+        for theme_data in themes_data:
+            try:
+                theme = Theme(
+                    theme=theme_data.get("theme", ""),
+                    sentiment=Sentiment(theme_data.get("sentiment", "neutral")),
+                    quote=theme_data.get("quote", ""),
+                    count=theme_data.get("count", 0),
+                    description=theme_data.get("description", "")
                 )
-                
-                return report
-                
-            except json.JSONDecodeError as e:
-                logger.error(f"JSON解析失败: {e}")
-                logger.error(f"响应内容: {content[:500]}")
-                raise ValueError(f"LLM返回的JSON格式不正确: {str(e)}")
-                
+                themes.append(theme)
+            except Exception as e:
+                logger.warning(f"主题数据解析失败: {e}, 数据: {theme_data}")
+                continue
+        return themes
+    
+    # ==========================================
+    # map-reduce 分析（大量回答）
+    # ==========================================
+    
+    def _chunk_responses(self, items: List[tuple]) -> List[List[tuple]]:
+        """按token预算切分 (回答, 权重) 列表（单条超出预算的回答独占一个分块）"""
+        chunks = []
+        current = []
+        current_tokens = 0
+        for item in items:
+            tokens = estimate_tokens(item[0]) + 8
+            if current and current_tokens + tokens > self.chunk_token_budget:
+                chunks.append(current)
+                current = []
+                current_tokens = 0
+            current.append(item)
+            current_tokens += tokens
+        if current:
+            chunks.append(current)
+        return chunks
+    
+    def _perform_map_reduce_analysis(
+        self,
+        responses: List[str],
+        weights: Optional[List[int]] = None
+    ) -> SurveyAnalysisReport:
+        """
+        map-reduce 定性分析
+        
+        1. map：按token预算分块，各分块并发提取主题，并列出每个主题包含的回答编号，
+           提及次数按编号对应的回答数（聚类时为簇大小）在本地统计
+        2. reduce：LLM只负责把各分块的相似主题归并为最终主题并撰写摘要和建议；
+           最终主题的提及次数由被归并主题的计数在本地相加，代表性引述取自计数最多的分块主题
+        
+        总耗时取决于分块并发度，而不是回答总长度。
+        """
+        weights = weights if weights is not None else [1] * len(responses)
+        chunks = self._chunk_responses(list(zip(responses, weights)))
+        logger.info(f"map-reduce: {len(responses)} 条回答切分为 {len(chunks)} 个分块")
+        
+        with ThreadPoolExecutor(max_workers=min(self.map_concurrency, len(chunks)), thread_name_prefix="qual-map") as pool:
+            futures = [pool.submit(self._map_chunk, chunk) for chunk in chunks]
+            chunk_themes = []
+            llm_error = None
+            for index, future in enumerate(futures):
+                try:
+                    chunk_themes.extend(future.result())
+                except Exception as e:
+                    # 单个分块失败不影响其他分块
+                    logger.warning(f"分块 {index + 1}/{len(chunks)} 主题提取失败: {e}")
+                    if isinstance(e, LLMError):
+                        llm_error = e
+        
+        if not chunk_themes:
+            if llm_error is not None:
+                raise llm_error
+            raise RuntimeError("定性分析失败: 所有分块的主题提取均失败")
+        
+        return self._reduce_themes(chunk_themes, sum(weights))
+    
+    async def _aperform_map_reduce_analysis(
+        self,
+        responses: List[str],
+        weights: Optional[List[int]] = None
+    ) -> SurveyAnalysisReport:
+        """map-reduce 定性分析（异步版本，map 阶段用信号量限制并发的分块数）"""
+        weights = weights if weights is not None else [1] * len(responses)
+        chunks = self._chunk_responses(list(zip(responses, weights)))
+        logger.info(f"map-reduce: {len(responses)} 条回答切分为 {len(chunks)} 个分块")
+        
+        semaphore = asyncio.Semaphore(self.map_concurrency)
+        
+        async def map_chunk(chunk):
+            async with semaphore:
+                return await self._amap_chunk(chunk)
+        
+        results = await asyncio.gather(*(map_chunk(chunk) for chunk in chunks), return_exceptions=True)
+        chunk_themes = []
+        llm_error = None
+        for index, result in enumerate(results):
+            if isinstance(result, BaseException):
+                if not isinstance(result, Exception):
+                    raise result
+                # 单个分块失败不影响其他分块
+                logger.warning(f"分块 {index + 1}/{len(chunks)} 主题提取失败: {result}")
+                if isinstance(result, LLMError):
+                    llm_error = result
+                continue
+            chunk_themes.extend(result)
+        
+        if not chunk_themes:
+            if llm_error is not None:
+                raise llm_error
+            raise RuntimeError("定性分析失败: 所有分块的主题提取均失败")
+        
+        return await self._areduce_themes(chunk_themes, sum(weights))
+    
+    def _map_chunk(self, chunk: List[tuple]) -> List[Dict[str, Any]]:
+        """map：提取单个分块的主题及其在分块内的实际提及次数"""
+        result_dict = self._invoke_json(self._build_map_prompt(chunk), required_key="themes")
+        return self._parse_map_result(result_dict, [weight for _, weight in chunk])
+    
+    async def _amap_chunk(self, chunk: List[tuple]) -> List[Dict[str, Any]]:
+        result_dict = await self._ainvoke_json(self._build_map_prompt(chunk), required_key="themes")
+        return self._parse_map_result(result_dict, [weight for _, weight in chunk])
+    
+    def _build_map_prompt(self, chunk: List[tuple]) -> str:
+        texts = [text for text, _ in chunk]
+        weights = [weight for _, weight in chunk]
+        combined_text = self._format_weighted(texts, weights)
+        prompt = f"""请对以下用户反馈（共 {len(chunk)} 条，每条前为编号，括号中为它代表的相似回答数）进行主题编码。
+
+【分析要求】
+1. 归纳出反馈中出现的主题（2-8个），每个主题用简短的短语概括
+2. 对每个主题判断情感倾向："positive"、"negative" 或 "neutral"
+3. 列出属于每个主题的反馈编号（members）
+4. 为每个主题摘录1句最具代表性的用户原话，必须逐字摘录，不要修改
+5. 为每个主题提供简短的描述
+
+【用户反馈文本】
+
+{combined_text}
+
+【输出要求】
+请严格按照以下JSON格式输出，不要有任何多余的解释或Markdown代码块标记：
+
+{{
+    "themes": [
+        {{
+            "theme": "主题名称",
+            "sentiment": "positive|negative|neutral",
+            "quote": "代表性用户原话",
+            "description": "主题的简短描述",
+            "members": [0, 2, 5]
+        }}
+    ]
+}}
+"""
+        return prompt
+    
+    def _parse_map_result(self, result_dict: Dict[str, Any], weights: List[int]) -> List[Dict[str, Any]]:
+        themes = []
+        for theme_data in result_dict.get("themes", []):
+            if not isinstance(theme_data, dict) or not theme_data.get("theme"):
+                continue
+            count = self._member_count(theme_data, weights) or 0
+            sentiment = theme_data.get("sentiment")
+            themes.append({
+                "theme": str(theme_data.get("theme", "")),
+                "sentiment": sentiment if sentiment in SENTIMENT_VALUES else "neutral",
+                "quote": str(theme_data.get("quote", "")),
+                "count": count,
+                "description": str(theme_data.get("description", ""))
+            })
+        return themes
+    
+    def _reduce_themes(self, chunk_themes: List[Dict[str, Any]], total_count: int) -> SurveyAnalysisReport:
+        """reduce：归并各分块的相似主题，提及次数和引述在本地合并"""
+        chunk_themes = self._merge_same_themes(chunk_themes)
+        try:
+            result_dict = self._invoke_json(self._build_reduce_prompt(chunk_themes, total_count), required_key="themes")
+        except LLMError:
+            raise
         except Exception as e:
             logger.error(f"定性分析执行失败: {e}", exc_info=True)
             raise RuntimeError(f"定性分析失败: {str(e)}")
+        return self._parse_reduce_result(result_dict, chunk_themes)
+    
+    async def _areduce_themes(self, chunk_themes: List[Dict[str, Any]], total_count: int) -> SurveyAnalysisReport:
+        chunk_themes = self._merge_same_themes(chunk_themes)
+        try:
+            result_dict = await self._ainvoke_json(self._build_reduce_prompt(chunk_themes, total_count), required_key="themes")
+        except LLMError:
+            raise
+        except Exception as e:
+            logger.error(f"定性分析执行失败: {e}", exc_info=True)
+            raise RuntimeError(f"定性分析失败: {str(e)}")
+        return self._parse_reduce_result(result_dict, chunk_themes)
+    
+    @staticmethod
+    def _merge_same_themes(chunk_themes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        先在本地合并名称和情感完全相同的候选主题，缩短 reduce 提示词
+        （引述保留单个分块内提及次数最多的那一条）
+        """
+        by_name: Dict[tuple, List[Dict[str, Any]]] = {}
+        for theme in chunk_themes:
+            by_name.setdefault((theme["theme"].strip(), theme["sentiment"]), []).append(theme)
+        return [
+            {
+                **max(group, key=lambda t: t["count"]),
+                "count": sum(t["count"] for t in group)
+            }
+            for group in by_name.values()
+        ]
+    
+    @staticmethod
+    def _build_reduce_prompt(chunk_themes: List[Dict[str, Any]], total_count: int) -> str:
+        theme_lines = "\n".join(
+            f"{i}. {t['theme']}（{t['sentiment']}，提及{t['count']}次）：{t['description']}"
+            for i, t in enumerate(chunk_themes)
+        )
+        prompt = f"""以下是对 {total_count} 条用户反馈分批进行主题编码得到的候选主题（编号. 主题（情感，提及次数）：描述）。
+不同批次中含义相同或相近的主题需要合并。
+
+【候选主题】
+
+{theme_lines}
+
+【分析要求】
+1. 将候选主题归并为3-8个最终主题，每个候选主题只能归入一个最终主题，列出归入的候选主题编号
+2. 为每个最终主题给出名称、情感倾向（"positive"、"negative" 或 "neutral"）和简短描述
+3. 基于全部主题撰写总体摘要（150-200字）和具体的行动建议（200-300字）
+
+【输出要求】
+请严格按照以下JSON格式输出，不要有任何多余的解释或Markdown代码块标记：
+
+{{
+    "summary": "总体摘要",
+    "themes": [
+        {{
+            "theme": "最终主题名称",
+            "sentiment": "positive|negative|neutral",
+            "description": "主题的简短描述",
+            "members": [0, 3, 7]
+        }}
+    ],
+    "recommendation": "行动建议"
+}}
+"""
+        return prompt
+    
+    def _parse_reduce_result(self, result_dict: Dict[str, Any], chunk_themes: List[Dict[str, Any]]) -> SurveyAnalysisReport:
+        merged = []
+        assigned = set()
+        for theme_data in result_dict.get("themes", []):
+            members = []
+            for index in theme_data.get("members", []) or []:
+                try:
+                    index = int(index)
+                except (TypeError, ValueError):
+                    continue
+                if 0 <= index < len(chunk_themes) and index not in assigned:
+                    assigned.add(index)
+                    members.append(chunk_themes[index])
+            if not members:
+                continue
+            # 代表性引述取自提及次数最多的候选主题
+            top = max(members, key=lambda t: t["count"])
+            sentiment = theme_data.get("sentiment")
+            merged.append({
+                "theme": theme_data.get("theme") or top["theme"],
+                "sentiment": sentiment if sentiment in SENTIMENT_VALUES else top["sentiment"],
+                "quote": top["quote"],
+                "count": sum(t["count"] for t in members),
+                "description": theme_data.get("description") or top["description"]
+            })
+        
+        # LLM遗漏的候选主题单独保留，避免丢失提及次数
+        for index, theme in enumerate(chunk_themes):
+            if index not in assigned:
+                merged.append(dict(theme))
+        
+        merged.sort(key=lambda t: t["count"], reverse=True)
+        return SurveyAnalysisReport(
+            summary=result_dict.get("summary", ""),
+            themes=self._parse_themes(merged),
+            recommendation=result_dict.get("recommendation", "")
+        )
     
     def analyze_by_dimensions(
         self, 
@@ -300,7 +814,7 @@ class QualitativeAnalyzer:
 - **情感倾向**: 积极（Positive）
 - **代表性引述**: 
   > "{theme.quote}"
-- **提及频次**: {theme.count}
+- **提及频次**: {self._format_count(theme)}
 - **说明**: {theme.description or "无"}
 
 """
@@ -314,7 +828,7 @@ class QualitativeAnalyzer:
 - **情感倾向**: 消极（Negative）
 - **代表性引述**: 
   > "{theme.quote}"
-- **提及频次**: {theme.count}
+- **提及频次**: {self._format_count(theme)}
 - **说明**: {theme.description or "无"}
 
 """
@@ -328,7 +842,7 @@ class QualitativeAnalyzer:
 - **情感倾向**: 中性（Neutral）
 - **代表性引述**: 
   > "{theme.quote}"
-- **提及频次**: {theme.count}
+- **提及频次**: {self._format_count(theme)}
 - **说明**: {theme.description or "无"}
 
 """
@@ -346,6 +860,13 @@ class QualitativeAnalyzer:
         
         return markdown
     
+    @staticmethod
+    def _format_count(theme: Theme) -> str:
+        """提及频次（有归类结果时附带占比）"""
+        if theme.percentage is None:
+            return str(theme.count)
+        return f"{theme.count}（{theme.percentage}%）"
+    
     def _get_current_time(self) -> str:
         """获取当前时间字符串"""
         from datetime import datetime
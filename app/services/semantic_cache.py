@@ -0,0 +1,315 @@
+"""
+问卷语义缓存
+用知识库同一个 DashScopeEmbeddings 实例对用户需求做向量化，在本地的小型向量索引（NumPy 矩阵，
+持久化为单个 .npz 文件）中查找语义相近的历史需求，余弦相似度超过阈值时直接复用已生成的问卷：
+- 作用域：按用户（或全局）隔离，只在同一作用域内匹配
+- 失效：记录生成时的 RAG 语料版本（rag_materials/.rag_index.json 的内容摘要），语料变化后旧条目不再命中
+- 容量：超过上限时淘汰最久未命中的条目
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+from app.core.llm_gateway import llm_gateway
+
+logger = logging.getLogger(__name__)
+
+RAG_INDEX_FILE = Path("rag_materials") / ".rag_index.json"
+
+
+def rag_corpus_version(index_file: Path = RAG_INDEX_FILE) -> str:
+    """RAG 语料版本：索引中各语料文件哈希的摘要（没有索引时为空字符串）"""
+    try:
+        with open(index_file, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return ""
+    files = sorted(
+        (name, info.get("hash", "")) for name, info in index.items()
+        if not name.startswith('_') and isinstance(info, dict)
+    )
+    return hashlib.sha1(json.dumps(files, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class SemanticSurveyCache:
+    """问卷语义缓存
+
+    条目：需求文本、作用域、语料版本、问卷、创建/最近命中时间、命中次数；
+    向量单独保存为已归一化的矩阵，查询为一次矩阵-向量乘法。
+    """
+
+    def __init__(
+        self,
+        embeddings,
+        path: str = "data/semantic_cache.npz",
+        threshold: float = 0.92,
+        max_entries: int = 500,
+        ttl_seconds: float = 30 * 24 * 3600,
+        index_file: Path = RAG_INDEX_FILE
+    ):
+        """
+        初始化语义缓存
+
+        Args:
+            embeddings: 向量化模型（与 SurveyVectorStore 共用的 DashScopeEmbeddings）
+            path: 持久化文件路径
+            threshold: 命中所需的最低余弦相似度
+            max_entries: 最多保存的条目数
+            ttl_seconds: 条目有效期（秒），<= 0 表示不过期
+            index_file: RAG 语料索引文件（用于计算语料版本）
+        """
+        self.embeddings = embeddings
+        # 向量化调用走 LLM 网关，按向量化模型名使用独立的限流器（与对话模型互不占用名额）
+        self.embedding_model = getattr(embeddings, "model", None) or "text-embedding-v3"
+        self.path = Path(path)
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.index_file = Path(index_file)
+
+        self._lock = threading.Lock()
+        self._entries: List[Dict[str, Any]] = []
+        self._matrix: Optional[np.ndarray] = None
+        self._loaded = False
+        # 最近向量化过的需求（查询未命中后保存结果时不再重复调用向量化接口）
+        self._recent_vectors: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        # 语料版本按索引文件的 (mtime, size) 缓存
+        self._corpus_stat: Optional[tuple] = None
+        self._corpus_version = ""
+        self._counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "invalidations": 0, "errors": 0}
+        self._saved_seconds = 0.0
+
+    # ==========================================
+    # 语料版本与持久化
+    # ==========================================
+
+    def corpus_version(self) -> str:
+        try:
+            stat = os.stat(self.index_file)
+            key = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            key = None
+        if key != self._corpus_stat:
+            self._corpus_version = rag_corpus_version(self.index_file) if key else ""
+            self._corpus_stat = key
+        return self._corpus_version
+
+    def _load(self):
+        """第一次使用时从磁盘加载（调用方持有锁）"""
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.path.exists():
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                entries = json.loads(str(data["entries"]))
+                matrix = data["vectors"]
+            if len(entries) == len(matrix):
+                self._entries, self._matrix = entries, matrix.astype(np.float32)
+        except Exception as e:
+            logger.warning(f"加载语义缓存失败 {self.path}: {e}")
+
+    def _save(self):
+        """写入临时文件后原子替换（调用方持有锁）"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        matrix = self._matrix if self._matrix is not None else np.zeros((0, 0), dtype=np.float32)
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, vectors=matrix, entries=np.array(json.dumps(self._entries, ensure_ascii=False)))
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"保存语义缓存失败 {self.path}: {e}")
+
+    def _remove(self, indices: List[int]):
+        """删除指定条目（调用方持有锁）"""
+        if not indices:
+            return
+        drop = set(indices)
+        keep = [i for i in range(len(self._entries)) if i not in drop]
+        self._entries = [self._entries[i] for i in keep]
+        self._matrix = self._matrix[keep] if keep else None
+
+    def _prune(self, now: float, version: str) -> bool:
+        """删除语料版本已变化或过期的条目（调用方持有锁），返回是否有删除"""
+        stale = [
+            i for i, entry in enumerate(self._entries)
+            if entry["corpus_version"] != version
+            or (self.ttl_seconds > 0 and now - entry["created_at"] > self.ttl_seconds)
+        ]
+        self._remove(stale)
+        self._counters["invalidations"] += len(stale)
+        return bool(stale)
+
+    # ==========================================
+    # 查询与保存
+    # ==========================================
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = self._recent_vectors.get(text)
+        if vector is None:
+            vector = np.asarray(
+                llm_gateway.call(self.embedding_model, lambda: self.embeddings.embed_query(text)),
+                dtype=np.float32
+            )
+            norm = np.linalg.norm(vector)
+            vector = vector / norm if norm > 0 else vector
+            with self._lock:
+                self._recent_vectors[text] = vector
+                while len(self._recent_vectors) > 64:
+                    self._recent_vectors.popitem(last=False)
+        return vector
+
+    def lookup(self, prompt: str, scope: str = "") -> Optional[Dict[str, Any]]:
+        """
+        查找语义相近的历史需求（阻塞：可能调用向量化接口）
+
+        Args:
+            prompt: 用户需求
+            scope: 作用域（如用户名；空字符串为全局）
+
+        Returns:
+            命中时返回 {"survey", "similarity", "prompt"}（问卷为副本），否则 None
+        """
+        prompt = (prompt or "").strip()
+        if not prompt:
+            return None
+        now = time.time()
+        version = self.corpus_version()
+        with self._lock:
+            self._load()
+            if self._prune(now, version):
+                self._save()
+            candidates = [i for i, entry in enumerate(self._entries) if entry["scope"] == scope]
+        if not candidates:
+            # 作用域内没有条目时不调用向量化接口
+            with self._lock:
+                self._counters["misses"] += 1
+            return None
+
+        try:
+            vector = self._embed(prompt)
+        except Exception as e:
+            logger.warning(f"需求向量化失败，跳过语义缓存: {e}")
+            with self._lock:
+                self._counters["errors"] += 1
+            return None
+
+        with self._lock:
+            # 等待向量化期间条目可能已变化，重新筛选
+            candidates = [i for i, entry in enumerate(self._entries) if entry["scope"] == scope]
+            if not candidates or self._matrix is None or self._matrix.shape[1] != len(vector):
+                self._counters["misses"] += 1
+                return None
+            similarities = self._matrix[candidates] @ vector
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            if similarity < self.threshold:
+                self._counters["misses"] += 1
+                return None
+            entry = self._entries[candidates[best]]
+            entry["hits"] += 1
+            entry["accessed_at"] = now
+            self._counters["hits"] += 1
+            self._saved_seconds += entry.get("latency", 0.0)
+            logger.info(f"命中语义缓存: '{prompt[:30]}' ~ '{entry['prompt'][:30]}' (相似度 {similarity:.3f})")
+            return {
+                "survey": json.loads(json.dumps(entry["survey"], ensure_ascii=False)),
+                "similarity": round(similarity, 4),
+                "prompt": entry["prompt"]
+            }
+
+    def store(self, prompt: str, survey: Dict[str, Any], scope: str = "", latency: float = 0.0):
+        """
+        保存生成的问卷（阻塞：未缓存向量时调用向量化接口）
+
+        Args:
+            prompt: 用户需求（与 lookup 使用相同的文本）
+            survey: 生成的问卷
+            scope: 作用域
+            latency: 生成耗时（秒），命中时累计为节省的时间
+        """
+        prompt = (prompt or "").strip()
+        if not prompt or not survey or not survey.get("questions"):
+            return
+        try:
+            vector = self._embed(prompt)
+        except Exception as e:
+            logger.warning(f"需求向量化失败，未保存到语义缓存: {e}")
+            with self._lock:
+                self._counters["errors"] += 1
+            return
+
+        now = time.time()
+        entry = {
+            "prompt": prompt,
+            "scope": scope,
+            "corpus_version": self.corpus_version(),
+            # 保存副本，调用方之后修改问卷不影响缓存
+            "survey": json.loads(json.dumps(survey, ensure_ascii=False)),
+            "latency": round(latency, 3),
+            "created_at": now,
+            "accessed_at": now,
+            "hits": 0
+        }
+        with self._lock:
+            self._load()
+            if self._matrix is not None and self._matrix.shape[1] != len(vector):
+                # 向量化模型变化，旧向量不可比较
+                self._entries, self._matrix = [], None
+            # 同一作用域内相同需求只保留最新一条
+            self._remove([i for i, e in enumerate(self._entries) if e["scope"] == scope and e["prompt"] == prompt])
+            self._entries.append(entry)
+            row = vector[np.newaxis, :]
+            self._matrix = row if self._matrix is None else np.vstack([self._matrix, row])
+            if len(self._entries) > self.max_entries:
+                # 淘汰最久未命中的条目
+                order = sorted(range(len(self._entries)), key=lambda i: self._entries[i]["accessed_at"])
+                evicted = order[:len(self._entries) - self.max_entries]
+                self._remove(evicted)
+                self._counters["evictions"] += len(evicted)
+            self._counters["stores"] += 1
+            self._save()
+
+    def invalidate(self, scope: Optional[str] = None):
+        """清除指定作用域（默认全部）的条目"""
+        with self._lock:
+            self._load()
+            removed = [i for i, e in enumerate(self._entries) if scope is None or e["scope"] == scope]
+            self._remove(removed)
+            self._counters["invalidations"] += len(removed)
+            self._save()
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                "enabled": True,
+                **self._counters,
+                "hit_rate": round(self._counters["hits"] / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "saved_seconds": round(self._saved_seconds, 2)
+            }
+
+
+def create_semantic_cache(embeddings) -> SemanticSurveyCache:
+    """按环境变量创建语义缓存"""
+    return SemanticSurveyCache(
+        embeddings,
+        path=os.getenv("SEMANTIC_CACHE_PATH", "data/semantic_cache.npz"),
+        threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92")),
+        max_entries=int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "500")),
+        ttl_seconds=float(os.getenv("SEMANTIC_CACHE_TTL_DAYS", "30")) * 24 * 3600
+    )
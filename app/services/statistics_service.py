@@ -0,0 +1,181 @@
+"""
+问卷统计分析服务
+按问卷缓存列式视图（SurveyColumns），交叉分析、量表题相关分析等统计接口直接在缓存的列上计算；
+只有新增答案时读取新答案扩展缓存的视图，问卷定义变化或答案数对不上时才重新构建
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+from app.services.analysis_cache import compute_fingerprint
+from app.services.visualization_service import VisualizationService
+from app.utils.crosstab import crosstab
+from app.utils.scale_correlation import correlation_analysis
+from app.utils.response_saver import get_response_store
+from app.utils.survey_cache import survey_cache
+from app.utils.survey_columns import SurveyColumns
+
+logger = logging.getLogger(__name__)
+
+
+class SurveyColumnsCache:
+    """问卷列式视图的 LRU 缓存
+
+    以问卷ID为键，命中时用"问卷定义 + 答案数 + 最近提交时间"的指纹校验（O(1)，不加载回答）。
+    问卷定义未变、只有新增答案时，只读取缓存视图之后的新答案并拼接到已有的列上；
+    读到的新答案数与答案总数对不上（例如提交时间相同、数据被改写）时才全量遍历。
+    """
+
+    def __init__(self, max_entries: int = 4):
+        self.max_entries = max_entries
+        # 问卷ID -> (指纹, 问卷定义指纹, 构建时的最近提交时间, 列式视图)
+        self._entries: "OrderedDict[str, Tuple[str, str, Optional[str], SurveyColumns]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # 同一问卷同时只构建一次，其他请求等待构建结果
+        self._build_locks: Dict[str, threading.Lock] = {}
+        self._counters = {"hits": 0, "misses": 0, "extensions": 0, "evictions": 0}
+
+    def get(self, survey_id: str) -> SurveyColumns:
+        """
+        获取问卷的列式视图
+
+        Raises:
+            FileNotFoundError: 问卷不存在
+        """
+        survey = survey_cache.get(survey_id)
+        if not survey:
+            raise FileNotFoundError(f"问卷不存在: {survey_id}")
+        store = get_response_store()
+
+        with self._lock:
+            build_lock = self._build_locks.setdefault(survey_id, threading.Lock())
+
+        with build_lock:
+            summary = store.get_response_summary(survey_id)
+            response_count = summary.get("response_count", 0)
+            last_submitted_at = summary.get("last_submitted_at")
+            fingerprint = compute_fingerprint(survey, response_count, last_submitted_at, "columns")
+            survey_digest = compute_fingerprint(survey, 0, None, "columns")
+            with self._lock:
+                entry = self._entries.get(survey_id)
+                if entry is not None and entry[0] == fingerprint:
+                    self._entries.move_to_end(survey_id)
+                    self._counters["hits"] += 1
+                    return entry[3]
+                self._counters["misses"] += 1
+
+            start = time.perf_counter()
+            columns = None
+            if entry is not None and entry[1] == survey_digest and response_count > entry[3].total_responses:
+                columns = self._extend(store, survey_id, entry[3], entry[2], response_count)
+            if columns is not None:
+                with self._lock:
+                    self._counters["extensions"] += 1
+                logger.info(
+                    f"扩展问卷列式视图: {survey_id}, 新增 {columns.total_responses - entry[3].total_responses} 份回答, "
+                    f"耗时 {time.perf_counter() - start:.2f}s"
+                )
+            else:
+                columns = SurveyColumns(survey, store.get_responses(survey_id))
+                logger.info(
+                    f"构建问卷列式视图: {survey_id}, {columns.total_responses} 份回答, "
+                    f"耗时 {time.perf_counter() - start:.2f}s"
+                )
+
+            with self._lock:
+                self._entries[survey_id] = (fingerprint, survey_digest, last_submitted_at, columns)
+                self._entries.move_to_end(survey_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self._counters["evictions"] += 1
+            return columns
+
+    @staticmethod
+    def _extend(
+        store,
+        survey_id: str,
+        columns: SurveyColumns,
+        last_submitted_at: Optional[str],
+        response_count: int
+    ) -> Optional[SurveyColumns]:
+        """读取缓存视图之后的新答案并扩展视图；新答案数与答案总数对不上时返回 None（改为全量构建）"""
+        new_responses = list(store.iter_new_responses(survey_id, columns.total_responses, last_submitted_at))
+        if columns.total_responses + len(new_responses) != response_count:
+            logger.info(
+                f"问卷 {survey_id} 新增答案数与答案总数不一致"
+                f"（{columns.total_responses} + {len(new_responses)} != {response_count}），全量重建列式视图"
+            )
+            return None
+        return columns.extended(new_responses)
+
+    def invalidate(self, survey_id: str):
+        with self._lock:
+            self._entries.pop(survey_id, None)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                **self._counters
+            }
+
+
+def crosstab_survey(survey_id: str, row_question_id: str, col_question_id: str) -> Dict[str, Any]:
+    """
+    问卷中两个问题的交叉分析（列联表、行/列百分比、卡方检验、Cramér's V）
+
+    Raises:
+        FileNotFoundError: 问卷不存在
+        KeyError: 问题不存在
+        ValueError: 题型不支持交叉分析
+    """
+    columns = survey_columns_cache.get(survey_id)
+    row_column = columns.get(row_question_id)
+    col_column = columns.get(col_question_id)
+    for question_id, column in ((row_question_id, row_column), (col_question_id, col_column)):
+        if column is None:
+            raise KeyError(f"问题不存在: {question_id}")
+
+    result = crosstab(row_column, col_column)
+    result["survey_id"] = survey_id
+    result["total_responses"] = columns.total_responses
+    return result
+
+
+def scale_correlations(
+    survey_id: str,
+    target_question_id: Optional[str] = None,
+    heatmap: bool = True
+) -> Dict[str, Any]:
+    """
+    量表题的 Pearson/Spearman 相关矩阵、缺失情况和关键驱动因素排序
+
+    Args:
+        survey_id: 问卷ID
+        target_question_id: 总体满意度题的ID（默认按标题识别）
+        heatmap: 是否生成 Pearson 相关矩阵热力图
+
+    Raises:
+        FileNotFoundError: 问卷不存在
+        ValueError: 有效量表题不足2个，或目标题无效
+    """
+    columns = survey_columns_cache.get(survey_id)
+    result = correlation_analysis(columns, target_question_id)
+    result["survey_id"] = survey_id
+    if heatmap:
+        result["heatmap"] = VisualizationService().generate_correlation_heatmap(
+            [q["title"] for q in result["questions"]],
+            result["pearson"]
+        )
+    return result
+
+
+# 全局实例
+survey_columns_cache = SurveyColumnsCache(
+    max_entries=int(os.getenv("SURVEY_COLUMNS_CACHE_SIZE", "4"))
+)
@@ -5,11 +5,15 @@
 """
 
 import json
-from typing import Dict, Any, Optional, Tuple, List
+import time
+from typing import Dict, Any, Optional, Tuple, List, AsyncIterator
 from dotenv import load_dotenv
 
 from app.core.vector_store import SurveyVectorStore
 from app.chains.survey_creation_chain import SurveyCreationChain
+from app.services.semantic_cache import create_semantic_cache
+from app.utils.async_storage import run_io, run_compute
+from app.utils.llm_cache import llm_response_cache, make_cache_key
 from langchain_core.documents import Document
 
 
@@ -24,7 +28,9 @@ class SurveyService:
         vector_store_dir: str = "./data/chroma_db",
         llm_model: str = "qwen-max",
         temperature: float = 0.7,
-        retrieval_k: int = 3
+        retrieval_k: int = 3,
+        cache_responses: bool = False,
+        semantic_cache: bool = False
     ):
         """
         初始化问卷服务
@@ -34,7 +40,13 @@ class SurveyService:
             llm_model: LLM模型名称
             temperature: 温度参数
             retrieval_k: RAG检索返回的文档数量
+            cache_responses: 需求扩写和问卷生成是否默认使用LLM响应缓存（各方法可用 use_cache 单独指定）；
+                两者温度都大于0，开启后相同需求会复用第一次的输出
+            semantic_cache: 是否启用问卷语义缓存（语义相近的需求复用已生成的问卷，
+                只对传入 scope 的调用生效）
         """
+        self.cache_responses = cache_responses
+
         # 初始化向量存储
         self.vector_store = SurveyVectorStore(
             persist_directory=vector_store_dir,
@@ -52,6 +64,9 @@ class SurveyService:
             print("To enable RAG, run: python init_vector_store.py")
             self.has_vector_store = False
         
+        # 语义缓存与知识库共用同一个向量化模型
+        self.semantic_cache = create_semantic_cache(self.vector_store.embeddings) if semantic_cache else None
+        
         # 初始化问卷创建链
         # 使用更快的模型进行生成
         generation_model = "qwen-flash" if llm_model == "qwen-max" else llm_model
@@ -62,26 +77,16 @@ class SurveyService:
             retrieval_k=retrieval_k
         )
         
-        # 初始化需求扩写链
-        from langchain_dashscope import ChatDashScope
-        self.enhancement_llm = ChatDashScope(
+        # 初始化需求扩写链（支持原生异步调用）
+        from app.core.llm import AsyncChatDashScope
+        self.enhancement_llm = AsyncChatDashScope(
             model=llm_model,
             temperature=0.5  # 较低温度确保扩写更稳定
         )
     
-    def enhance_requirement(self, user_input: str) -> str:
-        """
-        需求扩写：作为行业专家帮助用户改写和完善需求
-        
-        Args:
-            user_input: 用户的原始需求
-            
-        Returns:
-            扩写后的需求
-        """
-        print(f"\n开始需求扩写...")
-        print(f"原始需求: {user_input}")
-        
+    @staticmethod
+    def _enhancement_messages(user_input: str):
+        """需求扩写的提示词消息"""
         from langchain_core.prompts import ChatPromptTemplate
         
         enhancement_prompt = ChatPromptTemplate.from_messages([
@@ -96,25 +101,182 @@ class SurveyService:
 用专业且易懂的语言重述需求。"""),
             ("user", "用户需求：{user_input}")
         ])
+        return enhancement_prompt.format_messages(user_input=user_input)
+    
+    def _enhancement_cache_key(self, user_input: str) -> str:
+        return make_cache_key(
+            "enhance",
+            user_input,
+            self.enhancement_llm.model,
+            self.enhancement_llm.temperature
+        )
+    
+    def enhance_requirement(self, user_input: str, use_cache: Optional[bool] = None) -> str:
+        """
+        需求扩写：作为行业专家帮助用户改写和完善需求
+        
+        Args:
+            user_input: 用户的原始需求
+            use_cache: 是否使用LLM响应缓存（默认取 cache_responses）
+            
+        Returns:
+            扩写后的需求
+        """
+        print(f"\n开始需求扩写...")
+        print(f"原始需求: {user_input}")
+        
+        use_cache = self.cache_responses if use_cache is None else use_cache
+        cache_key = self._enhancement_cache_key(user_input) if use_cache else None
+        if cache_key is not None:
+            cached = llm_response_cache.get(cache_key)
+            if cached is not None:
+                print(f"[OK] 命中LLM缓存，复用扩写结果")
+                return cached
+        
+        try:
+            start = time.perf_counter()
+            result = self.enhancement_llm.invoke(self._enhancement_messages(user_input))
+            
+            enhanced_text = result.content if hasattr(result, 'content') else str(result)
+            print(f"[OK] 扩写完成")
+            print(f"扩写结果: {enhanced_text}")
+            
+            if cache_key is not None and enhanced_text:
+                llm_response_cache.put(cache_key, enhanced_text, "enhance", time.perf_counter() - start)
+            return enhanced_text
+            
+        except Exception as e:
+            print(f"[ERROR] 需求扩写失败，使用原始输入: {e}")
+            return user_input
+    
+    async def aenhance_requirement(self, user_input: str, use_cache: Optional[bool] = None) -> str:
+        """需求扩写（异步版本，LLM 调用不占用线程池）"""
+        print(f"\n开始需求扩写...")
+        print(f"原始需求: {user_input}")
+        
+        use_cache = self.cache_responses if use_cache is None else use_cache
+        cache_key = self._enhancement_cache_key(user_input) if use_cache else None
+        if cache_key is not None:
+            cached = await run_io(llm_response_cache.get, cache_key)
+            if cached is not None:
+                print(f"[OK] 命中LLM缓存，复用扩写结果")
+                return cached
         
         try:
-            messages = enhancement_prompt.format_messages(user_input=user_input)
-            result = self.enhancement_llm.invoke(messages)
+            start = time.perf_counter()
+            result = await self.enhancement_llm.ainvoke(self._enhancement_messages(user_input))
             
             enhanced_text = result.content if hasattr(result, 'content') else str(result)
             print(f"[OK] 扩写完成")
             print(f"扩写结果: {enhanced_text}")
             
+            if cache_key is not None and enhanced_text:
+                await run_io(
+                    llm_response_cache.put, cache_key, enhanced_text, "enhance", time.perf_counter() - start
+                )
             return enhanced_text
             
         except Exception as e:
             print(f"[ERROR] 需求扩写失败，使用原始输入: {e}")
             return user_input
     
+    @staticmethod
+    def _is_valid_question(q: Any) -> bool:
+        """问题是否有效（有题干；选择题至少2个选项；量表题有范围）"""
+        if not isinstance(q, dict) or not q.get('text'):
+            print(f"警告: 跳过无效问题（无文本）")
+            return False
+        
+        qtype = q.get('type', '')
+        # 验证选择题必须有选项
+        if qtype in ['单选题', '多选题']:
+            if not q.get('options') or len(q.get('options', [])) < 2:
+                print(f"警告: 跳过无效问题 {q.get('text', '')[:50]}...（选项不足）")
+                return False
+        
+        # 验证量表题必须有范围
+        if qtype == '量表题':
+            if not q.get('scale_min') or not q.get('scale_max'):
+                print(f"警告: 跳过无效问题 {q.get('text', '')[:50]}...（量表范围未定义）")
+                return False
+        
+        return True
+    
+    @staticmethod
+    def _validate_survey(survey: Dict[str, Any]) -> Dict[str, Any]:
+        """验证生成的问卷：过滤无效问题并重新分配连续的题号"""
+        if not survey or not isinstance(survey, dict):
+            raise ValueError("返回的问卷格式不正确")
+        
+        if 'questions' not in survey or not survey.get('questions'):
+            raise ValueError("问卷中没有包含任何问题")
+        
+        # 验证每个问题的有效性
+        valid_questions = [q for q in survey.get('questions', []) if SurveyService._is_valid_question(q)]
+        
+        if not valid_questions:
+            raise ValueError("所有生成的问题都无效")
+        
+        # 重新分配连续的题号
+        for i, question in enumerate(valid_questions):
+            question['id'] = i + 1
+        
+        survey['questions'] = valid_questions
+        print(f"[OK] 问卷生成完成，包含 {len(valid_questions)} 个有效问题")
+        
+        return survey
+    
+    def find_similar_survey(self, prompt: str, scope: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        在语义缓存中查找相近需求生成过的问卷（阻塞：可能调用向量化接口）
+        
+        Args:
+            prompt: 用户需求（原始输入，未扩写）
+            scope: 作用域（如用户名）；None 表示不使用语义缓存
+            
+        Returns:
+            {"survey", "similarity", "prompt"}，未启用或未命中时返回 None
+        """
+        if self.semantic_cache is None or scope is None:
+            return None
+        hit = self.semantic_cache.lookup(prompt, scope)
+        if hit is not None:
+            print(f"[OK] 命中语义缓存（相似度 {hit['similarity']:.3f}），复用需求「{hit['prompt'][:50]}」的问卷")
+        return hit
+    
+    async def afind_similar_survey(self, prompt: str, scope: Optional[str]) -> Optional[Dict[str, Any]]:
+        """在语义缓存中查找相近需求生成过的问卷（异步版本，向量化调用和相似度计算放到计算线程池，不占用存储 I/O 线程）"""
+        if self.semantic_cache is None or scope is None:
+            return None
+        return await run_compute(self.find_similar_survey, prompt, scope)
+    
+    def remember_survey(self, prompt: str, survey: Dict[str, Any], scope: Optional[str], latency: float = 0.0):
+        """把生成的问卷保存到语义缓存（阻塞；未启用或 scope 为 None 时不保存）"""
+        if self.semantic_cache is None or scope is None:
+            return
+        self.semantic_cache.store(prompt, survey, scope, latency)
+    
+    async def aremember_survey(self, prompt: str, survey: Dict[str, Any], scope: Optional[str], latency: float = 0.0):
+        if self.semantic_cache is None or scope is None:
+            return
+        await run_compute(self.semantic_cache.store, prompt, survey, scope, latency)
+    
+    @staticmethod
+    async def areplay_survey(survey: Dict[str, Any]) -> AsyncIterator[Tuple[str, Any]]:
+        """按流式生成的事件顺序产出已有问卷：顶层字段、各个问题，最后是完整问卷"""
+        for key, value in survey.items():
+            if key != "questions" and not isinstance(value, (dict, list)):
+                yield "field", (key, value)
+        for question in survey.get("questions", []):
+            yield "question", question
+        yield "complete", survey
+    
     def create_survey(
         self,
         user_input: str,
-        additional_context: Optional[Dict[str, Any]] = None
+        additional_context: Optional[Dict[str, Any]] = None,
+        use_cache: Optional[bool] = None,
+        scope: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         创建问卷
@@ -122,6 +284,9 @@ class SurveyService:
         Args:
             user_input: 用户输入的主题和需求
             additional_context: 额外的上下文信息（可选）
+            use_cache: 是否使用LLM响应缓存（默认取 cache_responses）
+            scope: 语义缓存作用域（如用户名）；None 表示不使用语义缓存。
+                带额外上下文的调用不查询语义缓存
             
         Returns:
             生成的问卷（字典格式）
@@ -129,52 +294,60 @@ class SurveyService:
         print(f"\n开始生成问卷...")
         print(f"主题: {user_input}")
         
+        if additional_context:
+            scope = None
+        hit = self.find_similar_survey(user_input, scope)
+        if hit is not None:
+            return hit["survey"]
+        
         try:
             # 使用链生成问卷
+            start = time.perf_counter()
             survey = self.chain.generate_survey(
                 user_input=user_input,
-                additional_context=additional_context
+                additional_context=additional_context,
+                use_cache=self.cache_responses if use_cache is None else use_cache
             )
+            survey = self._validate_survey(survey)
+            self.remember_survey(user_input, survey, scope, time.perf_counter() - start)
+            return survey
             
-            # 验证生成的问卷格式
-            if not survey or not isinstance(survey, dict):
-                raise ValueError("返回的问卷格式不正确")
-            
-            if 'questions' not in survey or not survey.get('questions'):
-                raise ValueError("问卷中没有包含任何问题")
-            
-            # 验证每个问题的有效性
-            valid_questions = []
-            for q in survey.get('questions', []):
-                if not q.get('text'):
-                    print(f"警告: 跳过无效问题（无文本）")
-                    continue
-                
-                qtype = q.get('type', '')
-                # 验证选择题必须有选项
-                if qtype in ['单选题', '多选题']:
-                    if not q.get('options') or len(q.get('options', [])) < 2:
-                        print(f"警告: 跳过无效问题 {q.get('text', '')[:50]}...（选项不足）")
-                        continue
-                
-                # 验证量表题必须有范围
-                if qtype == '量表题':
-                    if not q.get('scale_min') or not q.get('scale_max'):
-                        print(f"警告: 跳过无效问题 {q.get('text', '')[:50]}...（量表范围未定义）")
-                        continue
-                
-                valid_questions.append(q)
-            
-            if not valid_questions:
-                raise ValueError("所有生成的问题都无效")
-            
-            # 重新分配连续的题号
-            for i, question in enumerate(valid_questions):
-                question['id'] = i + 1
-            
-            survey['questions'] = valid_questions
-            print(f"[OK] 问卷生成完成，包含 {len(valid_questions)} 个有效问题")
-            
+        except Exception as e:
+            print(f"\n[ERROR] 生成问卷时发生错误: {e}")
+            import traceback
+            traceback.print_exc()
+            raise
+    
+    async def acreate_survey(
+        self,
+        user_input: str,
+        additional_context: Optional[Dict[str, Any]] = None,
+        use_cache: Optional[bool] = None,
+        scope: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        创建问卷（异步版本）
+        
+        在事件循环中直接 await 生成链，多个生成请求并发执行，不受线程池大小限制
+        """
+        print(f"\n开始生成问卷...")
+        print(f"主题: {user_input}")
+        
+        if additional_context:
+            scope = None
+        hit = await self.afind_similar_survey(user_input, scope)
+        if hit is not None:
+            return hit["survey"]
+        
+        try:
+            start = time.perf_counter()
+            survey = await self.chain.agenerate_survey(
+                user_input=user_input,
+                additional_context=additional_context,
+                use_cache=self.cache_responses if use_cache is None else use_cache
+            )
+            survey = self._validate_survey(survey)
+            await self.aremember_survey(user_input, survey, scope, time.perf_counter() - start)
             return survey
             
         except Exception as e:
@@ -183,6 +356,65 @@ class SurveyService:
             traceback.print_exc()
             raise
     
+    async def astream_survey(
+        self,
+        user_input: str,
+        additional_context: Optional[Dict[str, Any]] = None,
+        use_cache: Optional[bool] = None,
+        scope: Optional[str] = None,
+        semantic_prompt: Optional[str] = None,
+        lookup: bool = True
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        流式创建问卷
+        
+        每个问题对象解析完成并通过校验后立即产出（题号按有效问题连续编号，
+        与最终问卷一致），最后产出校验后的完整问卷。
+        
+        Args:
+            user_input: 用户输入的主题和需求
+            additional_context: 额外的上下文信息（可选）
+            use_cache: 是否使用LLM响应缓存（默认取 cache_responses）
+            scope: 语义缓存作用域；None 表示不使用语义缓存
+            semantic_prompt: 语义缓存使用的需求文本（默认 user_input）。
+                调用方先扩写需求时传入原始需求，使查询与保存使用同一文本
+            lookup: 是否先查询语义缓存；调用方已查询过（未命中）时传 False，
+                生成结果仍按 scope 保存
+        
+        Yields:
+            ("field", (字段名, 值))、("question", 问题字典)、("complete", 完整问卷)
+        """
+        print(f"\n开始流式生成问卷...")
+        print(f"主题: {user_input}")
+        
+        if additional_context:
+            scope = None
+        semantic_prompt = semantic_prompt or user_input
+        hit = await self.afind_similar_survey(semantic_prompt, scope) if lookup else None
+        if hit is not None:
+            async for event in self.areplay_survey(hit["survey"]):
+                yield event
+            return
+        
+        start = time.perf_counter()
+        emitted = 0
+        async for kind, payload in self.chain.astream_survey(
+            user_input=user_input,
+            additional_context=additional_context,
+            use_cache=self.cache_responses if use_cache is None else use_cache
+        ):
+            if kind == "question":
+                if not self._is_valid_question(payload):
+                    continue
+                emitted += 1
+                yield kind, {**payload, "id": emitted}
+            elif kind == "complete":
+                survey = self._validate_survey(payload)
+                await self.aremember_survey(semantic_prompt, survey, scope, time.perf_counter() - start)
+                yield kind, survey
+            else:
+                yield kind, payload
+    
     def create_survey_with_refs(
         self,
         user_input: str,
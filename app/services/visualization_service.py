@@ -4,13 +4,28 @@
 """
 
 import base64
+import functools
 import io
 import logging
+import threading
 from typing import List, Dict, Any
 from collections import Counter
 
 logger = logging.getLogger(__name__)
 
+# pyplot 的"当前图像"是进程级全局状态，不是线程安全的；
+# 分析流水线在多个线程中并发生成图表时，绘图过程需串行执行
+_render_lock = threading.RLock()
+
+
+def _serialized(func):
+    """在全局绘图锁内执行"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with _render_lock:
+            return func(*args, **kwargs)
+    return wrapper
+
 
 class VisualizationService:
     """可视化服务 - 生成各类图表"""
@@ -39,6 +54,7 @@ class VisualizationService:
         except ImportError:
             logger.warning("matplotlib 未安装，图表功能将不可用")
     
+    @_serialized
     def generate_wordcloud(
         self, 
         texts: List[str], 
@@ -94,6 +110,7 @@ class VisualizationService:
             logger.error(f"生成词云失败: {e}")
             return ""
     
+    @_serialized
     def generate_theme_distribution_chart(
         self,
         themes: List[Dict[str, Any]],
@@ -154,6 +171,7 @@ class VisualizationService:
             logger.error(f"生成主题分布图失败: {e}")
             return ""
     
+    @_serialized
     def generate_sentiment_pie_chart(
         self,
         themes: List[Dict[str, Any]],
@@ -232,6 +250,7 @@ class VisualizationService:
             logger.error(f"生成情感分布图失败: {e}")
             return ""
     
+    @_serialized
     def generate_scale_distribution_chart(
         self,
         data: Dict[str, int],
@@ -304,6 +323,7 @@ class VisualizationService:
             # 静默处理错误，不显示错误提示
             return ""
     
+    @_serialized
     def generate_choice_distribution_chart(
         self,
         data: Dict[str, int],
@@ -368,6 +388,70 @@ class VisualizationService:
             logger.error(f"生成选择题分布图失败: {e}")
             return ""
     
+    @_serialized
+    def generate_correlation_heatmap(
+        self,
+        labels: List[str],
+        matrix: List[List[float]],
+        title: str = "量表题相关矩阵"
+    ) -> str:
+        """
+        生成相关矩阵热力图
+        
+        Args:
+            labels: 题目标题（行列相同）
+            matrix: 相关系数矩阵
+            title: 图表标题
+        
+        Returns:
+            Base64编码的图片字符串
+        """
+        if not self.has_matplotlib:
+            return ""
+        
+        try:
+            if not labels:
+                return ""
+        
+            # 截断过长的题目标题
+            labels = [label[:12] + '...' if len(label) > 12 else label for label in labels]
+            size = len(labels)
+        
+            # 图幅随题目数增长，题目不多时保持紧凑
+            side = min(12, 2.5 + size * 0.6)
+            fig, ax = self.plt.subplots(figsize=(side + 1, side))
+            image = ax.imshow(matrix, cmap='RdBu_r', vmin=-1, vmax=1)
+            fig.colorbar(image, ax=ax, fraction=0.046, pad=0.04)
+        
+            ax.set_xticks(range(size))
+            ax.set_yticks(range(size))
+            ax.set_xticklabels(labels, rotation=45, ha='right', fontproperties=self._get_chinese_font_prop())
+            ax.set_yticklabels(labels, fontproperties=self._get_chinese_font_prop())
+            ax.set_title(title, fontsize=14, fontproperties=self._get_chinese_font_prop())
+        
+            # 题目不多时在格子里标注系数
+            if size <= 12:
+                for i in range(size):
+                    for j in range(size):
+                        value = matrix[i][j]
+                        ax.text(j, i, f'{value:.2f}', ha='center', va='center', fontsize=8,
+                               color='white' if abs(value) > 0.6 else 'black')
+        
+            self.plt.tight_layout()
+        
+            # 转换为Base64
+            buffer = io.BytesIO()
+            self.plt.savefig(buffer, format='png', bbox_inches='tight', dpi=100)
+            buffer.seek(0)
+            image_base64 = base64.b64encode(buffer.read()).decode()
+            self.plt.close(fig)
+        
+            return f"data:image/png;base64,{image_base64}"
+        
+        except Exception as e:
+            logger.error(f"生成相关矩阵热力图失败: {e}")
+            return ""
+
     def _get_chinese_font(self) -> str:
         """
         获取中文字体路径
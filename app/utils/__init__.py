@@ -1,5 +1,5 @@
 """实用工具模块"""
-from .response_saver import ResponseSaver
-
-__all__ = ['ResponseSaver']
+from .response_saver import ResponseSaver, get_response_store
+from .response_store import ResponseStore
 
+__all__ = ['ResponseSaver', 'ResponseStore', 'get_response_store']
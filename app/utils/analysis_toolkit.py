@@ -16,6 +16,7 @@ try:
     from sklearn.feature_extraction.text import TfidfVectorizer
     from sklearn.decomposition import LatentDirichletAllocation
     import jieba
+    from app.utils.survey_columns import SurveyColumns
     HAS_ML_LIBS = True
 except ImportError:
     HAS_ML_LIBS = False
@@ -53,42 +54,16 @@ class AnalysisToolkit:
             return {"clusters": [], "summary": "需要sklearn库支持"}
         
         try:
-            # 提取量表题
-            scale_questions = [q for q in survey.get("questions", []) if q.get("type") == "量表题"]
-            if len(scale_questions) < 2:
+            # 提取量表题：回答者 × 量表题 矩阵（列式视图，缺失值用该题均值填充）
+            columns = SurveyColumns(survey, responses)
+            if len(columns.of_type("量表题")) < 2:
                 return {"clusters": [], "summary": "量表题不足，无法聚类（至少需要2个）"}
             
-            # 构建数据矩阵
-            data_matrix = []
-            question_ids = []
-            
-            for question in scale_questions:
-                q_id = str(question.get("id", ""))
-                question_ids.append(q_id)
-                values = []
-                
-                for response in responses:
-                    answers = response.get("answers", {})
-                    if q_id in answers:
-                        try:
-                            val = float(answers[q_id])
-                            values.append(val)
-                        except (ValueError, TypeError):
-                            values.append(None)
-                    else:
-                        values.append(None)
-                
-                # 用平均值填充缺失值
-                valid_values = [v for v in values if v is not None]
-                if valid_values:
-                    avg = sum(valid_values) / len(valid_values)
-                    values = [v if v is not None else avg for v in values]
-                    data_matrix.append(values)
-            
-            if len(data_matrix) < 2:
+            scale = columns.scale_matrix(impute=True)
+            if len(scale["columns"]) < 2:
                 return {"clusters": [], "summary": "有效数据不足"}
             
-            data_matrix = np.array(data_matrix).T
+            data_matrix = scale["matrix"]
             
             # 确定聚类数
             n_clusters = min(n_clusters, len(responses) // 3) if len(responses) >= 6 else min(2, len(responses) // 2)
@@ -106,14 +81,13 @@ class AnalysisToolkit:
                 cluster_data = data_matrix[cluster_indices]
                 
                 characteristics = {}
-                for j, q_id in enumerate(question_ids):
-                    question = next((q for q in scale_questions if str(q.get("id")) == q_id), None)
-                    if question:
-                        values = cluster_data[:, j]
-                        characteristics[question.get("text", "")[:50]] = {
-                            "mean": float(np.mean(values)),
-                            "std": float(np.std(values))
-                        }
+                means = cluster_data.mean(axis=0)
+                stds = cluster_data.std(axis=0)
+                for j, column in enumerate(scale["columns"]):
+                    characteristics[column.title[:50]] = {
+                        "mean": float(means[j]),
+                        "std": float(stds[j])
+                    }
                 
                 clusters.append({
                     "cluster_id": i + 1,
@@ -317,17 +291,19 @@ class AnalysisToolkit:
         # 计算回答率
         total_questions = len(questions)
         total_responses = len(responses)
-        answered_total = 0
-        
-        for question in questions:
-            q_id = str(question.get("id", ""))
-            for response in responses:
-                answers = response.get("answers", {})
-                if q_id in answers and answers[q_id] is not None:
-                    answered_total += 1
-                    break
+        if HAS_ML_LIBS:
+            # 列式视图：所有问题作答掩码之和
+            columns = SurveyColumns(survey, responses)
+            answered_total = sum(column.response_count for column in columns.columns)
+        else:
+            answered_total = sum(
+                1
+                for response in responses
+                for question in questions
+                if response.get("answers", {}).get(str(question.get("id", ""))) is not None
+            )
         
-        answer_rate = (answered_total / (total_questions * total_responses) * 100) if total_responses > 0 else 0
+        answer_rate = (answered_total / (total_questions * total_responses) * 100) if total_responses > 0 and total_questions > 0 else 0
         
         summary = f"共收集{total_responses}份有效回答，包含{total_questions}个问题，平均回答率{answer_rate:.1f}%"
         
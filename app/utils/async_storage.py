@@ -0,0 +1,190 @@
+"""
+异步存储门面
+FastAPI 处理函数中的阻塞文件操作（open/json/glob/hash/拷贝上传文件）统一放到固定大小的线程池执行，
+并持续测量事件循环延迟，用来确认廉价接口的延迟不再受并发重请求影响。
+向量化（远程嵌入接口）和全量列式视图重建等耗时任务使用单独的计算线程池，不占用存储线程，
+答案提交等短IO的延迟不受其影响
+"""
+
+import asyncio
+import functools
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+
+IO_THREADS = int(os.getenv("IO_THREADS", "16"))
+COMPUTE_THREADS = int(os.getenv("COMPUTE_THREADS", "4"))
+
+_executor = ThreadPoolExecutor(max_workers=IO_THREADS, thread_name_prefix="storage-io")
+_compute_executor = ThreadPoolExecutor(max_workers=COMPUTE_THREADS, thread_name_prefix="compute")
+
+
+async def run_io(func: Callable, *args, **kwargs) -> Any:
+    """在存储线程池中执行阻塞函数"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+
+async def run_compute(func: Callable, *args, **kwargs) -> Any:
+    """在计算线程池中执行耗时任务（向量化、全量重建统计视图等）"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_compute_executor, functools.partial(func, *args, **kwargs))
+
+
+def shutdown_executor():
+    """关闭线程池（等待进行中的任务完成）"""
+    _compute_executor.shutdown(wait=True)
+    _executor.shutdown(wait=True)
+
+
+def executor_queue_depth() -> int:
+    """等待执行的阻塞任务数"""
+    return _executor._work_queue.qsize()
+
+
+def compute_queue_depth() -> int:
+    """等待执行的计算任务数"""
+    return _compute_executor._work_queue.qsize()
+
+
+# ==========================================
+# 同步实现（在线程池中执行）
+# ==========================================
+
+_text_cache: Dict[str, tuple] = {}
+_text_cache_lock = threading.Lock()
+
+
+def _read_text_cached(path: str) -> str:
+    """读取文本文件，按 mtime 缓存（静态页面只在修改后重新读取）"""
+    mtime = os.stat(path).st_mtime_ns
+    with _text_cache_lock:
+        cached = _text_cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    with _text_cache_lock:
+        _text_cache[path] = (mtime, content)
+    return content
+
+
+def write_json_atomic(path, data: Any, indent: Optional[int] = 2):
+    """原子写入JSON（同目录下唯一的临时文件 + fsync + rename，同一文件的并发写入互不覆盖临时文件）"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=indent)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _save_upload(src, dest) -> int:
+    """把上传文件流拷贝到目标路径，返回文件大小"""
+    with open(dest, 'wb') as f:
+        shutil.copyfileobj(src, f, length=1024 * 1024)
+    return os.path.getsize(dest)
+
+
+def compute_file_md5(path) -> str:
+    """分块计算文件MD5"""
+    file_hash = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+# ==========================================
+# 异步接口
+# ==========================================
+
+async def read_text_cached(path: str) -> str:
+    return await run_io(_read_text_cached, path)
+
+
+async def save_upload(src, dest) -> int:
+    return await run_io(_save_upload, src, dest)
+
+
+# ==========================================
+# 事件循环延迟监控
+# ==========================================
+
+def latency_percentiles(samples) -> Dict[str, float]:
+    """延迟样本（秒）的 p50/p99/max（毫秒）"""
+    if not samples:
+        return {"p50_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+    ordered = sorted(samples)
+    last = len(ordered) - 1
+    return {
+        "p50_ms": round(ordered[int(last * 0.5)] * 1000, 2),
+        "p99_ms": round(ordered[int(last * 0.99)] * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2)
+    }
+
+
+class EventLoopLagMonitor:
+    """事件循环延迟监控
+
+    每隔 interval 秒 sleep 一次，实际唤醒时间与预期之差即为事件循环被阻塞的时长。
+    """
+
+    def __init__(self, interval: float = 0.1, samples: int = 3000):
+        self.interval = interval
+        self._samples = deque(maxlen=samples)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if not self._task:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self._samples.append(max(time.perf_counter() - started - self.interval, 0.0))
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "interval_ms": round(self.interval * 1000),
+            "samples": len(self._samples),
+            "loop_lag": latency_percentiles(self._samples),
+            "io_threads": IO_THREADS,
+            "io_queue_depth": executor_queue_depth(),
+            "compute_threads": COMPUTE_THREADS,
+            "compute_queue_depth": compute_queue_depth()
+        }
+
+
+# 全局实例
+loop_lag_monitor = EventLoopLagMonitor()
@@ -0,0 +1,123 @@
+"""
+量表均值和选项占比的区间估计
+- 量表题均值：bootstrap 百分位区间。有放回地重抽 n 个回答只取决于各分值被抽中的次数，
+  等价于按样本分布做多项分布抽样，因此所有量表题、所有重抽次数用一次 multinomial 调用生成，
+  计算量为 O(重抽次数 × 题数 × 分值数)，与回答数无关
+- 选项占比：Wilson 区间（小样本和极端占比下比正态近似可靠），对所有选项向量化计算
+"""
+
+import os
+from statistics import NormalDist
+from typing import Dict, Any, List, Tuple
+
+import numpy as np
+
+from app.utils.survey_columns import QuestionColumn, ChoiceColumn, ScaleColumn
+
+CONFIDENCE_LEVEL = float(os.getenv("CONFIDENCE_LEVEL", "0.95"))
+BOOTSTRAP_RESAMPLES = int(os.getenv("BOOTSTRAP_RESAMPLES", "1000"))
+
+
+def wilson_interval(successes: np.ndarray, n: np.ndarray, confidence: float = CONFIDENCE_LEVEL) -> Tuple[np.ndarray, np.ndarray]:
+    """占比的 Wilson 区间（n 为 0 时区间为 [0, 0]）"""
+    successes = np.asarray(successes, dtype=np.float64)
+    n = np.asarray(n, dtype=np.float64)
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    safe_n = np.where(n > 0, n, 1)
+    p = successes / safe_n
+    denominator = 1 + z ** 2 / safe_n
+    center = (p + z ** 2 / (2 * safe_n)) / denominator
+    margin = z * np.sqrt(p * (1 - p) / safe_n + z ** 2 / (4 * safe_n ** 2)) / denominator
+    low = np.where(n > 0, np.clip(center - margin, 0, 1), 0.0)
+    high = np.where(n > 0, np.clip(center + margin, 0, 1), 0.0)
+    return low, high
+
+
+def bootstrap_means(
+    histograms: List[Tuple[np.ndarray, np.ndarray]],
+    resamples: int = BOOTSTRAP_RESAMPLES,
+    confidence: float = CONFIDENCE_LEVEL,
+    seed: int = 42
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    批量 bootstrap 均值区间
+
+    Args:
+        histograms: 每题的 (分值数组, 各分值人数)
+        resamples: 重抽次数
+        confidence: 置信水平
+        seed: 随机种子（同一份数据区间稳定）
+
+    Returns:
+        (下限数组, 上限数组)，与 histograms 一一对应
+    """
+    width = max(len(scores) for scores, _ in histograms)
+    scores = np.zeros((len(histograms), width))
+    probabilities = np.zeros((len(histograms), width))
+    n = np.zeros(len(histograms), dtype=np.int64)
+    for i, (values, counts) in enumerate(histograms):
+        n[i] = counts.sum()
+        scores[i, :len(values)] = values
+        probabilities[i, :len(values)] = counts / n[i]
+
+    # (重抽次数, 题数, 分值数) 的抽中次数，一次生成
+    draws = np.random.default_rng(seed).multinomial(n, probabilities, size=(resamples, len(histograms)))
+    means = np.einsum("bqk,qk->bq", draws, scores) / n
+    alpha = (1 - confidence) / 2 * 100
+    low, high = np.percentile(means, [alpha, 100 - alpha], axis=0)
+    return low, high
+
+
+def column_intervals(
+    columns: List[QuestionColumn],
+    resamples: int = BOOTSTRAP_RESAMPLES,
+    confidence: float = CONFIDENCE_LEVEL
+) -> Dict[int, Dict[str, Any]]:
+    """
+    计算各题的区间估计
+
+    Returns:
+        {题目位置: {"level", "method", "average_score"（量表题，[下限, 上限]）
+                   或 "options"（选择题，{选项: {"percentage", "low", "high"}}，单位%）}}
+    """
+    intervals: Dict[int, Dict[str, Any]] = {}
+
+    # 量表题：所有题一起 bootstrap
+    scale_columns = [c for c in columns if isinstance(c, ScaleColumn) and c.response_count > 0]
+    if scale_columns and resamples > 0:
+        histograms = [np.unique(c.valid_values, return_counts=True) for c in scale_columns]
+        low, high = bootstrap_means(histograms, resamples, confidence)
+        for column, lo, hi in zip(scale_columns, low, high):
+            intervals[column.position] = {
+                "level": confidence,
+                "method": f"bootstrap({resamples})",
+                "average_score": [round(float(lo), 2), round(float(hi), 2)]
+            }
+
+    # 选择题：所有选项一起算 Wilson 区间，基数为该题作答人数（多选题各选项占比之和可超过100%）
+    choice_columns = [c for c in columns if isinstance(c, ChoiceColumn) and c.response_count > 0]
+    if choice_columns:
+        counts = [c.option_counts() for c in choice_columns]
+        bases = [np.full(len(cnt), c.response_count) for c, cnt in zip(choice_columns, counts)]
+        all_counts = np.concatenate(counts)
+        low, high = wilson_interval(all_counts, np.concatenate(bases), confidence)
+        offset = 0
+        for column, cnt in zip(choice_columns, counts):
+            options = {}
+            for k, option in enumerate(column.options):
+                i = offset + k
+                if cnt[k] == 0:
+                    continue
+                options[option] = {
+                    "percentage": round(float(cnt[k] / column.response_count * 100), 1),
+                    "low": round(float(low[i] * 100), 1),
+                    "high": round(float(high[i] * 100), 1)
+                }
+            offset += len(cnt)
+            intervals[column.position] = {
+                "level": confidence,
+                "method": "wilson",
+                "options": options
+            }
+
+    return intervals
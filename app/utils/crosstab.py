@@ -0,0 +1,228 @@
+"""
+选择题/量表题之间的交叉分析
+在 SurveyColumns 的整数编码列上用 NumPy 计算列联表、行/列百分比、卡方检验和 Cramér's V：
+- 单选题、量表题：每行一个类别编码，两题的列联表是一次 bincount(a * K + b)
+- 多选题：每个选项一个布尔列（来自位集），按选项分别 bincount
+百万级回答的单次交叉分析在几十毫秒内完成
+"""
+
+from itertools import combinations
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+try:
+    from scipy.stats import chi2 as chi2_distribution
+    HAS_SCIPY = True
+except ImportError:
+    HAS_SCIPY = False
+
+from app.utils.survey_columns import (
+    SurveyColumns,
+    QuestionColumn,
+    ChoiceColumn,
+    MultiChoiceColumn,
+    ScaleColumn
+)
+
+# 强关联筛选：显著性水平和最小样本数
+SIGNIFICANCE_LEVEL = 0.05
+MIN_ASSOCIATION_SAMPLE = 30
+
+
+class _Categories:
+    """列的类别视图：codes（每行一个编码，-1 未作答）或 selections（多选题每个选项一个布尔列）"""
+
+    def __init__(self, column: QuestionColumn):
+        self.column = column
+        self.codes: Optional[np.ndarray] = None
+        self.selections: Optional[List[np.ndarray]] = None
+
+        if isinstance(column, MultiChoiceColumn):
+            self.labels = column.options
+            self.selections = [column.selected(code) for code in range(len(self.labels))]
+        elif isinstance(column, ChoiceColumn):
+            self.labels = column.options
+            self.codes = column.codes.astype(np.int64)
+        elif isinstance(column, ScaleColumn):
+            scores, inverse = np.unique(column.valid_values, return_inverse=True)
+            self.labels = [_format_score(s) for s in scores]
+            self.codes = np.full(column.size, -1, dtype=np.int64)
+            self.codes[column.present] = inverse
+        else:
+            raise ValueError(f"「{column.title}」是{column.question_type}，只支持单选题、多选题和量表题的交叉分析")
+
+    @property
+    def size(self) -> int:
+        return len(self.labels)
+
+    def counts(self, mask: np.ndarray) -> np.ndarray:
+        """mask 选中的回答中各类别的人数"""
+        if self.codes is not None:
+            return np.bincount(self.codes[mask & (self.codes >= 0)], minlength=self.size)
+        return np.array([np.count_nonzero(s & mask) for s in self.selections], dtype=np.int64)
+
+
+def _format_score(score: float) -> str:
+    return str(int(score)) if float(score).is_integer() else f"{score:g}"
+
+
+def _contingency_table(rows: _Categories, cols: _Categories) -> np.ndarray:
+    """行类别 × 列类别 的人数"""
+    if rows.codes is not None and cols.codes is not None:
+        valid = (rows.codes >= 0) & (cols.codes >= 0)
+        flat = rows.codes[valid] * cols.size + cols.codes[valid]
+        return np.bincount(flat, minlength=rows.size * cols.size).reshape(rows.size, cols.size)
+    if rows.selections is not None:
+        return np.stack([cols.counts(s) for s in rows.selections]) if rows.size else np.zeros((0, cols.size), dtype=np.int64)
+    return np.stack([rows.counts(s) for s in cols.selections], axis=1) if cols.size else np.zeros((rows.size, 0), dtype=np.int64)
+
+
+def chi_square_test(table: np.ndarray) -> Dict[str, Any]:
+    """
+    列联表的卡方独立性检验
+
+    全为 0 的行/列不参与计算。含多选题时同一受访者可能计入多个格子，检验结果仅作参考。
+
+    Returns:
+        {"chi_square", "dof", "p_value"（未安装scipy时为None）, "cramers_v", "n", "low_expected_ratio"（期望频数<5的格子占比）}
+    """
+    table = np.asarray(table, dtype=np.float64)
+    table = table[table.sum(axis=1) > 0][:, table.sum(axis=0) > 0]
+    n = float(table.sum())
+    r, c = table.shape if table.size else (0, 0)
+    if n == 0 or r < 2 or c < 2:
+        return {"chi_square": 0.0, "dof": 0, "p_value": None, "cramers_v": 0.0, "n": int(n), "low_expected_ratio": 0.0}
+
+    expected = np.outer(table.sum(axis=1), table.sum(axis=0)) / n
+    chi_square = float(((table - expected) ** 2 / expected).sum())
+    dof = (r - 1) * (c - 1)
+    p_value = float(chi2_distribution.sf(chi_square, dof)) if HAS_SCIPY else None
+    cramers_v = float(np.sqrt(chi_square / (n * (min(r, c) - 1))))
+    return {
+        "chi_square": round(chi_square, 4),
+        "dof": dof,
+        "p_value": p_value,
+        "cramers_v": round(min(cramers_v, 1.0), 4),
+        "n": int(n),
+        "low_expected_ratio": round(float((expected < 5).mean()), 4)
+    }
+
+
+def _percentages(table: np.ndarray, base: np.ndarray, axis: int) -> np.ndarray:
+    base = np.expand_dims(base, axis).astype(np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(base > 0, table / base * 100, 0.0)
+
+
+def crosstab(row_column: QuestionColumn, col_column: QuestionColumn) -> Dict[str, Any]:
+    """
+    两个问题的交叉分析
+
+    百分比以受访者为基数：行百分比 = 格子人数 / 该行类别中回答了列问题的人数，
+    多选题的一个受访者可计入多个类别，因此行/列百分比之和可能超过 100%。
+
+    Args:
+        row_column: 行问题（单选题/多选题/量表题）
+        col_column: 列问题（单选题/多选题/量表题）
+
+    Returns:
+        {"row_question", "col_question", "respondents"（两题都作答的人数）, "row_labels", "col_labels", "counts",
+         "row_percentages", "col_percentages", "row_totals", "col_totals", "statistics"}
+
+    Raises:
+        ValueError: 题型不支持交叉分析，或行列是同一题
+    """
+    if row_column is col_column:
+        raise ValueError("行问题和列问题不能相同")
+
+    rows, cols = _Categories(row_column), _Categories(col_column)
+    table = _contingency_table(rows, cols)
+
+    # 两题都作答的受访者中各类别人数（百分比基数）
+    both = row_column.present & col_column.present
+    row_totals = rows.counts(both)
+    col_totals = cols.counts(both)
+
+    return {
+        "row_question": {"id": row_column.question_id, "title": row_column.title, "type": row_column.question_type},
+        "col_question": {"id": col_column.question_id, "title": col_column.title, "type": col_column.question_type},
+        "respondents": int(both.sum()),
+        "row_labels": rows.labels,
+        "col_labels": cols.labels,
+        "counts": table.tolist(),
+        "row_percentages": np.round(_percentages(table, row_totals, 1), 1).tolist(),
+        "col_percentages": np.round(_percentages(table, col_totals, 0), 1).tolist(),
+        "row_totals": row_totals.tolist(),
+        "col_totals": col_totals.tolist(),
+        "statistics": chi_square_test(table)
+    }
+
+
+def _highlight(
+    table: np.ndarray,
+    rows: _Categories,
+    cols: _Categories,
+    row_totals: np.ndarray,
+    col_totals: np.ndarray,
+    respondents: int
+) -> Optional[Dict[str, Any]]:
+    """标准化残差最大的格子：某行类别中选择某列类别的比例明显高于整体"""
+    n = table.sum()
+    if n == 0 or respondents == 0:
+        return None
+    expected = np.outer(table.sum(axis=1), table.sum(axis=0)) / n
+    with np.errstate(divide="ignore", invalid="ignore"):
+        residuals = np.where((expected > 0) & (table >= 5), (table - expected) / np.sqrt(expected), -np.inf)
+    i, j = np.unravel_index(int(np.argmax(residuals)), residuals.shape)
+    if not np.isfinite(residuals[i, j]) or row_totals[i] == 0:
+        return None
+    return {
+        "row_label": rows.labels[i],
+        "col_label": cols.labels[j],
+        "row_percentage": round(float(table[i, j] / row_totals[i] * 100), 1),
+        "overall_percentage": round(float(col_totals[j] / respondents * 100), 1)
+    }
+
+
+def strongest_associations(
+    survey_columns: SurveyColumns,
+    top_n: int = 5,
+    min_cramers_v: float = 0.1
+) -> List[Dict[str, Any]]:
+    """
+    找出关联最强的问题对
+
+    对所有 单选/多选/量表 题两两做卡方检验，保留显著（p < 0.05，无scipy时不做显著性筛选）、
+    样本数不少于 MIN_ASSOCIATION_SAMPLE 且 Cramér's V 不低于 min_cramers_v 的问题对，按 Cramér's V 降序。
+
+    Returns:
+        [{"row_question", "col_question", "cramers_v", "p_value", "n", "highlight"}]
+    """
+    categorical = [
+        _Categories(c) for c in survey_columns.answered()
+        if isinstance(c, (ChoiceColumn, ScaleColumn))
+    ]
+    associations = []
+    for rows, cols in combinations(categorical, 2):
+        if rows.size < 2 or cols.size < 2:
+            continue
+        table = _contingency_table(rows, cols)
+        stats = chi_square_test(table)
+        if stats["n"] < MIN_ASSOCIATION_SAMPLE or stats["cramers_v"] < min_cramers_v:
+            continue
+        if stats["p_value"] is not None and stats["p_value"] >= SIGNIFICANCE_LEVEL:
+            continue
+        both = rows.column.present & cols.column.present
+        highlight = _highlight(table, rows, cols, rows.counts(both), cols.counts(both), int(both.sum()))
+        associations.append({
+            "row_question": rows.column.title,
+            "col_question": cols.column.title,
+            "cramers_v": stats["cramers_v"],
+            "p_value": stats["p_value"],
+            "n": stats["n"],
+            "highlight": highlight
+        })
+
+    associations.sort(key=lambda item: item["cramers_v"], reverse=True)
+    return associations[:top_n]
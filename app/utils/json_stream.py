@@ -0,0 +1,157 @@
+"""
+流式问卷JSON的增量解析
+LLM 逐块输出问卷JSON时，按字符扫描（维护字符串/转义状态和括号栈，每个字符只扫描一次）：
+- 顶层的字符串/数字字段（title、description 等）值结束时立即解析
+- "questions" 数组中的每个问题对象在右括号到达时立即解析
+容忍JSON前后的说明文字和 ```json 代码块标记；单个问题解析失败时跳过，由最终的完整解析兜底
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+_TRAILING_COMMA = re.compile(r',(\s*[}\]])')
+
+
+def _loads_tolerant(text: str) -> Optional[Any]:
+    """解析JSON片段，失败时去掉末尾多余的逗号再试一次"""
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    try:
+        return json.loads(_TRAILING_COMMA.sub(r'\1', text))
+    except json.JSONDecodeError:
+        return None
+
+
+class IncrementalSurveyParser:
+    """问卷JSON的增量解析器
+
+    用法：每收到一段LLM输出调用 feed(chunk)，返回本段内新完成的事件：
+    ("field", (字段名, 值)) 顶层字段；("question", 问题字典) 问题对象。
+    """
+
+    def __init__(self, array_key: str = "questions"):
+        self.array_key = array_key
+        self.buffer = ""
+        self._pos = 0
+        self._started = False
+        # 括号栈：元素为 "{" 或 "["
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = -1
+        # 顶层对象中：下一个字符串是否为键、当前键、标量值起点
+        self._expect_key = False
+        self._key: Optional[str] = None
+        self._scalar_start = -1
+        # 问题数组所在的栈深度和当前问题对象的起点
+        self._array_depth = -1
+        self._item_start = -1
+        self.question_count = 0
+
+    @property
+    def text(self) -> str:
+        return self.buffer
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        self.buffer += chunk
+        events: List[Tuple[str, Any]] = []
+        buffer = self.buffer
+        i = self._pos
+        n = len(buffer)
+
+        while i < n:
+            ch = buffer[i]
+
+            if not self._started:
+                # 跳过JSON之前的说明文字和代码块标记
+                if ch == "{":
+                    self._started = True
+                    self._stack.append("{")
+                    self._expect_key = True
+                i += 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._end_string(i, events)
+                i += 1
+                continue
+
+            depth = len(self._stack)
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch in "{[":
+                if depth == 1:
+                    # 顶层字段的值是对象或数组
+                    self._scalar_start = -1
+                    if ch == "[" and self._key == self.array_key:
+                        self._array_depth = depth + 1
+                if ch == "{" and depth == self._array_depth:
+                    self._item_start = i
+                self._stack.append(ch)
+            elif ch in "}]":
+                if self._stack:
+                    self._stack.pop()
+                if ch == "}" and len(self._stack) == self._array_depth and self._item_start >= 0:
+                    item = _loads_tolerant(buffer[self._item_start:i + 1])
+                    if isinstance(item, dict):
+                        self.question_count += 1
+                        events.append(("question", item))
+                    self._item_start = -1
+                elif ch == "]" and len(self._stack) == self._array_depth - 1:
+                    self._array_depth = -1
+                elif ch == "}" and depth == 1:
+                    # 顶层对象结束
+                    self._end_scalar(i, events)
+            elif depth == 1:
+                if ch == ":":
+                    self._expect_key = False
+                    self._scalar_start = i + 1
+                elif ch == ",":
+                    self._end_scalar(i, events)
+                    self._expect_key = True
+                    self._key = None
+            i += 1
+
+        self._pos = i
+        return events
+
+    def _end_string(self, end: int, events: List[Tuple[str, Any]]):
+        if len(self._stack) != 1:
+            return
+        value = _loads_tolerant(self.buffer[self._string_start:end + 1])
+        if self._expect_key:
+            self._key = value if isinstance(value, str) else None
+        elif self._key is not None:
+            events.append(("field", (self._key, value)))
+            self._scalar_start = -1
+
+    def _end_scalar(self, end: int, events: List[Tuple[str, Any]]):
+        """顶层的数字/布尔值在逗号或右括号处结束"""
+        if self._scalar_start < 0 or self._key is None:
+            self._scalar_start = -1
+            return
+        raw = self.buffer[self._scalar_start:end].strip()
+        self._scalar_start = -1
+        if raw:
+            value = _loads_tolerant(raw)
+            if value is not None:
+                events.append(("field", (self._key, value)))
+
+    def result(self) -> Optional[Dict[str, Any]]:
+        """完整解析已接收的文本（流结束后调用），无法解析时返回 None"""
+        start = self.buffer.find("{")
+        end = self.buffer.rfind("}")
+        if start < 0 or end <= start:
+            return None
+        value = _loads_tolerant(self.buffer[start:end + 1])
+        return value if isinstance(value, dict) else None
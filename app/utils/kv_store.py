@@ -0,0 +1,193 @@
+"""
+持久化键值存储
+用户、会话、用户问卷关联共用：快照文件 + 追加日志（journal），改动按键记脏、后台定时批量写入
+
+- 快照：与原来的 users.json / sessions.json / user_surveys.json 格式相同（{key: value}），
+  只在压缩时通过临时文件 + fsync + rename 原子替换
+- 日志：{快照}.journal，每行一条 {"k": key, "v": value} 或 {"k": key, "deleted": true}，
+  一次刷盘只追加脏键对应的若干行，耗时与总数据量无关
+- 加载：读快照后重放日志；末尾被截断的半行（写入时崩溃）会被丢弃
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+import weakref
+from pathlib import Path
+from typing import Dict, Any, Optional, Iterator, Tuple
+
+
+class DurableKVStore:
+    """写后批量落盘的键值存储"""
+
+    # 日志条数超过该值且超过键数时压缩为新快照
+    COMPACT_MIN_RECORDS = 1000
+
+    def __init__(self, path: str, flush_interval: float = 1.0):
+        """
+        初始化存储
+
+        Args:
+            path: 快照文件路径
+            flush_interval: 后台刷盘间隔（秒）
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.journal_path = self.path.with_name(self.path.name + ".journal")
+        self.flush_interval = flush_interval
+        self.data: Dict[str, Any] = {}
+        self._dirty: Dict[str, str] = {}  # key -> 待追加的日志行
+        self._journal_records = 0
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._load()
+        _register(self)
+
+    def _load(self):
+        """读快照并重放日志"""
+        if self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.data = json.load(f)
+            except Exception as e:
+                print(f"加载数据失败 {self.path}: {e}")
+                self.data = {}
+
+        if not self.journal_path.exists():
+            return
+
+        valid_bytes = 0
+        with open(self.journal_path, 'rb') as f:
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("incomplete record")
+                    record = json.loads(line)
+                except ValueError:
+                    print(f"日志末尾记录不完整，已丢弃: {self.journal_path}")
+                    break
+                if record.get("deleted"):
+                    self.data.pop(record["k"], None)
+                else:
+                    self.data[record["k"]] = record["v"]
+                valid_bytes += len(line)
+                self._journal_records += 1
+
+        if valid_bytes < self.journal_path.stat().st_size:
+            with open(self.journal_path, 'r+b') as f:
+                f.truncate(valid_bytes)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            return self.data.get(key, default)
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        with self._lock:
+            return iter(list(self.data.items()))
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.data
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def set(self, key: str, value: Any, sync: bool = False):
+        """
+        写入一个键（value 归存储所有，调用方之后不应再原地修改）
+
+        Args:
+            sync: 为 True 时立即写日志并落盘（注册、发布等不能丢的操作）；
+                  否则由后台定时刷盘
+        """
+        line = json.dumps({"k": key, "v": value}, ensure_ascii=False) + "\n"
+        with self._lock:
+            self.data[key] = value
+            self._dirty[key] = line
+        if sync:
+            self.flush()
+
+    def delete(self, key: str, sync: bool = False):
+        """删除一个键"""
+        with self._lock:
+            if key not in self.data:
+                return
+            del self.data[key]
+            self._dirty[key] = json.dumps({"k": key, "deleted": True}, ensure_ascii=False) + "\n"
+        if sync:
+            self.flush()
+
+    def flush(self):
+        """把脏键追加到日志并落盘，必要时压缩为新快照"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                dirty, self._dirty = self._dirty, {}
+
+            try:
+                with open(self.journal_path, 'a', encoding='utf-8') as f:
+                    f.write("".join(dirty.values()))
+                    f.flush()
+                    os.fsync(f.fileno())
+            except Exception as e:
+                print(f"写入日志失败 {self.journal_path}: {e}")
+                with self._lock:
+                    # 放回未写入的键（期间又被修改的以新值为准）
+                    for key, line in dirty.items():
+                        self._dirty.setdefault(key, line)
+                return
+
+            self._journal_records += len(dirty)
+            if self._journal_records >= max(self.COMPACT_MIN_RECORDS, len(self.data)):
+                self._compact()
+
+    def _compact(self):
+        """写新快照并清空日志（调用方持有 _flush_lock）"""
+        with self._lock:
+            content = json.dumps(self.data, ensure_ascii=False, indent=2)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            # 快照已包含日志中的全部改动，可以清空日志
+            with open(self.journal_path, 'w', encoding='utf-8') as f:
+                f.flush()
+                os.fsync(f.fileno())
+            self._journal_records = 0
+        except Exception as e:
+            print(f"压缩快照失败 {self.path}: {e}")
+
+
+_stores: "weakref.WeakSet[DurableKVStore]" = weakref.WeakSet()
+_flusher: Optional[threading.Thread] = None
+_flusher_lock = threading.Lock()
+
+
+def _register(store: DurableKVStore):
+    """登记存储并确保后台刷盘线程在运行"""
+    global _flusher
+    _stores.add(store)
+    with _flusher_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_loop, daemon=True, name="kv-store-flusher")
+            _flusher.start()
+
+
+def _flush_loop():
+    while True:
+        time.sleep(min((s.flush_interval for s in list(_stores)), default=1.0))
+        flush_all()
+
+
+def flush_all():
+    """立即刷写所有存储（服务关闭时调用）"""
+    for store in list(_stores):
+        store.flush()
+
+
+atexit.register(flush_all)
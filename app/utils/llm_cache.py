@@ -0,0 +1,265 @@
+"""
+LLM 响应缓存
+以"规范化提示词 + 模型 + 温度 + 检索上下文摘要"的哈希为键，把 LLM 输出保存在本地 SQLite（WAL）中：
+- 规范化：NFKC、小写、去掉标点和多余空白，只差空格/标点的提示词命中同一条目
+- 过期：写入超过 TTL 的条目在读取时删除
+- 容量：总字节数超过上限时按最近访问时间淘汰（LRU）
+缓存由调用方逐个调用点显式开启；temperature > 0 的调用开启后，同一需求会复用第一次的输出
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 提示词模板或输出格式变化时递增，使旧缓存失效
+CACHE_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    namespace TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    latency REAL NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache (accessed_at);
+"""
+
+
+def normalize_prompt(text: str) -> str:
+    """提示词规范化：标点、空白、控制字符都视为分隔符，只在两个 ASCII 字母数字之间保留一个空格"""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    tokens = "".join(
+        " " if ch.isspace() or unicodedata.category(ch)[0] in "PZC" else ch
+        for ch in text
+    ).split()
+    if not tokens:
+        return ""
+    parts = [tokens[0]]
+    for token in tokens[1:]:
+        previous = parts[-1][-1]
+        if previous.isascii() and previous.isalnum() and token[0].isascii() and token[0].isalnum():
+            parts.append(" ")
+        parts.append(token)
+    return "".join(parts)
+
+
+def make_cache_key(
+    namespace: str,
+    prompt: str,
+    model: str,
+    temperature: Optional[float],
+    context: str = ""
+) -> str:
+    """
+    计算缓存键
+
+    Args:
+        namespace: 调用点（如 "enhance"、"survey"），不同调用点互不命中
+        prompt: 用户提示词（规范化后参与计算）
+        model: 模型名称
+        temperature: 温度参数
+        context: 检索到的上下文等其他影响输出的内容（只取摘要）
+    """
+    payload = json.dumps([
+        CACHE_VERSION,
+        namespace,
+        normalize_prompt(prompt),
+        model,
+        None if temperature is None else round(float(temperature), 3),
+        hashlib.sha256(context.encode("utf-8")).hexdigest()
+    ], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """基于 SQLite 的 LLM 响应缓存
+
+    - 每个线程一个连接；数据库在第一次使用时创建
+    - 命中时更新访问时间（LRU），并累计该条目原始调用耗时作为节省的时间
+    """
+
+    BUSY_TIMEOUT_MS = 5000
+
+    def __init__(
+        self,
+        db_path: str = "data/llm_cache.db",
+        ttl_seconds: float = 7 * 24 * 3600,
+        max_bytes: int = 64 * 1024 * 1024
+    ):
+        """
+        初始化缓存
+
+        Args:
+            db_path: 数据库文件路径
+            ttl_seconds: 条目有效期（秒），<= 0 表示不过期
+            max_bytes: 缓存内容总字节数上限
+        """
+        self.db_path = Path(db_path)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "stores": 0, "expired": 0, "evictions": 0, "errors": 0}
+        self._saved_seconds = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        """获取当前线程的连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(
+                str(self.db_path),
+                timeout=self.BUSY_TIMEOUT_MS / 1000,
+                isolation_level=None,
+                check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存内容；未命中、已过期或读取失败时返回 None"""
+        now = time.time()
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value, latency, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl_seconds > 0 and now - row[2] > self.ttl_seconds:
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._count("expired")
+                row = None
+            if row is None:
+                self._count("misses")
+                return None
+            conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        except sqlite3.Error as e:
+            logger.warning(f"读取LLM缓存失败: {e}")
+            self._count("errors")
+            return None
+
+        with self._lock:
+            self._counters["hits"] += 1
+            self._saved_seconds += row[1]
+        return row[0]
+
+    def get_json(self, key: str) -> Optional[Any]:
+        value = self.get(key)
+        if value is None:
+            return None
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            return None
+
+    def put(self, key: str, value: str, namespace: str = "", latency: float = 0.0):
+        """
+        写入缓存
+
+        Args:
+            key: make_cache_key 计算的键
+            value: 缓存内容
+            namespace: 调用点名称（用于按调用点统计）
+            latency: 原始LLM调用耗时（秒），命中时累计为节省的时间
+        """
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        try:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, namespace, value, size, latency, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, namespace, value, size, latency, now, now)
+            )
+            self._count("stores")
+            self._evict(conn)
+        except sqlite3.Error as e:
+            logger.warning(f"写入LLM缓存失败: {e}")
+            self._count("errors")
+
+    def put_json(self, key: str, value: Any, namespace: str = "", latency: float = 0.0):
+        self.put(key, json.dumps(value, ensure_ascii=False), namespace, latency)
+
+    def _evict(self, conn: sqlite3.Connection):
+        """总字节数超过上限时，按访问时间从旧到新删除"""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in conn.execute("SELECT key, size FROM llm_cache ORDER BY accessed_at").fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        self._count("evictions", evicted)
+
+    def clear(self):
+        try:
+            self._connect().execute("DELETE FROM llm_cache")
+        except sqlite3.Error as e:
+            logger.warning(f"清空LLM缓存失败: {e}")
+
+    def metrics(self) -> Dict[str, Any]:
+        """命中率、条目数、占用字节数和节省的LLM调用时间"""
+        entries, size = 0, 0
+        try:
+            entries, size = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache"
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"读取LLM缓存统计失败: {e}")
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "hit_rate": round(self._counters["hits"] / lookups, 4) if lookups else 0.0,
+                "entries": entries,
+                "bytes": size,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "saved_seconds": round(self._saved_seconds, 2)
+            }
+
+    def close(self):
+        """关闭所有线程的连接"""
+        with self._connections_lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._connections = []
+        self._local = threading.local()
+
+
+# 全局实例
+llm_response_cache = LLMResponseCache(
+    db_path=os.getenv("LLM_CACHE_DB", "data/llm_cache.db"),
+    ttl_seconds=float(os.getenv("LLM_CACHE_TTL_HOURS", "168")) * 3600,
+    max_bytes=int(float(os.getenv("LLM_CACHE_MAX_MB", "64")) * 1024 * 1024)
+)
@@ -0,0 +1,186 @@
+"""
+答案提交队列
+请求处理器只做校验和入队，后台写入任务按时间窗口把积压的答案合并成一次组提交
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional
+
+from app.utils.async_storage import run_io, latency_percentiles
+from app.utils.response_store import ResponseStore
+
+
+class IngestionQueueFull(Exception):
+    """提交队列已满，调用方应返回 503 并提示稍后重试"""
+
+    def __init__(self, retry_after: int = 1):
+        super().__init__("提交队列已满，请稍后重试")
+        self.retry_after = retry_after
+
+
+class ResponseIngestionQueue:
+    """答案组提交队列
+
+    - 有界 asyncio.Queue：满时 submit 立即抛出 IngestionQueueFull（背压）
+    - 写入任务取到第一条后再等待 batch_window_ms 收集同批答案，
+      在存储线程池中调用 save_responses_batch 一次写入并落盘
+    - 每个提交方等待自己的 Future，只有整批落盘后才返回（持久化确认）
+    """
+
+    LATENCY_SAMPLES = 1000
+
+    def __init__(
+        self,
+        saver: ResponseStore,
+        max_queue: int = 10000,
+        batch_window_ms: int = 20,
+        max_batch: int = 500
+    ):
+        """
+        初始化提交队列
+
+        Args:
+            saver: 答案存储
+            max_queue: 队列容量（超过后拒绝新提交）
+            batch_window_ms: 组提交时间窗口（毫秒）
+            max_batch: 单批最多合并的答案数
+        """
+        self.saver = saver
+        self.max_queue = max_queue
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch = max_batch
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._commit_latencies = deque(maxlen=self.LATENCY_SAMPLES)
+        self._ack_latencies = deque(maxlen=self.LATENCY_SAMPLES)
+        self._counters = {"accepted": 0, "committed": 0, "rejected": 0, "failed": 0, "batches": 0}
+
+    async def start(self):
+        """启动后台写入任务"""
+        if self._writer and not self._writer.done():
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._writer = asyncio.create_task(self._run_writer())
+
+    async def stop(self):
+        """等待队列中已接收的答案全部写入后停止"""
+        if not self._writer:
+            return
+        await self._queue.join()
+        self._writer.cancel()
+        try:
+            await self._writer
+        except asyncio.CancelledError:
+            pass
+        self._writer = None
+
+    async def submit(
+        self,
+        survey_id: str,
+        response_data: Dict[str, Any],
+        user_id: str = None,
+        survey_name: str = None
+    ) -> str:
+        """
+        提交一份答案并等待其落盘
+
+        Returns:
+            保存路径
+
+        Raises:
+            IngestionQueueFull: 队列已满
+        """
+        if self._queue is None:
+            await self.start()
+
+        future = asyncio.get_running_loop().create_future()
+        item = {
+            "survey_id": survey_id,
+            "response_data": response_data,
+            "user_id": user_id,
+            "survey_name": survey_name,
+            "future": future,
+            "enqueued_at": time.perf_counter()
+        }
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self._counters["rejected"] += 1
+            raise IngestionQueueFull(retry_after=max(1, round(self._estimated_drain_seconds())))
+
+        self._counters["accepted"] += 1
+        return await future
+
+    async def _run_writer(self):
+        """后台写入循环"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._commit(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    async def _commit(self, batch: List[Dict[str, Any]]):
+        """在线程池中一次性写入整批答案，并逐个确认"""
+        items = [
+            {k: item[k] for k in ("survey_id", "response_data", "user_id", "survey_name")}
+            for item in batch
+        ]
+        started = time.perf_counter()
+        try:
+            paths = await run_io(self.saver.save_responses_batch, items, True)
+        except Exception as e:
+            print(f"[提交队列] 批量写入失败（{len(batch)} 份）: {e}")
+            self._counters["failed"] += len(batch)
+            for item in batch:
+                if not item["future"].done():
+                    item["future"].set_exception(e)
+            return
+
+        finished = time.perf_counter()
+        self._commit_latencies.append(finished - started)
+        self._counters["batches"] += 1
+        self._counters["committed"] += len(batch)
+        for item, path in zip(batch, paths):
+            self._ack_latencies.append(finished - item["enqueued_at"])
+            if not item["future"].done():
+                item["future"].set_result(path)
+
+    def _estimated_drain_seconds(self) -> float:
+        """按最近的批量耗时估算清空队列所需时间，用作 Retry-After"""
+        if not self._commit_latencies:
+            return 1.0
+        avg_commit = sum(self._commit_latencies) / len(self._commit_latencies)
+        batches = self.depth / max(self.max_batch, 1)
+        return batches * (avg_commit + self.batch_window)
+
+    @property
+    def depth(self) -> int:
+        """当前排队中的答案数"""
+        return self._queue.qsize() if self._queue else 0
+
+    def metrics(self) -> Dict[str, Any]:
+        """队列深度、提交计数和延迟分位数"""
+        return {
+            "queue_depth": self.depth,
+            "max_queue": self.max_queue,
+            "batch_window_ms": round(self.batch_window * 1000),
+            "max_batch": self.max_batch,
+            **self._counters,
+            "avg_batch_size": round(self._counters["committed"] / self._counters["batches"], 1)
+            if self._counters["batches"] else 0,
+            "commit_latency": latency_percentiles(self._commit_latencies),
+            "ack_latency": latency_percentiles(self._ack_latencies)
+        }
@@ -0,0 +1,490 @@
+"""
+追加式分段答案日志
+每条答案以一行 JSON 追加到问卷目录下滚动的 JSONL 分段文件中，替代"一份答案一个文件"
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows：没有文件锁，只支持单进程部署
+    fcntl = None
+
+
+class ResponseLog:
+    """按问卷分段的追加式答案日志
+
+    目录布局（位于每个问卷的答案目录下）：
+        seg_000001.jsonl    已封存的分段（只读）
+        seg_000002.jsonl    当前活动分段（只追加）
+        segments.idx        分段索引：各分段的记录数、字节数和稀疏偏移
+        segments.lock       跨进程文件锁
+
+    索引是"哪些分段有效"的唯一依据，只在新建分段、封存、压缩以及每隔
+    INDEX_FLUSH_RECORDS 条记录时写回；加载时会扫描活动分段中索引之后的尾部，
+    补齐记录数并截掉崩溃时留下的半行。
+
+    多 worker 部署时，追加、封存和压缩都在 segments.lock 文件锁下进行；每次取锁后
+    索引文件有变化则重新加载，活动分段变长则补读其他进程追加的尾部
+    （没有 fcntl 的平台只支持单进程部署）。
+    活动分段空闲超过 seal_idle_seconds 后由后台压缩线程封存，低流量问卷的小分段
+    也能被合并。
+    """
+
+    INDEX_FILE = "segments.idx"
+    LOCK_FILE = "segments.lock"
+    SEGMENT_PREFIX = "seg_"
+    SEGMENT_SUFFIX = ".jsonl"
+    OFFSET_STRIDE = 1000  # 每隔多少条记录登记一个字节偏移
+    INDEX_FLUSH_RECORDS = 200
+
+    def __init__(
+        self,
+        segment_max_bytes: int = 8 * 1024 * 1024,
+        segment_max_records: int = 50000,
+        compact_min_bytes: int = 1024 * 1024,
+        seal_idle_seconds: int = 600
+    ):
+        """
+        初始化答案日志
+
+        Args:
+            segment_max_bytes: 活动分段超过该大小后封存并滚动
+            segment_max_records: 活动分段超过该记录数后封存并滚动
+            compact_min_bytes: 小于该大小的已封存分段会被后台压缩合并
+            seal_idle_seconds: 活动分段超过该时长没有新写入时封存，使其可以被压缩
+        """
+        self.segment_max_bytes = segment_max_bytes
+        self.segment_max_records = segment_max_records
+        self.compact_min_bytes = compact_min_bytes
+        self.seal_idle_seconds = seal_idle_seconds
+        self._states: Dict[str, Dict[str, Any]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._registry_lock = threading.Lock()
+        # 压缩后被替换的旧分段记在索引的 retired 中延迟删除，避免正在读取快照的请求
+        # （包括其他进程中的）找不到文件
+        self.graveyard_seconds = 60
+        self._compactor_thread: Optional[threading.Thread] = None
+        self._compactor_stop = threading.Event()
+
+    # ==================== 索引管理 ====================
+
+    def _lock_for(self, survey_dir: Path) -> threading.Lock:
+        key = str(survey_dir)
+        with self._registry_lock:
+            if key not in self._locks:
+                self._locks[key] = threading.Lock()
+            return self._locks[key]
+
+    @contextmanager
+    def _locked(self, survey_dir: Path):
+        """进程内锁 + 跨进程文件锁"""
+        with self._lock_for(survey_dir):
+            if fcntl is None:
+                yield
+                return
+            with open(survey_dir / self.LOCK_FILE, 'a') as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    @staticmethod
+    def _stat_key(path: Path) -> Optional[tuple]:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def has_log(self, survey_dir: Path) -> bool:
+        """目录下是否存在分段日志"""
+        return (Path(survey_dir) / self.INDEX_FILE).exists()
+
+    def _load_state(self, survey_dir: Path) -> Dict[str, Any]:
+        """
+        加载（或初始化）某个问卷目录的分段状态，调用方需持有 _locked(survey_dir)
+
+        内存中的状态在索引文件未变化时直接复用，只补读活动分段中其他进程追加的尾部；
+        索引被其他进程改写（新建分段、封存、压缩）后重新读取。
+        """
+        key = str(survey_dir)
+        index_path = survey_dir / self.INDEX_FILE
+        stamp = self._stat_key(index_path)
+        state = self._states.get(key)
+        if state is not None and stamp == state.get("_stamp"):
+            # 其他进程追加的记录只更新内存，随下次写回索引一起持久化
+            state["_unflushed"] = state.get("_unflushed", 0) + self._recover_tail(survey_dir, state)
+            return state
+
+        state = {"segments": [], "next_seq": 1, "retired": []}
+        if stamp is not None:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            state.setdefault("retired", [])
+            state["_stamp"] = stamp
+            if self._recover_tail(survey_dir, state):
+                self._write_index(survey_dir, state)
+            self._remove_orphans(survey_dir, state)
+        self._states[key] = state
+        return state
+
+    def _write_index(self, survey_dir: Path, state: Dict[str, Any]):
+        """原子写回分段索引"""
+        index_path = survey_dir / self.INDEX_FILE
+        tmp_path = survey_dir / (self.INDEX_FILE + ".tmp")
+        persisted = {k: v for k, v in state.items() if not k.startswith("_")}
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(persisted, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, index_path)
+        state["_unflushed"] = 0
+        state["_stamp"] = self._stat_key(index_path)
+
+    def _recover_tail(self, survey_dir: Path, state: Dict[str, Any]) -> int:
+        """
+        补齐活动分段中尚未登记到索引的记录，并截掉不完整的末行
+        （调用方持有文件锁，其他进程不会正在写入，半行只可能是崩溃留下的）
+
+        Returns:
+            补齐的记录数
+        """
+        if not state["segments"]:
+            return 0
+        active = state["segments"][-1]
+        seg_path = survey_dir / active["name"]
+        if not seg_path.exists():
+            active.update({"records": 0, "bytes": 0, "offsets": [0]})
+            return 0
+
+        size = seg_path.stat().st_size
+        if size == active["bytes"]:
+            return 0
+
+        recovered = 0
+
+        with open(seg_path, 'rb+') as f:
+            f.seek(active["bytes"])
+            position = active["bytes"]
+            for line in iter(f.readline, b""):
+                if not line.endswith(b"\n"):
+                    # 崩溃时写了一半的记录
+                    f.truncate(position)
+                    break
+                if active["records"] % self.OFFSET_STRIDE == 0 and active["records"] > 0:
+                    active["offsets"].append(position)
+                active["records"] += 1
+                recovered += 1
+                position += len(line)
+            active["bytes"] = position
+        return recovered
+
+    def _remove_orphans(self, survey_dir: Path, state: Dict[str, Any]):
+        """删除索引中不存在的分段文件（压缩中断留下的残留；等待延迟删除的旧分段保留）"""
+        live = {seg["name"] for seg in state["segments"]}
+        live.update(name for name, _ in state["retired"])
+        for path in survey_dir.glob(f"{self.SEGMENT_PREFIX}*"):
+            if path.name not in live:
+                path.unlink()
+
+    def _new_segment(self, survey_dir: Path, state: Dict[str, Any]) -> Dict[str, Any]:
+        """创建新的活动分段并立即登记到索引"""
+        name = f"{self.SEGMENT_PREFIX}{state['next_seq']:06d}{self.SEGMENT_SUFFIX}"
+        state["next_seq"] += 1
+        segment = {"name": name, "records": 0, "bytes": 0, "sealed": False, "offsets": [0]}
+        state["segments"].append(segment)
+        (survey_dir / name).touch()
+        self._write_index(survey_dir, state)
+        return segment
+
+    # ==================== 写入 ====================
+
+    def append(self, survey_dir: Path, record: Dict[str, Any], fsync: bool = False) -> str:
+        """
+        追加一条答案
+
+        Returns:
+            写入的分段文件路径
+        """
+        return self.append_many(survey_dir, [record], fsync=fsync)[0]
+
+    def append_many(
+        self,
+        survey_dir: Path,
+        records: List[Dict[str, Any]],
+        fsync: bool = True
+    ) -> List[str]:
+        """
+        批量追加答案，整批只做一次 write（以及可选的一次 fsync）
+
+        Args:
+            survey_dir: 问卷答案目录
+            records: 答案记录列表
+            fsync: 是否在返回前落盘
+
+        Returns:
+            每条记录所在的分段文件路径
+        """
+        survey_dir = Path(survey_dir)
+        survey_dir.mkdir(parents=True, exist_ok=True)
+        paths = []
+
+        with self._locked(survey_dir):
+            state = self._load_state(survey_dir)
+            next_idx = 0
+
+            while next_idx < len(records):
+                if not state["segments"] or state["segments"][-1].get("sealed"):
+                    self._new_segment(survey_dir, state)
+                active = state["segments"][-1]
+                seg_path = survey_dir / active["name"]
+
+                # 计算本次写入能容纳多少条记录（至少一条）
+                lines = []
+                offsets = []
+                position = active["bytes"]
+                count = active["records"]
+                while next_idx < len(records):
+                    line = (json.dumps(records[next_idx], ensure_ascii=False) + "\n").encode("utf-8")
+                    if lines and (
+                        position + len(line) > self.segment_max_bytes
+                        or count + 1 > self.segment_max_records
+                    ):
+                        break
+                    if count % self.OFFSET_STRIDE == 0 and count > 0:
+                        offsets.append(position)
+                    lines.append(line)
+                    position += len(line)
+                    count += 1
+                    next_idx += 1
+
+                with open(seg_path, 'ab') as f:
+                    f.write(b"".join(lines))
+                    if fsync:
+                        f.flush()
+                        os.fsync(f.fileno())
+
+                active["records"] = count
+                active["bytes"] = position
+                active["offsets"].extend(offsets)
+                state["_unflushed"] = state.get("_unflushed", 0) + len(lines)
+                paths.extend([str(seg_path)] * len(lines))
+
+                if position >= self.segment_max_bytes or count >= self.segment_max_records:
+                    active["sealed"] = True
+                    self._write_index(survey_dir, state)
+                elif state["_unflushed"] >= self.INDEX_FLUSH_RECORDS:
+                    self._write_index(survey_dir, state)
+
+        return paths
+
+    def flush_index(self, survey_dir: Optional[Path] = None):
+        """将内存中的分段状态写回索引（关闭服务时调用）"""
+        targets = [Path(survey_dir)] if survey_dir else [Path(k) for k in list(self._states)]
+        for target in targets:
+            if not self.has_log(target):
+                continue
+            with self._locked(target):
+                # 先同步其他进程的改动，避免用旧状态覆盖索引
+                state = self._load_state(target)
+                if state.get("_unflushed"):
+                    self._write_index(target, state)
+
+    def forget(self, survey_dir: Path):
+        """丢弃某个目录的内存状态（目录被删除时调用）"""
+        with self._lock_for(Path(survey_dir)):
+            self._states.pop(str(survey_dir), None)
+
+    # ==================== 读取 ====================
+
+    def _snapshot(self, survey_dir: Path) -> List[Dict[str, Any]]:
+        """获取分段列表的快照，读取时无需长期持锁"""
+        if not self.has_log(survey_dir):
+            return []
+        with self._locked(survey_dir):
+            state = self._load_state(survey_dir)
+            return [dict(seg) for seg in state["segments"]]
+
+    def count(self, survey_dir: Path) -> int:
+        """日志中的记录总数（只读索引，不扫描文件）"""
+        return sum(seg["records"] for seg in self._snapshot(Path(survey_dir)))
+
+    def iter_records(self, survey_dir: Path, start: int = 0) -> Iterator[Dict[str, Any]]:
+        """
+        按写入顺序顺序流式读取记录
+
+        Args:
+            survey_dir: 问卷答案目录
+            start: 从第几条记录开始（利用稀疏偏移直接定位）
+        """
+        survey_dir = Path(survey_dir)
+        skip = start
+        for seg in self._snapshot(survey_dir):
+            if skip >= seg["records"]:
+                skip -= seg["records"]
+                continue
+
+            stride_idx = min(skip // self.OFFSET_STRIDE, len(seg["offsets"]) - 1)
+            position = seg["offsets"][stride_idx] if seg["offsets"] else 0
+            to_skip = skip - stride_idx * self.OFFSET_STRIDE
+            remaining = seg["records"] - skip
+            skip = 0
+
+            with open(survey_dir / seg["name"], 'rb') as f:
+                f.seek(position)
+                for line in f:
+                    if to_skip > 0:
+                        to_skip -= 1
+                        continue
+                    if remaining <= 0:
+                        break
+                    remaining -= 1
+                    yield json.loads(line)
+
+    # ==================== 压缩 ====================
+
+    def compact(self, survey_dir: Path) -> int:
+        """
+        将相邻的小型已封存分段合并为一个分段
+
+        合并在文件锁下进行（参与合并的都是小分段，总量不超过 segment_max_bytes），
+        其他进程不会看到写了一半的合并文件。合并结果先写入新文件并落盘，再原子替换索引，
+        旧分段登记到 retired，宽限期后删除；任何一步中断都不会丢失数据，残留文件在下次加载时清理。
+
+        Returns:
+            被合并掉的分段数量
+        """
+        survey_dir = Path(survey_dir)
+        if not self.has_log(survey_dir):
+            return 0
+
+        with self._locked(survey_dir):
+            state = self._load_state(survey_dir)
+            self._purge_retired(survey_dir, state)
+
+            # 找出第一组相邻的小分段（活动分段不参与）
+            run: List[Dict[str, Any]] = []
+            for seg in state["segments"]:
+                if seg.get("sealed") and seg["bytes"] < self.compact_min_bytes:
+                    if sum(s["bytes"] for s in run) + seg["bytes"] > self.segment_max_bytes:
+                        if len(run) >= 2:
+                            break
+                        run = []
+                    run.append(seg)
+                elif len(run) >= 2:
+                    break
+                else:
+                    run = []
+            if len(run) < 2:
+                return 0
+
+            name = f"{self.SEGMENT_PREFIX}{state['next_seq']:06d}{self.SEGMENT_SUFFIX}"
+            state["next_seq"] += 1
+            merged_path = survey_dir / name
+            merged = {"name": name, "records": 0, "bytes": 0, "sealed": True, "offsets": [0]}
+            with open(merged_path, 'wb') as out:
+                for seg in run:
+                    with open(survey_dir / seg["name"], 'rb') as f:
+                        for line in f:
+                            if merged["records"] % self.OFFSET_STRIDE == 0 and merged["records"] > 0:
+                                merged["offsets"].append(merged["bytes"])
+                            out.write(line)
+                            merged["records"] += 1
+                            merged["bytes"] += len(line)
+                out.flush()
+                os.fsync(out.fileno())
+
+            run_names = [seg["name"] for seg in run]
+            names = [seg["name"] for seg in state["segments"]]
+            first = names.index(run_names[0])
+            state["segments"][first:first + len(run_names)] = [merged]
+            retired_at = time.time()
+            state["retired"].extend([seg_name, retired_at] for seg_name in run_names)
+            self._write_index(survey_dir, state)
+            return len(run_names)
+
+    def _purge_retired(self, survey_dir: Path, state: Dict[str, Any]):
+        """删除已超过宽限期的旧分段（调用方持有 _locked(survey_dir)）"""
+        now = time.time()
+        keep = []
+        for name, retired_at in state["retired"]:
+            if now - retired_at >= self.graveyard_seconds:
+                (survey_dir / name).unlink(missing_ok=True)
+            else:
+                keep.append([name, retired_at])
+        if len(keep) != len(state["retired"]):
+            state["retired"] = keep
+            self._write_index(survey_dir, state)
+
+    def seal_idle(self, survey_dir: Path) -> bool:
+        """
+        封存空闲超过 seal_idle_seconds 的活动分段
+
+        分段只在写满时封存，低流量问卷的活动分段可能长期停留在很小的体积上；
+        空闲后封存，下次写入新建分段，这些小分段即可被 compact 合并。
+
+        Returns:
+            是否封存了分段
+        """
+        survey_dir = Path(survey_dir)
+        if not self.has_log(survey_dir):
+            return False
+        with self._locked(survey_dir):
+            state = self._load_state(survey_dir)
+            if not state["segments"]:
+                return False
+            active = state["segments"][-1]
+            if active.get("sealed") or active["records"] == 0:
+                return False
+            try:
+                idle = time.time() - (survey_dir / active["name"]).stat().st_mtime
+            except FileNotFoundError:
+                return False
+            if idle < self.seal_idle_seconds:
+                return False
+            active["sealed"] = True
+            self._write_index(survey_dir, state)
+            return True
+
+    def compact_all(self, base_dir: Path) -> int:
+        """封存空闲的活动分段并压缩 base_dir 下所有问卷目录的分段"""
+        merged = 0
+        for survey_dir in Path(base_dir).iterdir():
+            if survey_dir.is_dir() and self.has_log(survey_dir):
+                try:
+                    self.seal_idle(survey_dir)
+                    while True:
+                        n = self.compact(survey_dir)
+                        if not n:
+                            break
+                        merged += n
+                except Exception as e:
+                    print(f"[压缩] {survey_dir.name} 分段压缩失败: {e}")
+        return merged
+
+    def start_compactor(self, base_dir: Path, interval_seconds: int = 300):
+        """启动后台压缩线程"""
+        if self._compactor_thread and self._compactor_thread.is_alive():
+            return
+
+        def run():
+            while not self._compactor_stop.wait(interval_seconds):
+                merged = self.compact_all(base_dir)
+                if merged:
+                    print(f"[压缩] 合并了 {merged} 个小分段")
+
+        self._compactor_stop.clear()
+        self._compactor_thread = threading.Thread(target=run, daemon=True)
+        self._compactor_thread.start()
+
+    def stop_compactor(self):
+        """停止后台压缩线程"""
+        self._compactor_stop.set()
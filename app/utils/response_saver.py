@@ -6,7 +6,18 @@ import os
 import re
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, List, Optional
+
+from app.utils.response_log import ResponseLog
+from app.utils.response_stats import SurveyStatsAggregate, SurveyStatsStore
+from app.utils.response_store import ResponseStore
+from app.utils.survey_registry import survey_registry
+
+# 存储模式：files = 每份答案一个JSON文件（默认，兼容旧数据）；log = 追加式分段日志；
+# sqlite = 嵌入式 SQLite 数据库（WAL，适合多 worker 部署）
+STORAGE_MODE_FILES = "files"
+STORAGE_MODE_LOG = "log"
+STORAGE_MODE_SQLITE = "sqlite"
 
 def sanitize_filename(name: str, max_length: int = 50) -> str:
     """
@@ -29,143 +40,319 @@ def sanitize_filename(name: str, max_length: int = 50) -> str:
     return sanitized
 
 
-class ResponseSaver:
-    """问卷答案存储类"""
+class ResponseSaver(ResponseStore):
+    """问卷答案存储类（文件布局后端）"""
     
-    def __init__(self, base_dir: str = "data/responses"):
+    def __init__(self, base_dir: str = "data/responses", storage_mode: Optional[str] = None):
+        """
+        初始化答案存储
+        
+        Args:
+            base_dir: 答案根目录
+            storage_mode: 存储模式（files/log），默认读取环境变量 RESPONSE_STORAGE_MODE
+        """
         self.base_dir = Path(base_dir)
         self.base_dir.mkdir(parents=True, exist_ok=True)
+        self.storage_mode = storage_mode or os.getenv("RESPONSE_STORAGE_MODE", STORAGE_MODE_FILES)
+        self.response_log = ResponseLog()
+        self.stats_store = SurveyStatsStore()
+        # 已与答案数核对过的统计检查点（每个进程每个问卷只核对一次）
+        self._verified_stats = set()
+        # survey_id -> 答案目录（按目录名后缀建立，避免每次查找都遍历答案根目录）
+        self._dir_index: Optional[Dict[str, Path]] = None
+        self._dir_index_mtime = 0.0
     
-    def save_response(self, survey_id: str, response_data: Dict[str, Any], user_id: str = None, survey_name: str = None) -> str:
+    def start(self):
+        """分段日志模式下启动后台压缩"""
+        if self.storage_mode == STORAGE_MODE_LOG:
+            self.response_log.start_compactor(self.base_dir)
+            print("[OK] 答案分段日志压缩任务已启动")
+    
+    def close(self):
+        """把分段日志的内存索引写回磁盘"""
+        self.response_log.stop_compactor()
+        self.response_log.flush_index()
+    
+    def _survey_dir(self, survey_id: str, survey_name: str = None) -> Path:
+        """问卷答案目录：{问卷名称}_{survey_id} 或 {survey_id}"""
+        if survey_name:
+            folder_name = sanitize_filename(survey_name)
+            # 保留survey_id用于唯一性
+            return self.base_dir / f"{folder_name}_{survey_id}"
+        return self.base_dir / survey_id
+    
+    def resolve_survey_dir(self, survey_id: str, survey_name: str = None, scan: bool = True) -> Path:
         """
-        保存问卷答案
+        定位问卷答案目录
+        
+        未提供问卷名称时从问卷注册表取标题；目录仍不存在时，
+        再按 "_{survey_id}" 后缀精确匹配已有目录。
         
         Args:
-            survey_id: 问卷ID
-            response_data: 答案数据
-            user_id: 用户ID（可选，不提供则自动生成）
-            survey_name: 问卷名称（用于文件夹命名）
+            scan: 为 False 时只查已建立的目录索引，不因答案根目录变化而重新遍历
+                  （列表页摘要等高频接口使用）
+        """
+        if survey_name is None:
+            entry = survey_registry.get(survey_id)
+            survey_name = entry.get("title") if entry else None
+        
+        survey_dir = self._survey_dir(survey_id, survey_name)
+        if survey_dir.exists():
+            return survey_dir
+        
+        plain_dir = self._survey_dir(survey_id)
+        if plain_dir.exists():
+            return plain_dir
+        
+        found = self._lookup_dir_index(survey_id, scan)
+        return found if found is not None else survey_dir
+    
+    def _lookup_dir_index(self, survey_id: str, scan: bool = True) -> Optional[Path]:
+        """按 "_{survey_id}" 后缀精确查找已有目录；答案根目录有变化（其他进程新建目录）时重建索引"""
+        if not scan:
+            found = self._dir_index.get(survey_id) if self._dir_index is not None else None
+            return found if found is not None and found.exists() else None
+        mtime = self.base_dir.stat().st_mtime
+        if self._dir_index is None or mtime != self._dir_index_mtime:
+            index = {}
+            for item in self.base_dir.iterdir():
+                if item.is_dir() and "_" in item.name:
+                    index[item.name.rsplit("_", 1)[1]] = item
+            self._dir_index = index
+            self._dir_index_mtime = mtime
+        
+        found = self._dir_index.get(survey_id)
+        if found is not None and not found.exists():
+            self._dir_index.pop(survey_id, None)
+            return None
+        return found
+    
+    def save_responses_batch(self, items: List[Dict[str, Any]], fsync: bool = True) -> List[str]:
+        """
+        批量保存答案（供提交队列组提交使用）
+        
+        按问卷目录分组写入：分段日志模式下每个目录只有一次 write 和一次 fsync；
+        单文件模式下逐个写文件，fsync 时再同步一次目录。统计聚合每组更新一次。
+        
+        Args:
+            items: [{"survey_id", "response_data", "user_id", "survey_name"}, ...]
+            fsync: 是否在返回前落盘
             
         Returns:
-            保存的文件路径
+            与 items 一一对应的保存路径
         """
         import uuid
         
-        # 如果没有提供用户ID，生成一个UUID
-        if user_id is None:
-            user_id = str(uuid.uuid4())[:8]
-        
-        # 将用户ID添加到答案数据中
-        response_data['user_id'] = user_id
+        groups: Dict[Path, List[int]] = {}
+        for idx, item in enumerate(items):
+            # 如果没有提供用户ID，生成一个UUID
+            user_id = item.get("user_id") or str(uuid.uuid4())[:8]
+            # 将用户ID添加到答案数据中
+            item["response_data"]['user_id'] = user_id
+            survey_dir = self._survey_dir(item["survey_id"], item.get("survey_name"))
+            groups.setdefault(survey_dir, []).append(idx)
         
-        # 使用问卷名称创建文件夹（如果提供了）
-        if survey_name:
-            folder_name = sanitize_filename(survey_name)
-            # 保留survey_id用于唯一性
-            survey_dir = self.base_dir / f"{folder_name}_{survey_id}"
-        else:
-            survey_dir = self.base_dir / survey_id
+        paths: List[Optional[str]] = [None] * len(items)
+        for survey_dir, indices in groups.items():
+            records = [items[i]["response_data"] for i in indices]
+            if self.storage_mode == STORAGE_MODE_LOG:
+                group_paths = self.response_log.append_many(survey_dir, records, fsync=fsync)
+            else:
+                group_paths = self._write_response_files(
+                    survey_dir, [items[i] for i in indices], fsync
+                )
+            for i, path in zip(indices, group_paths):
+                paths[i] = path
+            
+            # 增量更新统计聚合
+            self.stats_store.apply(survey_dir, records)
         
+        return paths
+    
+    def _write_response_files(self, survey_dir: Path, items: List[Dict[str, Any]], fsync: bool) -> List[str]:
+        """单文件模式：每份答案写一个JSON文件"""
         survey_dir.mkdir(parents=True, exist_ok=True)
+        paths = []
+        for item in items:
+            response_data = item["response_data"]
+            # 创建文件名（时间戳 + 用户ID + 问卷ID）
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]  # 添加毫秒以区分同一秒内的多次提交
+            filename = f"{timestamp}_{response_data['user_id']}_{item['survey_id']}.json"
+            
+            # 保存文件
+            file_path = survey_dir / filename
+            with open(file_path, 'w', encoding='utf-8') as f:
+                json.dump(response_data, f, ensure_ascii=False, indent=2)
+                if fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            paths.append(str(file_path))
         
-        # 创建文件名（时间戳 + 用户ID + 问卷ID）
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]  # 添加毫秒以区分同一秒内的多次提交
-        filename = f"{timestamp}_{user_id}_{survey_id}.json"
-        
-        # 保存文件
-        file_path = survey_dir / filename
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(response_data, f, ensure_ascii=False, indent=2)
-        
-        return str(file_path)
+        if fsync and hasattr(os, "O_DIRECTORY"):
+            dir_fd = os.open(survey_dir, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        return paths
     
-    def get_responses(self, survey_id: str, survey_name: str = None) -> list:
+    def iter_responses(self, survey_id: str, survey_name: str = None) -> Iterator[Dict[str, Any]]:
         """
-        获取某个问卷的所有答案
+        顺序流式读取某个问卷的所有答案
+        
+        同时兼容旧的单文件答案和分段日志（迁移过程中两者可能并存）
         
         Args:
             survey_id: 问卷ID
-            survey_name: 问卷名称
-            
-        Returns:
-            答案列表
+            survey_name: 问卷名称（不提供时按注册表/目录后缀定位）
         """
-        # 尝试找到对应的文件夹
-        if survey_name:
-            folder_name = sanitize_filename(survey_name)
-            survey_dir = self.base_dir / f"{folder_name}_{survey_id}"
-        else:
-            survey_dir = self.base_dir / survey_id
+        yield from self.iter_directory(self.resolve_survey_dir(survey_id, survey_name))
+    
+    def iter_directory(self, survey_dir: Path, start: int = 0) -> Iterator[Dict[str, Any]]:
+        """
+        顺序流式读取某个答案目录（单文件答案 + 分段日志）
         
+        Args:
+            survey_dir: 问卷答案目录
+            start: 跳过前 start 份答案（跳过的单文件答案不打开，日志按稀疏偏移定位）
+        """
+        survey_dir = Path(survey_dir)
         if not survey_dir.exists():
-            return []
+            return
         
-        responses = []
-        for file_path in survey_dir.glob("*.json"):
+        files = sorted(survey_dir.glob("*.json"))
+        for file_path in files[start:]:
             with open(file_path, 'r', encoding='utf-8') as f:
-                responses.append(json.load(f))
+                yield json.load(f)
         
-        return responses
+        if self.response_log.has_log(survey_dir):
+            yield from self.response_log.iter_records(survey_dir, start=max(0, start - len(files)))
+    
+    def iter_new_responses(self, survey_id: str, known_count: int, last_submitted_at: Optional[str]) -> Iterator[Dict[str, Any]]:
+        """
+        读取前 known_count 份之后新增的答案
+        
+        新答案总是排在已有答案之后（日志模式追加到日志末尾；单文件模式文件名以写入时间开头），
+        直接按位置跳过；单文件模式下目录中还有旧日志时，新文件会排在日志记录之前，改为按提交时间过滤
+        """
+        survey_dir = self.resolve_survey_dir(survey_id)
+        if self.storage_mode != STORAGE_MODE_LOG and self.response_log.has_log(survey_dir):
+            yield from super().iter_new_responses(survey_id, known_count, last_submitted_at)
+            return
+        yield from self.iter_directory(survey_dir, start=known_count)
+    
+    def count_directory(self, survey_dir: Path) -> int:
+        """统计答案目录中的答案数（只列目录和读索引，不解析答案）"""
+        survey_dir = Path(survey_dir)
+        if not survey_dir.exists():
+            return 0
+        file_count = sum(1 for _ in survey_dir.glob("*.json"))
+        return file_count + self.response_log.count(survey_dir)
+    
+    def count_responses(self, survey_id: str) -> int:
+        """某个问卷的答案数"""
+        return self.count_directory(self.resolve_survey_dir(survey_id))
+    
+    def delete_survey(self, survey_id: str) -> int:
+        """删除问卷答案目录（同时丢弃日志索引和统计缓存）"""
+        import shutil
+        
+        survey_dir = self.resolve_survey_dir(survey_id)
+        if not survey_dir.exists():
+            return 0
+        count = self.count_directory(survey_dir)
+        self.response_log.forget(survey_dir)
+        self.stats_store.forget(survey_dir)
+        self._verified_stats.discard(str(survey_dir))
+        if self._dir_index is not None:
+            self._dir_index.pop(survey_id, None)
+        shutil.rmtree(survey_dir)
+        return count
+    
+    def rebuild_statistics(self, survey_dir: Path):
+        """从全部答案重建统计聚合"""
+        aggregate = self.stats_store.rebuild(survey_dir, self.iter_directory(survey_dir))
+        self._verified_stats.add(str(survey_dir))
+        return aggregate
+    
+    def verify_statistics(self, survey_dir: Path) -> bool:
+        """重新计算统计并与检查点比对，返回是否一致"""
+        stored = self.stats_store.load(survey_dir)
+        fresh = SurveyStatsAggregate()
+        for response in self.iter_directory(survey_dir):
+            fresh.update(response)
+        return stored is not None and stored.counters() == fresh.counters()
+    
+    def _load_verified_aggregate(self, survey_dir: Path) -> SurveyStatsAggregate:
+        """
+        读取统计聚合；检查点缺失或与答案数不一致时全量重建（每个进程每个目录只核对一次）
+        
+        检查点被其他 worker 改写后 stats_store.load 会重新读取，不会返回本进程的旧副本
+        """
+        aggregate = self.stats_store.load(survey_dir)
+        if str(survey_dir) not in self._verified_stats:
+            if aggregate is None or aggregate.response_count != self.count_directory(survey_dir):
+                aggregate = self.stats_store.rebuild(survey_dir, self.iter_directory(survey_dir))
+            self._verified_stats.add(str(survey_dir))
+        return aggregate
+    
+    def get_response_summary(self, survey_id: str) -> Dict[str, Any]:
+        """
+        答案数和最近提交时间，直接取自增量维护的统计检查点
+        
+        不遍历答案根目录、不列答案文件：目录不存在即没有答案；有检查点时直接返回，
+        不再与答案数核对（核对在 get_statistics 和 rebuild_response_stats 脚本中进行）；
+        只有升级前没有检查点的旧数据才全量构建一次，之后所有进程都读检查点。
+        """
+        survey_dir = self.resolve_survey_dir(survey_id, scan=False)
+        if not survey_dir.exists():
+            return {"response_count": 0, "last_submitted_at": None}
+        aggregate = self.stats_store.load(survey_dir)
+        if aggregate is None:
+            aggregate = self._load_verified_aggregate(survey_dir)
+        return {
+            "response_count": aggregate.response_count,
+            "last_submitted_at": aggregate.last_submitted_at
+        }
     
     def get_statistics(self, survey_id: str) -> Dict[str, Any]:
         """
         获取问卷统计数据
         
+        直接返回增量维护的聚合结果；检查点缺失或与答案数不一致时
+        （例如升级前的旧数据、写入后进程崩溃）才全量重建一次。
+        
         Args:
             survey_id: 问卷ID
             
         Returns:
             统计数据
         """
-        responses = self.get_responses(survey_id)
-        
-        if not responses:
+        survey_dir = self.resolve_survey_dir(survey_id)
+        if not survey_dir.exists():
             return {
                 "total_responses": 0,
                 "question_stats": {}
             }
         
-        # 统计每个问题的答案
-        question_stats = {}
-        
-        for response in responses:
-            for question_id, answer in response.get("answers", {}).items():
-                if question_id not in question_stats:
-                    question_stats[question_id] = {
-                        "type": answer.get("type"),
-                        "answers": []
-                    }
-                question_stats[question_id]["answers"].append(answer.get("value"))
-        
-        # 计算统计数据
-        stats = {}
-        for qid, data in question_stats.items():
-            answer_type = data.get("type")
-            answers = data.get("answers", [])
-            
-            if answer_type in ["单选题", "多选题"]:
-                # 统计选项选择次数
-                counts = {}
-                for ans in answers:
-                    counts[ans] = counts.get(ans, 0) + 1
-                stats[qid] = {"type": answer_type, "counts": counts}
-            elif answer_type == "量表题":
-                # 计算平均值和分布
-                numeric_answers = [int(a) for a in answers if str(a).isdigit()]
-                if numeric_answers:
-                    stats[qid] = {
-                        "type": answer_type,
-                        "average": sum(numeric_answers) / len(numeric_answers),
-                        "min": min(numeric_answers),
-                        "max": max(numeric_answers),
-                        "distribution": {str(i): numeric_answers.count(i) for i in range(1, 6)}
-                    }
-            elif answer_type == "开放式问题":
-                # 返回所有答案
-                stats[qid] = {"type": answer_type, "answers": answers}
-        
-        return {
-            "total_responses": len(responses),
-            "question_stats": stats
-        }
+        return self._load_verified_aggregate(survey_dir).to_statistics()
+
+
+_response_store: Optional[ResponseStore] = None
 
+
+def get_response_store() -> ResponseStore:
+    """
+    获取全局答案存储（按 RESPONSE_STORAGE_MODE 选择后端）
+    
+    files/log 使用文件布局；sqlite 使用 RESPONSE_DB_PATH 指定的数据库（默认 data/responses.db）
+    """
+    global _response_store
+    if _response_store is None:
+        mode = os.getenv("RESPONSE_STORAGE_MODE", STORAGE_MODE_FILES)
+        if mode == STORAGE_MODE_SQLITE:
+            from app.utils.response_sqlite import SQLiteResponseStore
+            _response_store = SQLiteResponseStore(os.getenv("RESPONSE_DB_PATH", "data/responses.db"))
+        else:
+            _response_store = ResponseSaver(storage_mode=mode)
+    return _response_store
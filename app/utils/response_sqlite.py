@@ -0,0 +1,252 @@
+"""
+SQLite 答案存储后端
+单个数据库文件（默认 data/responses.db），WAL 模式下多个 uvicorn worker 进程可以同时读写：
+写入用 BEGIN IMMEDIATE 串行化，读取不阻塞写入。统计聚合与答案在同一事务中更新，
+因此多进程下统计也不会丢失更新。
+"""
+
+import json
+import sqlite3
+import threading
+import uuid
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional
+
+from app.utils.response_stats import SurveyStatsAggregate
+from app.utils.response_store import ResponseStore
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    survey_id TEXT NOT NULL,
+    user_id TEXT,
+    submitted_at TEXT NOT NULL DEFAULT '',
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_survey_time ON responses (survey_id, submitted_at);
+CREATE TABLE IF NOT EXISTS survey_stats (
+    survey_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+"""
+
+
+class SQLiteResponseStore(ResponseStore):
+    """SQLite（WAL）答案存储
+
+    - 每个线程一个连接（提交队列在线程池中写入，分析服务在其他线程读取）
+    - 批量写入：一个事务内插入整批答案并更新统计，只提交一次
+    - 流式读取：按 (submitted_at, id) 键集分页，每页一个短读事务，不长期占用快照
+    """
+
+    storage_mode = "sqlite"
+    FETCH_SIZE = 1000
+    BUSY_TIMEOUT_MS = 10000
+
+    def __init__(self, db_path: str = "data/responses.db"):
+        """
+        初始化 SQLite 存储
+
+        Args:
+            db_path: 数据库文件路径
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """获取当前线程的连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None：自行控制事务边界
+            conn = sqlite3.connect(
+                str(self.db_path),
+                timeout=self.BUSY_TIMEOUT_MS / 1000,
+                isolation_level=None,
+                check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA busy_timeout={self.BUSY_TIMEOUT_MS}")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self):
+        """关闭所有线程的连接"""
+        with self._connections_lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._connections = []
+        self._local = threading.local()
+
+    def save_responses_batch(self, items: List[Dict[str, Any]], fsync: bool = True) -> List[str]:
+        """
+        批量保存答案
+
+        整批在一个写事务内完成；fsync=True 时使用 synchronous=FULL，
+        保证提交返回后即使断电也不丢失。
+
+        Returns:
+            "数据库路径#行号" 形式的保存位置
+        """
+        if not items:
+            return []
+
+        conn = self._connect()
+        conn.execute(f"PRAGMA synchronous={'FULL' if fsync else 'NORMAL'}")
+        paths = []
+        touched: Dict[str, List[Dict[str, Any]]] = {}
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for item in items:
+                response_data = item["response_data"]
+                # 如果没有提供用户ID，生成一个UUID
+                user_id = item.get("user_id") or str(uuid.uuid4())[:8]
+                response_data["user_id"] = user_id
+                cursor = conn.execute(
+                    "INSERT INTO responses (survey_id, user_id, submitted_at, data) VALUES (?, ?, ?, ?)",
+                    (
+                        item["survey_id"],
+                        user_id,
+                        response_data.get("submitted_at") or "",
+                        json.dumps(response_data, ensure_ascii=False)
+                    )
+                )
+                paths.append(f"{self.db_path}#{cursor.lastrowid}")
+                touched.setdefault(item["survey_id"], []).append(response_data)
+
+            # 增量更新统计聚合（与答案同一事务）
+            for survey_id, records in touched.items():
+                aggregate = self._load_aggregate(conn, survey_id) or SurveyStatsAggregate()
+                for record in records:
+                    aggregate.update(record)
+                self._store_aggregate(conn, survey_id, aggregate)
+
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return paths
+
+    def iter_responses(self, survey_id: str, survey_name: str = None) -> Iterator[Dict[str, Any]]:
+        """按提交时间顺序分页读取答案"""
+        return self._iter_pages(survey_id)
+
+    def iter_new_responses(self, survey_id: str, known_count: int, last_submitted_at: Optional[str]) -> Iterator[Dict[str, Any]]:
+        """提交时间晚于 last_submitted_at 的答案（走 (survey_id, submitted_at) 索引）"""
+        return self._iter_pages(survey_id, last_submitted_at)
+
+    def _iter_pages(self, survey_id: str, submitted_after: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """按 (submitted_at, id) 键集分页读取，可只读提交时间晚于 submitted_after 的答案"""
+        conn = self._connect()
+        # (submitted_after, 最大 id) 之后即提交时间严格晚于 submitted_after
+        last_key: Optional[tuple] = (submitted_after, 2 ** 63 - 1) if submitted_after is not None else None
+        while True:
+            if last_key is None:
+                rows = conn.execute(
+                    "SELECT submitted_at, id, data FROM responses WHERE survey_id = ? "
+                    "ORDER BY submitted_at, id LIMIT ?",
+                    (survey_id, self.FETCH_SIZE)
+                ).fetchall()
+            else:
+                rows = conn.execute(
+                    "SELECT submitted_at, id, data FROM responses WHERE survey_id = ? "
+                    "AND (submitted_at, id) > (?, ?) ORDER BY submitted_at, id LIMIT ?",
+                    (survey_id, last_key[0], last_key[1], self.FETCH_SIZE)
+                ).fetchall()
+            if not rows:
+                return
+            for _, _, data in rows:
+                yield json.loads(data)
+            last_key = (rows[-1][0], rows[-1][1])
+            if len(rows) < self.FETCH_SIZE:
+                return
+
+    def count_responses(self, survey_id: str) -> int:
+        """某个问卷的答案数（走 survey_id 索引）"""
+        row = self._connect().execute(
+            "SELECT COUNT(*) FROM responses WHERE survey_id = ?", (survey_id,)
+        ).fetchone()
+        return row[0]
+
+    def get_response_summary(self, survey_id: str) -> Dict[str, Any]:
+        """答案数和最近提交时间（读统计聚合的一行）"""
+        aggregate = self._load_aggregate(self._connect(), survey_id)
+        if aggregate is None:
+            return {"response_count": self.count_responses(survey_id), "last_submitted_at": None}
+        return {
+            "response_count": aggregate.response_count,
+            "last_submitted_at": aggregate.last_submitted_at
+        }
+
+    def get_statistics(self, survey_id: str) -> Dict[str, Any]:
+        """
+        获取问卷统计数据
+
+        统计聚合与答案同事务维护，这里只读一行；
+        聚合缺失（例如直接导入的数据）时全量重建一次。
+        """
+        conn = self._connect()
+        aggregate = self._load_aggregate(conn, survey_id)
+        if aggregate is None:
+            if not self.count_responses(survey_id):
+                return {
+                    "total_responses": 0,
+                    "question_stats": {}
+                }
+            aggregate = self.rebuild_statistics(survey_id)
+        return aggregate.to_statistics()
+
+    def rebuild_statistics(self, survey_id: str) -> SurveyStatsAggregate:
+        """从全部答案重建统计聚合"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            aggregate = SurveyStatsAggregate()
+            for (data,) in conn.execute(
+                "SELECT data FROM responses WHERE survey_id = ? ORDER BY submitted_at, id",
+                (survey_id,)
+            ):
+                aggregate.update(json.loads(data))
+            self._store_aggregate(conn, survey_id, aggregate)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return aggregate
+
+    def delete_survey(self, survey_id: str) -> int:
+        """删除某个问卷的全部答案和统计"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            deleted = conn.execute("DELETE FROM responses WHERE survey_id = ?", (survey_id,)).rowcount
+            conn.execute("DELETE FROM survey_stats WHERE survey_id = ?", (survey_id,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return deleted
+
+    @staticmethod
+    def _load_aggregate(conn: sqlite3.Connection, survey_id: str) -> Optional[SurveyStatsAggregate]:
+        row = conn.execute("SELECT data FROM survey_stats WHERE survey_id = ?", (survey_id,)).fetchone()
+        return SurveyStatsAggregate(json.loads(row[0])) if row else None
+
+    @staticmethod
+    def _store_aggregate(conn: sqlite3.Connection, survey_id: str, aggregate: SurveyStatsAggregate):
+        conn.execute(
+            "INSERT INTO survey_stats (survey_id, data) VALUES (?, ?) "
+            "ON CONFLICT(survey_id) DO UPDATE SET data = excluded.data",
+            (survey_id, json.dumps(aggregate.to_dict(), ensure_ascii=False))
+        )
@@ -0,0 +1,249 @@
+"""
+问卷统计聚合模块
+在保存答案时以 O(题目数) 增量更新统计量，统计接口直接读取聚合结果
+"""
+
+import json
+import math
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, Iterable, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows：没有文件锁，只支持单进程部署
+    fcntl = None
+
+
+CHOICE_TYPES = ("单选题", "多选题")
+SCALE_TYPE = "量表题"
+OPEN_TYPE = "开放式问题"
+
+
+class SurveyStatsAggregate:
+    """单个问卷的增量统计量
+
+    - 单选/多选：各选项计数
+    - 量表：样本数、和、平方和、最小/最大值、直方图
+    - 开放题：回答数、总字数、最近若干条回答
+    """
+
+    RECENT_OPEN_ANSWERS = 20
+
+    def __init__(self, data: Optional[Dict[str, Any]] = None):
+        data = data or {}
+        self.response_count: int = data.get("response_count", 0)
+        self.last_submitted_at: Optional[str] = data.get("last_submitted_at")
+        self.questions: Dict[str, Dict[str, Any]] = data.get("questions", {})
+
+    def update(self, response: Dict[str, Any]):
+        """累加一份答案"""
+        self.response_count += 1
+        submitted_at = response.get("submitted_at")
+        if submitted_at and (not self.last_submitted_at or submitted_at > self.last_submitted_at):
+            self.last_submitted_at = submitted_at
+
+        for question_id, answer in response.get("answers", {}).items():
+            if not isinstance(answer, dict):
+                continue
+            answer_type = answer.get("type")
+            value = answer.get("value")
+            q = self.questions.get(question_id)
+            if q is None:
+                q = self.questions[question_id] = {"type": answer_type}
+
+            if answer_type in CHOICE_TYPES:
+                counts = q.setdefault("counts", {})
+                for option in (value if isinstance(value, list) else [value]):
+                    key = str(option)
+                    counts[key] = counts.get(key, 0) + 1
+
+            elif answer_type == SCALE_TYPE:
+                if not str(value).isdigit():
+                    continue
+                score = int(value)
+                q["n"] = q.get("n", 0) + 1
+                q["sum"] = q.get("sum", 0) + score
+                q["sum_sq"] = q.get("sum_sq", 0) + score * score
+                q["min"] = score if q.get("min") is None else min(q["min"], score)
+                q["max"] = score if q.get("max") is None else max(q["max"], score)
+                histogram = q.setdefault("histogram", {})
+                histogram[str(score)] = histogram.get(str(score), 0) + 1
+
+            elif answer_type == OPEN_TYPE:
+                text = str(value).strip() if value is not None else ""
+                if not text:
+                    continue
+                q["answer_count"] = q.get("answer_count", 0) + 1
+                q["total_chars"] = q.get("total_chars", 0) + len(text)
+                recent = q.setdefault("recent_answers", [])
+                recent.append(text)
+                if len(recent) > self.RECENT_OPEN_ANSWERS:
+                    del recent[:-self.RECENT_OPEN_ANSWERS]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "response_count": self.response_count,
+            "last_submitted_at": self.last_submitted_at,
+            "questions": self.questions
+        }
+
+    def counters(self) -> Dict[str, Any]:
+        """与读取顺序无关的计数部分（用于校验检查点）"""
+        return {
+            "response_count": self.response_count,
+            "last_submitted_at": self.last_submitted_at,
+            "questions": {
+                qid: {k: v for k, v in q.items() if k != "recent_answers"}
+                for qid, q in self.questions.items()
+            }
+        }
+
+    def to_statistics(self) -> Dict[str, Any]:
+        """转换为统计接口的返回格式"""
+        stats = {}
+        for qid, q in self.questions.items():
+            answer_type = q.get("type")
+            if answer_type in CHOICE_TYPES:
+                stats[qid] = {"type": answer_type, "counts": dict(q.get("counts", {}))}
+            elif answer_type == SCALE_TYPE and q.get("n"):
+                n = q["n"]
+                mean = q["sum"] / n
+                variance = max(q["sum_sq"] / n - mean * mean, 0.0)
+                distribution = {str(i): 0 for i in range(1, 6)}
+                distribution.update(q.get("histogram", {}))
+                stats[qid] = {
+                    "type": answer_type,
+                    "average": mean,
+                    "std": math.sqrt(variance),
+                    "min": q["min"],
+                    "max": q["max"],
+                    "distribution": distribution
+                }
+            elif answer_type == OPEN_TYPE and q.get("answer_count"):
+                recent = list(q.get("recent_answers", []))
+                stats[qid] = {
+                    "type": answer_type,
+                    # 兼容旧字段：只包含最近 RECENT_OPEN_ANSWERS 条回答，全部回答数见 answer_count
+                    "answers": recent,
+                    "answer_count": q["answer_count"],
+                    "average_length": round(q["total_chars"] / q["answer_count"], 1),
+                    "recent_answers": recent
+                }
+
+        return {
+            "total_responses": self.response_count,
+            "last_submitted_at": self.last_submitted_at,
+            "question_stats": stats
+        }
+
+
+class SurveyStatsStore:
+    """统计聚合的内存缓存与检查点
+
+    检查点 stats.ckpt 保存在问卷答案目录内（不使用 .json 后缀，避免被当作答案文件读取），
+    每次更新后原子写回。
+
+    多 worker 部署时各进程共用检查点：内存中的聚合记录对应检查点的 (inode, mtime_ns, size)
+    （原子替换每次都会换 inode，不受 mtime 精度影响），检查点被其他进程改写后重新读取；读取-累加-写回在目录内的 stats.lock 文件锁下进行，
+    不会丢失其他进程的更新（没有 fcntl 的平台只支持单进程部署）。
+    """
+
+    CHECKPOINT_FILE = "stats.ckpt"
+    LOCK_FILE = "stats.lock"
+
+    def __init__(self):
+        self._aggregates: Dict[str, SurveyStatsAggregate] = {}
+        # 内存中的聚合对应的检查点 (inode, mtime_ns, size)
+        self._stamps: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def _checkpoint_path(self, survey_dir: Path) -> Path:
+        return Path(survey_dir) / self.CHECKPOINT_FILE
+
+    @staticmethod
+    def _stat_key(stat: os.stat_result) -> tuple:
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    @contextmanager
+    def _locked(self, survey_dir: Path):
+        """进程内锁 + 跨进程文件锁"""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            Path(survey_dir).mkdir(parents=True, exist_ok=True)
+            with open(Path(survey_dir) / self.LOCK_FILE, 'a') as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _load_locked(self, survey_dir: Path) -> Optional[SurveyStatsAggregate]:
+        """读取聚合：检查点未变化时用内存中的副本，否则重新读取（调用方持有锁）"""
+        key = str(survey_dir)
+        path = self._checkpoint_path(survey_dir)
+        try:
+            stamp = self._stat_key(os.stat(path))
+        except FileNotFoundError:
+            self._aggregates.pop(key, None)
+            self._stamps.pop(key, None)
+            return None
+        if key in self._aggregates and self._stamps.get(key) == stamp:
+            return self._aggregates[key]
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                aggregate = SurveyStatsAggregate(json.load(f))
+                stamp = self._stat_key(os.fstat(f.fileno()))
+        except Exception as e:
+            print(f"读取统计检查点失败: {e}")
+            return None
+        self._aggregates[key] = aggregate
+        self._stamps[key] = stamp
+        return aggregate
+
+    def load(self, survey_dir: Path) -> Optional[SurveyStatsAggregate]:
+        """读取聚合（检查点未被改写时直接用内存中的副本），不存在时返回 None"""
+        with self._lock:
+            return self._load_locked(survey_dir)
+
+    def apply(self, survey_dir: Path, responses: Iterable[Dict[str, Any]]) -> SurveyStatsAggregate:
+        """将新保存的答案累加到聚合并写回检查点"""
+        with self._locked(survey_dir):
+            aggregate = self._load_locked(survey_dir) or SurveyStatsAggregate()
+            for response in responses:
+                aggregate.update(response)
+            self._write_checkpoint(survey_dir, aggregate)
+        return aggregate
+
+    def rebuild(self, survey_dir: Path, responses: Iterable[Dict[str, Any]]) -> SurveyStatsAggregate:
+        """从全部答案重新计算聚合并覆盖检查点"""
+        with self._locked(survey_dir):
+            aggregate = SurveyStatsAggregate()
+            for response in responses:
+                aggregate.update(response)
+            self._write_checkpoint(survey_dir, aggregate)
+        return aggregate
+
+    def forget(self, survey_dir: Path):
+        """丢弃内存中的聚合（目录被删除时调用）"""
+        with self._lock:
+            self._aggregates.pop(str(survey_dir), None)
+            self._stamps.pop(str(survey_dir), None)
+
+    def _write_checkpoint(self, survey_dir: Path, aggregate: SurveyStatsAggregate):
+        """原子写回检查点并记录其 (inode, mtime_ns, size)（调用方持有锁）"""
+        path = self._checkpoint_path(survey_dir)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(aggregate.to_dict(), f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+            stamp = self._stat_key(os.fstat(f.fileno()))
+        os.replace(tmp_path, path)
+        self._aggregates[str(survey_dir)] = aggregate
+        self._stamps[str(survey_dir)] = stamp
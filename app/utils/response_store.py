@@ -0,0 +1,98 @@
+"""
+答案存储接口
+提交队列、统计接口和分析服务都只通过该接口读写答案，具体存储方式由后端实现：
+- ResponseSaver：文件布局（单文件JSON / 追加式分段日志）
+- SQLiteResponseStore：嵌入式 SQLite（WAL 模式，支持多进程并发访问）
+"""
+
+from abc import ABC, abstractmethod
+from typing import Dict, Any, Iterator, List, Optional
+
+
+class ResponseStore(ABC):
+    """答案存储后端基类"""
+
+    storage_mode: str = ""
+
+    def start(self):
+        """服务启动时调用（启动后台任务等），默认无操作"""
+
+    def close(self):
+        """服务关闭时调用（写回内存状态、关闭连接），默认无操作"""
+
+    def save_response(self, survey_id: str, response_data: Dict[str, Any], user_id: str = None, survey_name: str = None) -> str:
+        """
+        保存单份答案
+
+        Args:
+            survey_id: 问卷ID
+            response_data: 答案数据
+            user_id: 用户ID（可选，不提供则自动生成）
+            survey_name: 问卷名称
+
+        Returns:
+            保存位置
+        """
+        return self.save_responses_batch([{
+            "survey_id": survey_id,
+            "response_data": response_data,
+            "user_id": user_id,
+            "survey_name": survey_name
+        }], fsync=False)[0]
+
+    @abstractmethod
+    def save_responses_batch(self, items: List[Dict[str, Any]], fsync: bool = True) -> List[str]:
+        """
+        批量保存答案
+
+        Args:
+            items: [{"survey_id", "response_data", "user_id", "survey_name"}, ...]
+            fsync: 是否在返回前落盘
+
+        Returns:
+            与 items 一一对应的保存位置
+        """
+
+    @abstractmethod
+    def iter_responses(self, survey_id: str, survey_name: str = None) -> Iterator[Dict[str, Any]]:
+        """按提交顺序流式读取某个问卷的所有答案"""
+
+    def get_responses(self, survey_id: str, survey_name: str = None) -> list:
+        """获取某个问卷的所有答案"""
+        return list(self.iter_responses(survey_id, survey_name))
+
+    def iter_new_responses(self, survey_id: str, known_count: int, last_submitted_at: Optional[str]) -> Iterator[Dict[str, Any]]:
+        """
+        读取已有的前 known_count 份答案之后新增的答案（统计视图增量更新使用）
+
+        默认按提交时间晚于 last_submitted_at 过滤；调用方应核对返回数量与答案总数，
+        不一致时（例如提交时间相同）改为全量读取。
+
+        Args:
+            survey_id: 问卷ID
+            known_count: 已读取的答案数
+            last_submitted_at: 已读取答案中最晚的提交时间
+        """
+        for response in self.iter_responses(survey_id):
+            submitted_at = response.get("submitted_at") or ""
+            if last_submitted_at is None or submitted_at > last_submitted_at:
+                yield response
+
+    @abstractmethod
+    def count_responses(self, survey_id: str) -> int:
+        """某个问卷的答案数"""
+
+    def get_response_summary(self, survey_id: str) -> Dict[str, Any]:
+        """答案数和最近提交时间（工作台列表使用，应为 O(1)）"""
+        return {
+            "response_count": self.count_responses(survey_id),
+            "last_submitted_at": None
+        }
+
+    @abstractmethod
+    def get_statistics(self, survey_id: str) -> Dict[str, Any]:
+        """问卷统计数据（total_responses / last_submitted_at / question_stats）"""
+
+    @abstractmethod
+    def delete_survey(self, survey_id: str) -> int:
+        """删除某个问卷的全部答案，返回删除数量"""
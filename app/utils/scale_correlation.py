@@ -0,0 +1,152 @@
+"""
+量表题相关分析与关键驱动因素分析
+在 SurveyColumns.scale_matrix（回答者 × 量表题，缺失值用该题均值填充）上计算：
+- Pearson / Spearman 相关矩阵：XᵀX 矩阵乘法（BLAS），计算量与回答数成线性
+- 缺失情况：各题缺失率和两两同时作答的人数
+- 关键驱动因素：各题对"总体满意度"题的相关系数、标准化回归系数和 Pratt 相对重要性
+"""
+
+import re
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+from app.utils.survey_columns import SurveyColumns, ScaleColumn
+
+# 未指定目标题时，按标题关键词识别"总体满意度"题
+_TARGET_PATTERN = re.compile(r"(总体|整体|综合|总的来说|推荐).*(满意|评价|评分|推荐)|满意度")
+
+
+def pearson_matrix(matrix: np.ndarray) -> np.ndarray:
+    """
+    列间 Pearson 相关矩阵（零方差题与其他题的相关记为0）
+
+    协方差由 XᵀX 和列和得到（两次 BLAS 运算，不复制中心化矩阵）；量表分值范围小，不存在数值抵消问题
+    """
+    n, k = matrix.shape
+    if n < 2:
+        return np.eye(k)
+    matrix = np.asarray(matrix, dtype=np.float64)
+    sums = np.ones(n) @ matrix
+    covariance = (matrix.T @ matrix - np.outer(sums, sums) / n) / (n - 1)
+    std = np.sqrt(np.clip(np.diag(covariance), 0, None))
+    std[std == 0] = np.inf
+    corr = covariance / np.outer(std, std)
+    np.fill_diagonal(corr, 1.0)
+    return np.clip(corr, -1.0, 1.0)
+
+
+def _rank_column(values: np.ndarray) -> np.ndarray:
+    """平均秩（并列取平均）；整数量表用 bincount 计数，O(n)"""
+    low, high = values.min(), values.max()
+    if np.all(values == np.round(values)) and high - low <= 1000:
+        codes = (values - low).astype(np.int64)
+        counts = np.bincount(codes)
+        # 每个分值的平均秩 = 之前所有分值的人数 + (本分值人数 + 1) / 2
+        average_rank = np.cumsum(counts) - counts + (counts + 1) / 2.0
+        return average_rank[codes]
+    _, inverse, counts = np.unique(values, return_inverse=True, return_counts=True)
+    average_rank = np.cumsum(counts) - counts + (counts + 1) / 2.0
+    return average_rank[inverse]
+
+
+def spearman_matrix(matrix: np.ndarray) -> np.ndarray:
+    """列间 Spearman 相关矩阵（秩上的 Pearson 相关）"""
+    if matrix.shape[0] < 2:
+        return np.eye(matrix.shape[1])
+    ranks = np.column_stack([_rank_column(matrix[:, j]) for j in range(matrix.shape[1])])
+    return pearson_matrix(ranks)
+
+
+def key_drivers(corr: np.ndarray, target: int) -> List[Dict[str, Any]]:
+    """
+    关键驱动因素排序
+
+    以其余各题为自变量、目标题为因变量的标准化线性回归，系数直接由相关矩阵求解 β = R_xx⁻¹ r_xy，
+    与回答数无关；importance = β × r（Pratt 度量，各题之和为 R²），share 为占 R² 的比例。
+
+    Args:
+        corr: Pearson 相关矩阵
+        target: 目标题（总体满意度）的列序号
+
+    Returns:
+        [{"index", "correlation", "beta", "importance", "share"}]，按 importance 降序
+    """
+    predictors = [j for j in range(corr.shape[0]) if j != target]
+    if not predictors:
+        return []
+
+    r = corr[predictors, target]
+    # 最小二乘求解，自变量高度共线（相关矩阵奇异）时也能得到解
+    beta, *_ = np.linalg.lstsq(corr[np.ix_(predictors, predictors)], r, rcond=None)
+    importance = beta * r
+    r_squared = float(importance.sum())
+
+    drivers = [
+        {
+            "index": j,
+            "correlation": round(float(r[i]), 4),
+            "beta": round(float(beta[i]), 4),
+            "importance": round(float(importance[i]), 4),
+            "share": round(float(importance[i] / r_squared * 100), 1) if r_squared > 0 else 0.0
+        }
+        for i, j in enumerate(predictors)
+    ]
+    drivers.sort(key=lambda item: item["importance"], reverse=True)
+    return drivers
+
+
+def find_target(columns: List[ScaleColumn]) -> int:
+    """按标题识别总体满意度题，找不到时取最后一个量表题"""
+    for i, column in enumerate(columns):
+        if _TARGET_PATTERN.search(column.title):
+            return i
+    return len(columns) - 1
+
+
+def correlation_analysis(survey_columns: SurveyColumns, target_question_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    量表题相关分析和关键驱动因素分析
+
+    Args:
+        survey_columns: 问卷列式视图
+        target_question_id: 总体满意度题的ID（默认按标题识别）
+
+    Returns:
+        {"questions", "respondents", "pearson", "spearman", "missing_rate", "pairwise_n", "imputed_cells", "target", "drivers", "r_squared"}
+
+    Raises:
+        ValueError: 有效量表题不足2个，或目标题不是有效的量表题
+    """
+    scale = survey_columns.scale_matrix(impute=True)
+    columns, matrix, missing = scale["columns"], scale["matrix"], scale["missing"]
+    if len(columns) < 2:
+        raise ValueError("有作答的量表题不足2个，无法进行相关分析")
+
+    if target_question_id is not None:
+        ids = [c.question_id for c in columns]
+        if str(target_question_id) not in ids:
+            raise ValueError(f"目标题不是有作答的量表题: {target_question_id}")
+        target = ids.index(str(target_question_id))
+    else:
+        target = find_target(columns)
+
+    pearson = pearson_matrix(matrix)
+    answered = (~missing).astype(np.float64)
+    drivers = key_drivers(pearson, target) if matrix.shape[0] >= 3 else []
+
+    return {
+        "questions": [{"id": c.question_id, "title": c.title} for c in columns],
+        "respondents": int(matrix.shape[0]),
+        "pearson": np.round(pearson, 4).tolist(),
+        "spearman": np.round(spearman_matrix(matrix), 4).tolist(),
+        "missing_rate": np.round(missing.mean(axis=0) * 100, 1).tolist() if matrix.shape[0] else [0.0] * len(columns),
+        "pairwise_n": np.rint(answered.T @ answered).astype(np.int64).tolist(),
+        "imputed_cells": int(missing.sum()),
+        "target": {"id": columns[target].question_id, "title": columns[target].title},
+        "drivers": [
+            {"id": columns[d["index"]].question_id, "title": columns[d["index"]].title, **{k: v for k, v in d.items() if k != "index"}}
+            for d in drivers
+        ],
+        "r_squared": round(sum(d["importance"] for d in drivers), 4)
+    }
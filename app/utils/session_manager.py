@@ -3,12 +3,12 @@
 """
 
 import secrets
-import json
-import os
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 from pathlib import Path
 
+from app.utils.kv_store import DurableKVStore
+
 
 class SessionManager:
     """会话管理器"""
@@ -17,43 +17,38 @@ class SessionManager:
         self.sessions: Dict[str, Dict[str, Any]] = {}
         self.expire_hours = expire_hours
         self.sessions_file = Path("data/sessions.json")
-        self.sessions_file.parent.mkdir(exist_ok=True)
+        self._kv = DurableKVStore(str(self.sessions_file))
         
         # 启动时加载持久化的会话
         self._load_sessions()
     
     def _load_sessions(self):
-        """从文件加载会话"""
-        if self.sessions_file.exists():
-            try:
-                with open(self.sessions_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    # 转换时间字符串为datetime对象
-                    for session_id, session_data in data.items():
-                        session_data['created_at'] = datetime.fromisoformat(session_data['created_at'])
-                        session_data['last_access'] = datetime.fromisoformat(session_data['last_access'])
-                        self.sessions[session_id] = session_data
-                print(f"加载了 {len(self.sessions)} 个持久化会话")
-            except Exception as e:
-                print(f"加载会话文件失败: {e}")
-                self.sessions = {}
-    
-    def _save_sessions(self):
-        """保存会话到文件"""
+        """从快照和日志加载会话"""
         try:
-            # 转换datetime对象为字符串
-            data = {}
-            for session_id, session_data in self.sessions.items():
-                data[session_id] = {
+            for session_id, session_data in self._kv.items():
+                # 转换时间字符串为datetime对象
+                self.sessions[session_id] = {
                     'username': session_data['username'],
-                    'created_at': session_data['created_at'].isoformat(),
-                    'last_access': session_data['last_access'].isoformat()
+                    'created_at': datetime.fromisoformat(session_data['created_at']),
+                    'last_access': datetime.fromisoformat(session_data['last_access'])
                 }
-            
-            with open(self.sessions_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            print(f"加载了 {len(self.sessions)} 个持久化会话")
         except Exception as e:
-            print(f"保存会话文件失败: {e}")
+            print(f"加载会话文件失败: {e}")
+            self.sessions = {}
+    
+    def _save_session(self, session_id: str):
+        """记录单个会话的改动（由后台定时落盘）"""
+        session_data = self.sessions[session_id]
+        self._kv.set(session_id, {
+            'username': session_data['username'],
+            'created_at': session_data['created_at'].isoformat(),
+            'last_access': session_data['last_access'].isoformat()
+        })
+    
+    def _save_sessions(self):
+        """立即把未落盘的会话改动写入磁盘"""
+        self._kv.flush()
     
     def create_session(self, username: str) -> str:
         """创建会话"""
@@ -64,9 +59,7 @@ class SessionManager:
             "created_at": datetime.now(),
             "last_access": datetime.now()
         }
-        
-        # 保存到文件
-        self._save_sessions()
+        self._save_session(session_id)
         
         return session_id
     
@@ -80,17 +73,12 @@ class SessionManager:
         # 检查是否过期
         if datetime.now() - session["last_access"] > timedelta(hours=self.expire_hours):
             del self.sessions[session_id]
+            self._kv.delete(session_id)
             return None
         
-        # 更新最后访问时间
+        # 更新最后访问时间（同一会话在一个刷盘周期内的多次访问只写一行日志）
         session["last_access"] = datetime.now()
-        
-        # 定期保存（每10次访问保存一次，避免频繁IO）
-        if not hasattr(self, '_access_count'):
-            self._access_count = 0
-        self._access_count += 1
-        if self._access_count % 10 == 0:
-            self._save_sessions()
+        self._save_session(session_id)
         
         return session
     
@@ -98,8 +86,7 @@ class SessionManager:
         """删除会话"""
         if session_id in self.sessions:
             del self.sessions[session_id]
-            # 保存到文件
-            self._save_sessions()
+            self._kv.delete(session_id)
     
     def get_username(self, session_id: str) -> Optional[str]:
         """获取会话对应的用户名"""
@@ -117,10 +104,7 @@ class SessionManager:
         ]
         for sid in expired_sessions:
             del self.sessions[sid]
-        
-        # 如果有过期会话被删除，保存到文件
-        if expired_sessions:
-            self._save_sessions()
+            self._kv.delete(sid)
 
 
 # 全局会话管理器实例
@@ -0,0 +1,123 @@
+"""
+问卷内容缓存
+替代 run_all.py 中无上限、从不失效的 surveys_storage 字典
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+from app.utils.survey_registry import SurveyRegistry, survey_registry
+
+
+class SurveyCache:
+    """有界 LRU 问卷缓存
+
+    - 超过 max_entries 时淘汰最久未访问的问卷
+    - 每次命中都用文件的 (路径, mtime, 大小) 校验版本，文件被重新发布或被其他进程修改时自动重新加载
+    - 删除、重新发布时由调用方显式 invalidate（须在从注册表移除之前）
+    - 以文件路径为键，短ID别名和完整ID共用同一条目
+    - 缓存的问卷字典由多个请求共享，调用方只读不改
+    """
+
+    def __init__(self, registry: SurveyRegistry, max_entries: int = 256):
+        """
+        初始化缓存
+
+        Args:
+            registry: 问卷注册表（负责 survey_id -> 文件路径）
+            max_entries: 最多缓存的问卷数
+        """
+        self.registry = registry
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[tuple, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    @staticmethod
+    def _version(path) -> Optional[tuple]:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (str(path), stat.st_mtime_ns, stat.st_size)
+
+    def get(self, survey_id: str) -> Optional[Dict[str, Any]]:
+        """按ID获取问卷，未缓存或文件已变化时从磁盘加载"""
+        path = self.registry.get_path(survey_id)
+        version = self._version(path) if path is not None else None
+        if version is None and path is not None:
+            # 文件已不在：可能被其他进程重新发布到了新路径，读取其改动后再查一次
+            self._pop(str(path))
+            self.registry.refresh()
+            path = self.registry.get_path(survey_id)
+            version = self._version(path) if path is not None else None
+        if version is None:
+            # 问卷不存在或文件已被外部删除
+            if path is not None:
+                self._pop(str(path))
+                self.registry.remove(survey_id)
+            with self._lock:
+                self._counters["misses"] += 1
+            return None
+
+        key = str(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return entry[1]
+            self._counters["misses"] += 1
+
+        survey_data = self.registry.load_survey(survey_id)
+        if survey_data is not None:
+            self._store(key, version, survey_data)
+        return survey_data
+
+    def _store(self, key: str, version: tuple, survey_data: Dict[str, Any]):
+        with self._lock:
+            self._entries[key] = (version, survey_data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def put(self, survey_id: str, survey_data: Dict[str, Any]):
+        """发布问卷后直接放入缓存（须在写文件并登记注册表之后调用）"""
+        path = self.registry.get_path(survey_id)
+        version = self._version(path) if path is not None else None
+        if version is None:
+            return
+        self._store(str(path), version, survey_data)
+
+    def invalidate(self, survey_id: str):
+        """移除缓存条目（删除或重新发布问卷时调用）"""
+        path = self.registry.get_path(survey_id)
+        if path is not None:
+            self._pop(str(path))
+
+    def _pop(self, key: str):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._counters["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self) -> Dict[str, Any]:
+        """命中率等缓存指标"""
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                **self._counters,
+                "hit_rate": round(self._counters["hits"] / lookups, 4) if lookups else 0.0
+            }
+
+
+# 全局实例
+survey_cache = SurveyCache(survey_registry, max_entries=int(os.getenv("SURVEY_CACHE_SIZE", "256")))
@@ -0,0 +1,410 @@
+"""
+问卷回答的列式视图
+一次遍历全部回答，按题目构建类型化的列：
+- 单选题：选项整数编码（-1 表示未作答）
+- 多选题：每行一个选项位集（uint64 数组，第 k 位表示选了第 k 个选项）
+- 量表题：数值数组 + 作答掩码
+- 开放题：拼接文本 + 偏移量
+描述统计直接在列上用 NumPy 计算；全量分析的数据报告、图表和分析工具包共用同一份列式视图。
+新增回答时可用 extended() 只处理新回答并与已有的列拼接，得到新的视图（原视图不变）
+"""
+
+import copy
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+
+SINGLE_CHOICE = "单选题"
+MULTIPLE_CHOICE = "多选题"
+SCALE = "量表题"
+OPEN_ENDED = "开放式问题"
+
+
+def answer_value(answer: Any) -> Any:
+    """取答案值：标准格式为 {"type": ..., "value": ...}，也兼容直接存值"""
+    if isinstance(answer, dict):
+        return answer.get("value")
+    return answer
+
+
+class QuestionColumn:
+    """单个问题的列（基类）"""
+
+    def __init__(self, question: Dict[str, Any], position: int, size: int):
+        self.question = question
+        self.position = position
+        self.question_id = str(question.get("id", ""))
+        self.question_type = question.get("type", "")
+        self.title = question.get("text", "")
+        self.size = size
+        self._present_rows: List[int] = []
+        self.present: Optional[np.ndarray] = None
+
+    def add(self, row: int, answer: Any):
+        self._present_rows.append(row)
+
+    def finalize(self):
+        self.present = np.zeros(self.size, dtype=bool)
+        self.present[np.asarray(self._present_rows, dtype=np.int64)] = True
+        self._present_rows = []
+
+    @property
+    def response_count(self) -> int:
+        """作答人数"""
+        return int(self.present.sum())
+
+    def concat(self, other: "QuestionColumn") -> "QuestionColumn":
+        """拼接同一问题的后续回答（other 的行接在本列之后），返回新列"""
+        column = copy.copy(self)
+        column.size = self.size + other.size
+        column.present = np.concatenate([self.present, other.present])
+        return column
+
+
+class ChoiceColumn(QuestionColumn):
+    """单选题：每行一个选项编码"""
+
+    def __init__(self, question: Dict[str, Any], position: int, size: int):
+        super().__init__(question, position, size)
+        # 选项编码：先按问卷定义的顺序，未在定义中的答案值依次追加
+        self._option_index: "OrderedDict[str, int]" = OrderedDict(
+            (str(option), i) for i, option in enumerate(question.get("options", []) or [])
+        )
+        self._codes: List[int] = [-1] * size
+        self.codes: Optional[np.ndarray] = None
+
+    def _code(self, option: Any) -> int:
+        key = str(option)
+        code = self._option_index.get(key)
+        if code is None:
+            code = len(self._option_index)
+            self._option_index[key] = code
+        return code
+
+    def add(self, row: int, answer: Any):
+        super().add(row, answer)
+        self._codes[row] = self._code(answer_value(answer))
+
+    def finalize(self):
+        super().finalize()
+        self.codes = np.asarray(self._codes, dtype=np.int32)
+        self._codes = []
+
+    @property
+    def options(self) -> List[str]:
+        return list(self._option_index)
+
+    def option_counts(self) -> np.ndarray:
+        """各选项的选择人数"""
+        return np.bincount(self.codes[self.codes >= 0], minlength=len(self._option_index))
+
+    def _merge_options(self, column: "ChoiceColumn", other: "ChoiceColumn") -> np.ndarray:
+        """把 other 的选项并入 column 的编码表，返回 other 编码到新编码的映射"""
+        column._option_index = OrderedDict(self._option_index)
+        return np.asarray([column._code(option) for option in other.options], dtype=np.int32)
+
+    def concat(self, other: "ChoiceColumn") -> "ChoiceColumn":
+        column = super().concat(other)
+        mapping = self._merge_options(column, other)
+        codes = np.full(other.size, -1, dtype=np.int32)
+        answered = other.codes >= 0
+        codes[answered] = mapping[other.codes[answered]]
+        column.codes = np.concatenate([self.codes, codes])
+        return column
+
+
+class MultiChoiceColumn(ChoiceColumn):
+    """多选题：每行一个选项位集"""
+
+    def __init__(self, question: Dict[str, Any], position: int, size: int):
+        super().__init__(question, position, size)
+        self._codes = []
+        self._selections: List[tuple] = []
+        self.bits: Optional[np.ndarray] = None
+
+    def add(self, row: int, answer: Any):
+        QuestionColumn.add(self, row, answer)
+        choices = answer_value(answer)
+        if not isinstance(choices, list):
+            choices = [choices] if choices not in (None, "") else []
+        for choice in choices:
+            self._selections.append((row, self._code(choice)))
+
+    def finalize(self):
+        QuestionColumn.finalize(self)
+        words = max(1, (len(self._option_index) + 63) // 64)
+        self.bits = np.zeros((self.size, words), dtype=np.uint64)
+        if self._selections:
+            selections = np.asarray(self._selections, dtype=np.int64)
+            rows, codes = selections[:, 0], selections[:, 1]
+            np.bitwise_or.at(
+                self.bits,
+                (rows, codes // 64),
+                np.left_shift(np.uint64(1), (codes % 64).astype(np.uint64))
+            )
+        self._selections = []
+        self.codes = None
+
+    def selected(self, code: int) -> np.ndarray:
+        """每行是否选了第 code 个选项（布尔数组）"""
+        word = self.bits[:, code // 64]
+        return ((word >> np.uint64(code % 64)) & np.uint64(1)).astype(bool)
+
+    def selection_matrix(self) -> np.ndarray:
+        """行 × 选项 的布尔矩阵"""
+        if not self._option_index:
+            return np.zeros((self.size, 0), dtype=bool)
+        return np.stack([self.selected(code) for code in range(len(self._option_index))], axis=1)
+
+    def option_counts(self) -> np.ndarray:
+        """各选项被选择的次数"""
+        return np.array(
+            [int(self.selected(code).sum()) for code in range(len(self._option_index))],
+            dtype=np.int64
+        )
+
+    def concat(self, other: "MultiChoiceColumn") -> "MultiChoiceColumn":
+        column = QuestionColumn.concat(self, other)
+        mapping = self._merge_options(column, other)
+        words = max(1, (len(column._option_index) + 63) // 64)
+        column.bits = np.zeros((column.size, words), dtype=np.uint64)
+        column.bits[:self.size, :self.bits.shape[1]] = self.bits
+        for code, new_code in enumerate(mapping.tolist()):
+            rows = np.nonzero(other.selected(code))[0] + self.size
+            column.bits[rows, new_code // 64] |= np.left_shift(np.uint64(1), np.uint64(new_code % 64))
+        return column
+
+
+class ScaleColumn(QuestionColumn):
+    """量表题：数值数组（未作答或无法解析为数值的行为 NaN）"""
+
+    def __init__(self, question: Dict[str, Any], position: int, size: int):
+        super().__init__(question, position, size)
+        self._values: List[float] = [np.nan] * size
+        self.values: Optional[np.ndarray] = None
+
+    def add(self, row: int, answer: Any):
+        try:
+            value = float(answer_value(answer))
+        except (ValueError, TypeError):
+            return
+        super().add(row, answer)
+        self._values[row] = value
+
+    def finalize(self):
+        super().finalize()
+        self.values = np.asarray(self._values, dtype=np.float64)
+        self._values = []
+
+    def concat(self, other: "ScaleColumn") -> "ScaleColumn":
+        column = super().concat(other)
+        column.values = np.concatenate([self.values, other.values])
+        return column
+
+    @property
+    def valid_values(self) -> np.ndarray:
+        return self.values[self.present]
+
+    @property
+    def scale_min(self):
+        return self.question.get("scale_min", 1)
+
+    @property
+    def scale_max(self):
+        return self.question.get("scale_max", 5)
+
+
+class TextColumn(QuestionColumn):
+    """开放题（及其他题型）：所有文本拼接为一个字符串，按偏移量切分"""
+
+    def __init__(self, question: Dict[str, Any], position: int, size: int):
+        super().__init__(question, position, size)
+        self._parts: List[str] = []
+        self._rows: List[int] = []
+        self.rows: Optional[np.ndarray] = None
+        self.offsets: Optional[np.ndarray] = None
+        self.buffer = ""
+
+    def add(self, row: int, answer: Any):
+        value = answer_value(answer)
+        text = value if isinstance(value, str) else (str(value) if value else "")
+        text = text.strip()
+        if not text:
+            return
+        super().add(row, answer)
+        self._rows.append(row)
+        self._parts.append(text)
+
+    def finalize(self):
+        super().finalize()
+        self.rows = np.asarray(self._rows, dtype=np.int64)
+        lengths = np.fromiter((len(p) for p in self._parts), dtype=np.int64, count=len(self._parts))
+        self.offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        self.buffer = "".join(self._parts)
+        self._parts = []
+        self._rows = []
+
+    def concat(self, other: "TextColumn") -> "TextColumn":
+        column = super().concat(other)
+        column.rows = np.concatenate([self.rows, other.rows + self.size])
+        column.offsets = np.concatenate([self.offsets, other.offsets[1:] + self.offsets[-1]])
+        column.buffer = self.buffer + other.buffer
+        return column
+
+    def texts(self) -> List[str]:
+        """所有非空文本回答（按回答顺序）"""
+        buffer, offsets = self.buffer, self.offsets.tolist()
+        return [buffer[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+
+_COLUMN_TYPES = {
+    SINGLE_CHOICE: ChoiceColumn,
+    MULTIPLE_CHOICE: MultiChoiceColumn,
+    SCALE: ScaleColumn,
+    OPEN_ENDED: TextColumn,
+}
+
+
+class SurveyColumns:
+    """问卷回答的列式视图"""
+
+    def __init__(self, survey: Dict[str, Any], responses: List[Dict[str, Any]]):
+        """
+        一次遍历全部回答构建所有问题的列
+
+        Args:
+            survey: 问卷数据
+            responses: 回答数据列表
+        """
+        self.survey = survey
+        self.total_responses = len(responses)
+        self.columns: List[QuestionColumn] = []
+        self._by_id: Dict[str, QuestionColumn] = {}
+
+        for position, question in enumerate(survey.get("questions", [])):
+            column_type = _COLUMN_TYPES.get(question.get("type", ""), TextColumn)
+            column = column_type(question, position, self.total_responses)
+            self.columns.append(column)
+            self._by_id.setdefault(column.question_id, column)
+
+        by_id = self._by_id
+        for row, response in enumerate(responses):
+            for q_id, answer in (response.get("answers") or {}).items():
+                if answer is None:
+                    continue
+                column = by_id.get(str(q_id))
+                if column is not None:
+                    column.add(row, answer)
+
+        for column in self.columns:
+            column.finalize()
+
+    def extended(self, responses: List[Dict[str, Any]]) -> "SurveyColumns":
+        """
+        追加新回答，返回新的视图（只遍历新回答，已有的列直接拼接；原视图不变，可继续被其他请求读取）
+
+        Args:
+            responses: 本视图之后新增的回答
+        """
+        delta = SurveyColumns(self.survey, responses)
+        view = copy.copy(self)
+        view.total_responses = self.total_responses + delta.total_responses
+        view.columns = [column.concat(new) for column, new in zip(self.columns, delta.columns)]
+        view._by_id = {}
+        for column in view.columns:
+            view._by_id.setdefault(column.question_id, column)
+        return view
+
+    def get(self, question_id) -> Optional[QuestionColumn]:
+        return self._by_id.get(str(question_id))
+
+    def of_type(self, question_type: str) -> List[QuestionColumn]:
+        return [c for c in self.columns if c.question_type == question_type]
+
+    def answered(self) -> List[QuestionColumn]:
+        """至少有一个回答的问题"""
+        return [c for c in self.columns if c.response_count > 0]
+
+    def scale_matrix(self, impute: bool = True) -> Dict[str, Any]:
+        """
+        回答者 × 量表题 矩阵
+
+        Args:
+            impute: 是否用该题均值填充缺失值
+
+        Returns:
+            {"columns": 量表题列, "matrix": (R, K) float 数组, "missing": (R, K) 缺失掩码}
+        """
+        columns = [c for c in self.of_type(SCALE) if c.response_count > 0]
+        if not columns:
+            return {"columns": [], "matrix": np.zeros((self.total_responses, 0)), "missing": np.zeros((self.total_responses, 0), dtype=bool)}
+        matrix = np.column_stack([c.values for c in columns])
+        missing = np.isnan(matrix)
+        if impute:
+            means = np.nanmean(matrix, axis=0)
+            matrix = np.where(missing, means, matrix)
+        return {"columns": columns, "matrix": matrix, "missing": missing}
+
+
+# ==========================================
+# 描述统计
+# ==========================================
+
+def describe(column: QuestionColumn) -> Dict[str, Any]:
+    """按题型计算描述统计（与全量分析报告原有的统计摘要字段一致）"""
+    if column.response_count == 0:
+        return {}
+
+    if isinstance(column, ScaleColumn):
+        values = column.valid_values
+        avg_score = float(values.mean())
+        scores, score_counts = np.unique(values, return_counts=True)
+
+        # 判断整体倾向
+        mid_point = (column.scale_min + column.scale_max) / 2
+        if avg_score >= mid_point + 1:
+            tendency = "正面"
+        elif avg_score <= mid_point - 1:
+            tendency = "负面"
+        else:
+            tendency = "中性"
+
+        return {
+            "average_score": round(avg_score, 2),
+            "score_distribution": {float(s): int(c) for s, c in zip(scores, score_counts)},
+            "scale_range": f"{column.scale_min}-{column.scale_max}",
+            "tendency": tendency,
+            "insight": f"本题平均得分为{avg_score:.2f}（{column.scale_min}-{column.scale_max}分），显示出{tendency}的评价倾向。"
+        }
+
+    if isinstance(column, MultiChoiceColumn):
+        counts = column.option_counts()
+        options = column.options
+        selection_frequency = {options[i]: int(counts[i]) for i in range(len(options)) if counts[i] > 0}
+        if not selection_frequency:
+            return {}
+        order = np.argsort(-counts, kind="stable")[:3]
+        top_3 = [(options[i], int(counts[i])) for i in order if counts[i] > 0]
+        return {
+            "selection_frequency": selection_frequency,
+            "most_selected": [{"option": opt, "count": cnt} for opt, cnt in top_3],
+            "insight": f"最常被选择的选项是「{top_3[0][0]}」（{top_3[0][1]}次）。"
+        }
+
+    if isinstance(column, ChoiceColumn):
+        counts = column.option_counts()
+        options = column.options
+        total = int(counts.sum())
+        option_distribution = {options[i]: int(counts[i]) for i in range(len(options)) if counts[i] > 0}
+        top = int(np.argmax(counts))
+        top_percentage = (counts[top] / total * 100) if total > 0 else 0
+        return {
+            "option_distribution": option_distribution,
+            "top_choice": options[top],
+            "top_percentage": round(float(top_percentage), 1),
+            "insight": f"大多数受访者（{top_percentage:.1f}%）选择了「{options[top]}」。"
+        }
+
+    return {}
@@ -0,0 +1,313 @@
+"""
+问卷注册表
+维护持久化的 survey_id -> 文件路径/标题/修改时间 索引，替代逐个 glob 和解析问卷文件
+"""
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows：没有文件锁，只支持单进程部署
+    fcntl = None
+
+
+class SurveyRegistry:
+    """问卷注册表
+
+    索引常驻内存，所有按ID查找都是一次字典命中；持久化为快照 + 追加日志（格式同 kv_store）：
+    - 快照 survey_index.json（{survey_id: 条目}），只在启动对账和日志压缩时原子替换
+    - 日志 survey_index.json.journal，发布/删除只追加一行并 fsync，耗时与问卷总数无关；
+      末尾不完整的半行（写入时崩溃）在重放时忽略
+    多 worker 部署时各进程共用这两个文件：写入在 survey_index.json.lock 文件锁下先重放其他进程
+    追加的日志再追加，不会覆盖其他进程的条目；按ID查找未命中时重放新增的日志，
+    其他 worker 刚发布的问卷也能立即找到（没有 fcntl 的平台只支持单进程部署）。
+    启动时与 data/surveys 目录对账，只解析新增或修改过的问卷文件。
+    """
+
+    # 日志条数超过该值且超过问卷数时压缩为新快照
+    COMPACT_MIN_RECORDS = 1000
+
+    def __init__(self, surveys_dir: str = "data/surveys", index_path: str = "data/survey_index.json"):
+        self.surveys_dir = Path(surveys_dir)
+        self.surveys_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = Path(index_path)
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        self.journal_path = self.index_path.with_name(self.index_path.name + ".journal")
+        self.lock_path = self.index_path.with_name(self.index_path.name + ".lock")
+        self._lock = threading.RLock()
+        self._index: Dict[str, Dict[str, Any]] = {}
+        # 文件名中的短ID -> 问卷内的完整ID（兼容早期以UUID前缀命名的文件）
+        self._aliases: Dict[str, str] = {}
+        # 已加载的快照 (inode, mtime_ns, size) 和已重放到的日志位置
+        self._snapshot_stamp: Optional[tuple] = None
+        self._journal_offset = 0
+        self._journal_records = 0
+        with self._lock, self._file_lock():
+            self._load_index()
+        self.rebuild()
+
+    # ==========================================
+    # 快照、日志与跨进程同步
+    # ==========================================
+
+    @contextmanager
+    def _file_lock(self, shared: bool = False):
+        """跨进程文件锁（写入用独占锁，重放用共享锁）"""
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    @staticmethod
+    def _stamp(path: Path) -> Optional[tuple]:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _load_index(self):
+        """读快照并从头重放日志（调用方持有锁）"""
+        self._index = {}
+        self._snapshot_stamp = self._stamp(self.index_path)
+        if self._snapshot_stamp is not None:
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    self._index = json.load(f)
+            except Exception as e:
+                print(f"加载问卷索引失败，将从磁盘重建: {e}")
+                self._index = {}
+        self._journal_offset = 0
+        self._journal_records = 0
+        self._replay_journal()
+        self._rebuild_aliases()
+
+    def _replay_journal(self) -> bool:
+        """重放日志中尚未读取的记录（调用方持有锁），返回是否有新记录"""
+        try:
+            with open(self.journal_path, 'rb') as f:
+                f.seek(self._journal_offset)
+                data = f.read()
+        except FileNotFoundError:
+            return False
+        replayed = False
+        for line in data.splitlines(keepends=True):
+            if not line.endswith(b"\n"):
+                break
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            self._apply(record)
+            self._journal_offset += len(line)
+            self._journal_records += 1
+            replayed = True
+        return replayed
+
+    def _apply(self, record: Dict[str, Any]):
+        """应用一条日志记录"""
+        survey_id = record["k"]
+        old = self._index.pop(survey_id, None)
+        if old is not None:
+            self._aliases.pop(self._filename_id(old["path"]), None)
+        if not record.get("deleted"):
+            self._index[survey_id] = record["v"]
+            short_id = self._filename_id(record["v"]["path"])
+            if short_id != survey_id:
+                self._aliases[short_id] = survey_id
+
+    def _sync(self):
+        """与磁盘同步（调用方持有锁）：快照被替换或日志被截断时全量重新加载，否则只重放新增日志"""
+        journal_size = os.path.getsize(self.journal_path) if self.journal_path.exists() else 0
+        if self._stamp(self.index_path) != self._snapshot_stamp or journal_size < self._journal_offset:
+            self._load_index()
+        elif journal_size > self._journal_offset:
+            self._replay_journal()
+
+    def refresh(self):
+        """读取其他进程的改动"""
+        with self._lock, self._file_lock(shared=True):
+            self._sync()
+
+    def _append(self, records: List[Dict[str, Any]]):
+        """追加日志记录并落盘，必要时压缩为新快照（调用方持有锁且已 _sync）"""
+        content = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode("utf-8")
+        try:
+            with open(self.journal_path, 'ab') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+        except Exception as e:
+            print(f"写入问卷索引日志失败: {e}")
+            return
+        self._journal_offset += len(content)
+        self._journal_records += len(records)
+        if self._journal_records >= max(self.COMPACT_MIN_RECORDS, len(self._index)):
+            self._save_index()
+
+    def _save_index(self):
+        """写新快照并清空日志（调用方持有锁）"""
+        tmp_path = self.index_path.with_suffix(self.index_path.suffix + ".tmp")
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._index, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.index_path)
+            # 快照已包含日志中的全部改动，可以清空日志
+            with open(self.journal_path, 'wb') as f:
+                f.flush()
+                os.fsync(f.fileno())
+            self._snapshot_stamp = self._stamp(self.index_path)
+            self._journal_offset = 0
+            self._journal_records = 0
+        except Exception as e:
+            print(f"保存问卷索引失败: {e}")
+
+    @staticmethod
+    def _filename_id(path: str) -> str:
+        """从 {标题}_{id}.json 或 {id}.json 中取出ID部分"""
+        return Path(path).stem.rsplit("_", 1)[-1]
+
+    def _rebuild_aliases(self):
+        """根据索引路径重建短ID别名表"""
+        self._aliases = {}
+        for survey_id, entry in self._index.items():
+            short_id = self._filename_id(entry["path"])
+            if short_id != survey_id:
+                self._aliases[short_id] = survey_id
+
+    def _resolve(self, survey_id: str) -> Optional[str]:
+        """将请求中的ID解析为索引中的ID"""
+        if survey_id in self._index:
+            return survey_id
+        return self._aliases.get(survey_id)
+
+    def rebuild(self) -> int:
+        """
+        与磁盘对账，重建索引
+
+        未变化的文件（路径和 mtime 一致）直接复用索引条目，不再打开；
+        新增或修改过的文件才读取其中的 id 和 title。
+
+        Returns:
+            索引中的问卷数量
+        """
+        with self._lock, self._file_lock():
+            self._sync()
+            by_path = {entry["path"]: (sid, entry) for sid, entry in self._index.items()}
+            rebuilt: Dict[str, Dict[str, Any]] = {}
+
+            with os.scandir(self.surveys_dir) as it:
+                for dir_entry in it:
+                    if not dir_entry.is_file() or not dir_entry.name.endswith(".json"):
+                        continue
+                    path = str(self.surveys_dir / dir_entry.name)
+                    mtime = dir_entry.stat().st_mtime
+
+                    known = by_path.get(path)
+                    if known and known[1].get("mtime") == mtime:
+                        rebuilt[known[0]] = known[1]
+                        continue
+
+                    try:
+                        with open(path, 'r', encoding='utf-8') as f:
+                            data = json.load(f)
+                    except Exception:
+                        continue
+                    survey_id = data.get("id")
+                    if not survey_id:
+                        continue
+                    rebuilt[survey_id] = {
+                        "path": path,
+                        "title": data.get("title", ""),
+                        "mtime": mtime
+                    }
+
+            changed = rebuilt != self._index
+            self._index = rebuilt
+            self._rebuild_aliases()
+            if changed or not self.index_path.exists() or self._journal_records:
+                self._save_index()
+            return len(self._index)
+
+    def register(self, survey_id: str, file_path, title: str = ""):
+        """登记（或更新）一份问卷（追加一行日志）"""
+        path = Path(file_path)
+        entry = {
+            "path": str(path),
+            "title": title,
+            "mtime": path.stat().st_mtime if path.exists() else None
+        }
+        with self._lock, self._file_lock():
+            self._sync()
+            record = {"k": survey_id, "v": entry}
+            self._apply(record)
+            self._append([record])
+
+    def remove(self, survey_id: str) -> Optional[Dict[str, Any]]:
+        """从索引中移除问卷，返回被移除的条目"""
+        with self._lock, self._file_lock():
+            self._sync()
+            resolved = self._resolve(survey_id)
+            entry = self._index.get(resolved) if resolved else None
+            if entry is not None:
+                record = {"k": resolved, "deleted": True}
+                self._apply(record)
+                self._append([record])
+            return entry
+
+    def get(self, survey_id: str) -> Optional[Dict[str, Any]]:
+        """获取问卷索引条目 {path, title, mtime}；未命中时先读取其他进程追加的日志再查一次"""
+        resolved = self._resolve(survey_id)
+        if resolved is None:
+            self.refresh()
+            resolved = self._resolve(survey_id)
+        return self._index.get(resolved) if resolved else None
+
+    def get_path(self, survey_id: str) -> Optional[Path]:
+        """获取问卷文件路径，不存在时返回 None"""
+        entry = self.get(survey_id)
+        return Path(entry["path"]) if entry else None
+
+    def load_survey(self, survey_id: str) -> Optional[Dict[str, Any]]:
+        """
+        按ID读取问卷内容
+
+        索引条目指向的文件被外部删除时，先读取其他进程的改动（可能已重新发布到新路径），
+        仍找不到文件时清理该条目。
+        """
+        path = self.get_path(survey_id)
+        if path is None:
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            pass
+        self.refresh()
+        new_path = self.get_path(survey_id)
+        if new_path is not None and new_path != path:
+            return self.load_survey(survey_id)
+        self.remove(survey_id)
+        return None
+
+    def __contains__(self, survey_id: str) -> bool:
+        return self.get(survey_id) is not None
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+
+# 全局实例
+survey_registry = SurveyRegistry()
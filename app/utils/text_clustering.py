@@ -0,0 +1,126 @@
+"""
+开放题回答的本地文本聚类
+TF-IDF（jieba分词）向量化后聚类，只把每个簇的代表性回答（medoid）和簇大小交给大模型，
+大量近义回答不再逐条占用提示词；主题提取后再把全部回答一次性归入最相近的主题，得到实际的主题回答数
+"""
+
+import logging
+from typing import List, Optional, Tuple
+
+try:
+    import numpy as np
+    from sklearn.cluster import MiniBatchKMeans
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    import jieba
+    HAS_ML_LIBS = True
+except ImportError:
+    HAS_ML_LIBS = False
+
+logger = logging.getLogger(__name__)
+
+STOP_WORDS = {'的', '了', '在', '是', '我', '有', '和', '就', '不', '人', '都', '一', '一个'}
+
+
+def tokenize(text: str) -> List[str]:
+    """jieba分词，去掉单字和停用词"""
+    return [w for w in jieba.lcut(text) if len(w.strip()) > 1 and w not in STOP_WORDS]
+
+
+def build_vectorizer(max_features: int = 5000) -> "TfidfVectorizer":
+    """TF-IDF向量化器（行向量已L2归一化，点积即余弦相似度）"""
+    return TfidfVectorizer(
+        tokenizer=tokenize,
+        token_pattern=None,
+        lowercase=False,
+        max_features=max_features,
+        sublinear_tf=True
+    )
+
+
+def select_representatives(
+    texts: List[str],
+    weights: Optional[List[int]] = None,
+    max_representatives: int = 200,
+    random_state: int = 42
+) -> List[Tuple[str, int]]:
+    """
+    聚类选取代表性回答
+
+    回答数不超过 max_representatives 时原样返回；否则聚成 max_representatives 个簇，
+    每个簇取与簇中心余弦相似度最高的回答（medoid）作为代表。
+
+    Args:
+        texts: 回答文本
+        weights: 每条回答代表的原始回答数（去重后的重复次数），默认均为1
+        max_representatives: 最多返回的代表数
+        random_state: 聚类随机种子（保证同一批回答结果稳定）
+
+    Returns:
+        [(代表回答, 簇大小)]，按簇大小降序；簇大小为簇内回答的权重之和
+    """
+    weights = list(weights) if weights is not None else [1] * len(texts)
+    if len(texts) <= max_representatives:
+        return list(zip(texts, weights))
+    if not HAS_ML_LIBS:
+        logger.warning("sklearn/jieba 未安装，跳过回答聚类")
+        return list(zip(texts, weights))
+
+    try:
+        matrix = build_vectorizer().fit_transform(texts)
+    except ValueError as e:
+        # 全部回答分词后为空（如只有停用词）
+        logger.warning(f"回答向量化失败，跳过聚类: {e}")
+        return list(zip(texts, weights))
+
+    sample_weight = np.asarray(weights, dtype=float)
+    kmeans = MiniBatchKMeans(
+        n_clusters=max_representatives,
+        random_state=random_state,
+        batch_size=2048,
+        n_init=3
+    )
+    labels = kmeans.fit_predict(matrix, sample_weight=sample_weight)
+    sizes = np.bincount(labels, weights=sample_weight, minlength=max_representatives)
+
+    representatives = []
+    for cluster in range(max_representatives):
+        members = np.flatnonzero(labels == cluster)
+        if members.size == 0:
+            continue
+        similarity = matrix[members] @ kmeans.cluster_centers_[cluster]
+        medoid = members[int(np.argmax(similarity))]
+        representatives.append((texts[medoid], int(round(sizes[cluster]))))
+
+    representatives.sort(key=lambda item: item[1], reverse=True)
+    logger.info(f"回答聚类完成: {len(texts)} 条 -> {len(representatives)} 个代表")
+    return representatives
+
+
+def assign_to_themes(texts: List[str], theme_texts: List[str]) -> Optional[List[int]]:
+    """
+    把每条回答归入最相近的主题
+
+    回答和主题描述在同一个TF-IDF空间中向量化，一次稀疏矩阵乘法得到 回答×主题 的余弦相似度，
+    每条回答取相似度最高的主题；与所有主题都没有共同词的回答记为 -1（未归类）。
+
+    Args:
+        texts: 回答文本
+        theme_texts: 每个主题的描述文本（主题名 + 描述 + 引述）
+
+    Returns:
+        每条回答的主题序号列表；依赖库不可用或无法向量化时返回 None
+    """
+    if not HAS_ML_LIBS or not texts or not theme_texts:
+        return None
+
+    try:
+        matrix = build_vectorizer().fit_transform(list(texts) + list(theme_texts))
+    except ValueError as e:
+        logger.warning(f"主题归类向量化失败: {e}")
+        return None
+
+    answers, themes = matrix[:len(texts)], matrix[len(texts):]
+    similarity = (answers @ themes.T).toarray()
+    labels = similarity.argmax(axis=1)
+    labels[similarity.max(axis=1) <= 0] = -1
+    return labels.tolist()
@@ -0,0 +1,171 @@
+"""
+开放题回答去重
+哈希集合精确去重 + 字符 n-gram 上的 MinHash/LSH 近似重复检测（适合不分词的中文文本），
+重复的回答合并为一条并保留重复次数，供后续分析加权
+"""
+
+import logging
+import re
+import zlib
+from typing import Dict, List, Tuple
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+logger = logging.getLogger(__name__)
+
+# MinHash 通用哈希使用的梅森素数
+_MERSENNE_PRIME = (1 << 31) - 1
+# LSH 桶内最多比较的候选数
+_MAX_BUCKET_COMPARISONS = 64
+
+_NORMALIZE_PATTERN = re.compile(r"[\s\W_]+", re.UNICODE)
+
+
+def normalize(text: str) -> str:
+    """精确去重用的归一化：去掉空白和标点，英文转小写"""
+    return _NORMALIZE_PATTERN.sub("", text).lower()
+
+
+def char_ngrams(text: str, n: int = 3) -> set:
+    """字符 n-gram 集合（短于 n 的文本整体作为一个 n-gram）"""
+    if len(text) <= n:
+        return {text}
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def _choose_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """选择 LSH 分带数和每带行数，使 S 曲线拐点 (1/b)^(1/r) 最接近相似度阈值"""
+    best = (num_perm, 1)
+    best_error = float("inf")
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        error = abs((1.0 / bands) ** (1.0 / rows) - threshold)
+        if error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+
+class _UnionFind:
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, x: int) -> int:
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, a: int, b: int):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            # 保留先出现的回答作为代表
+            if ra < rb:
+                self.parent[rb] = ra
+            else:
+                self.parent[ra] = rb
+
+
+def deduplicate(
+    texts: List[str],
+    threshold: float = 0.8,
+    ngram: int = 3,
+    num_perm: int = 64,
+    seed: int = 1
+) -> Tuple[List[str], List[int], Dict[str, int]]:
+    """
+    去重并统计重复次数
+
+    1. 归一化后用哈希集合精确去重，O(n)
+    2. 对剩余回答计算字符 n-gram 的 MinHash 签名，按 LSH 分带找候选对，
+       再用真实 Jaccard 相似度确认（>= threshold）后合并
+
+    Args:
+        texts: 回答文本（已去除首尾空白）
+        threshold: 近似重复的 Jaccard 相似度阈值；>= 1 时只做精确去重
+        ngram: 字符 n-gram 长度
+        num_perm: MinHash 置换数
+        seed: 哈希参数随机种子（保证结果稳定）
+
+    Returns:
+        (去重后的回答, 每条回答代表的原始回答数, {"input", "exact_duplicates", "near_duplicates", "output"})
+    """
+    # 1. 精确去重
+    unique_texts: List[str] = []
+    counts: List[int] = []
+    index_by_key: Dict[str, int] = {}
+    for text in texts:
+        key = normalize(text) or text
+        index = index_by_key.get(key)
+        if index is None:
+            index_by_key[key] = len(unique_texts)
+            unique_texts.append(text)
+            counts.append(1)
+        else:
+            counts[index] += 1
+
+    stats = {
+        "input": len(texts),
+        "exact_duplicates": len(texts) - len(unique_texts),
+        "near_duplicates": 0,
+        "output": len(unique_texts)
+    }
+    if threshold >= 1 or len(unique_texts) < 2:
+        return unique_texts, counts, stats
+    if not HAS_NUMPY:
+        logger.warning("numpy 未安装，跳过近似重复检测")
+        return unique_texts, counts, stats
+
+    # 2. MinHash 签名
+    shingles = [char_ngrams(normalize(text) or text, ngram) for text in unique_texts]
+    rng = np.random.RandomState(seed)
+    a = rng.randint(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+    b = rng.randint(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+    signatures = np.empty((len(unique_texts), num_perm), dtype=np.uint64)
+    for i, grams in enumerate(shingles):
+        hashes = np.fromiter(
+            (zlib.crc32(g.encode("utf-8")) & 0x7FFFFFFF for g in grams),
+            dtype=np.uint64,
+            count=len(grams)
+        )
+        signatures[i] = ((np.outer(hashes, a) + b) % _MERSENNE_PRIME).min(axis=0)
+
+    # 3. LSH 分带找候选对，Jaccard 确认后合并
+    bands, rows = _choose_bands(num_perm, threshold)
+    union_find = _UnionFind(len(unique_texts))
+    for band in range(bands):
+        buckets: Dict[bytes, List[int]] = {}
+        band_slice = signatures[:, band * rows:(band + 1) * rows]
+        for i in range(len(unique_texts)):
+            # 桶里只保留互不相似的回答；每次最多比较 _MAX_BUCKET_COMPARISONS 个，避免退化为 O(n²)
+            bucket = buckets.setdefault(band_slice[i].tobytes(), [])
+            for other in bucket[:_MAX_BUCKET_COMPARISONS]:
+                if union_find.find(other) == union_find.find(i):
+                    break
+                intersection = len(shingles[other] & shingles[i])
+                union = len(shingles[other]) + len(shingles[i]) - intersection
+                if union and intersection / union >= threshold:
+                    union_find.union(other, i)
+                    break
+            else:
+                bucket.append(i)
+
+    merged_texts: List[str] = []
+    merged_counts: List[int] = []
+    position: Dict[int, int] = {}
+    for i, text in enumerate(unique_texts):
+        root = union_find.find(i)
+        if root not in position:
+            position[root] = len(merged_texts)
+            merged_texts.append(unique_texts[root])
+            merged_counts.append(0)
+        merged_counts[position[root]] += counts[i]
+
+    stats["near_duplicates"] = len(unique_texts) - len(merged_texts)
+    stats["output"] = len(merged_texts)
+    return merged_texts, merged_counts, stats
@@ -8,8 +8,9 @@ import sys
 from pathlib import Path
 import json
 import webbrowser
-from threading import Timer
+from threading import Timer, Lock
 from datetime import datetime
+import asyncio
 import uvicorn
 import schedule
 import time
@@ -20,7 +21,6 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi import Request as FastAPIRequest
 from pydantic import BaseModel
 from dotenv import load_dotenv
-import shutil
 
 # 添加项目根目录到路径
 project_root = Path(__file__).parent
@@ -31,15 +31,32 @@ load_dotenv()
 
 # 导入服务
 from app.services.survey_service import SurveyService
-from app.utils.response_saver import ResponseSaver
+from app.utils.response_saver import get_response_store
+from app.utils.response_ingestion import ResponseIngestionQueue, IngestionQueueFull
 from app.models.user import user_store
 from app.utils.session_manager import session_manager
 from app.utils.user_survey_manager import user_survey_manager
+from app.utils.survey_registry import survey_registry
+from app.utils.survey_cache import survey_cache
+from app.utils.llm_cache import llm_response_cache
+from app.core.llm_gateway import LLMError, llm_gateway
+from app.utils import async_storage
+from app.utils.async_storage import run_io, run_compute, loop_lag_monitor
+from app.utils.kv_store import flush_all as flush_all_stores
+from app.services.analysis_jobs import analysis_jobs, AnalysisQueueFull, ANALYSIS_TYPES
+from app.services.analysis_cache import analysis_cache, survey_fingerprint
+from app.services.statistics_service import crosstab_survey, scale_correlations, survey_columns_cache
 
 # 全局变量
 generated_survey = None
-response_saver = ResponseSaver()
-surveys_storage = {}  # 存储问卷 {survey_id: survey_data}
+response_saver = get_response_store()  # 答案存储后端（files/log/sqlite）
+# 答案提交队列（组提交：每个时间窗口合并写入一次）
+ingestion_queue = ResponseIngestionQueue(
+    response_saver,
+    max_queue=int(os.getenv("INGEST_QUEUE_SIZE", "10000")),
+    batch_window_ms=int(os.getenv("INGEST_BATCH_MS", "20")),
+    max_batch=int(os.getenv("INGEST_MAX_BATCH", "500"))
+)
 
 # ==========================================
 # 环境配置
@@ -86,19 +103,37 @@ if static_dir.exists():
     app.mount("/static", StaticFiles(directory=str(static_dir)), name="static")
 
 
+@app.on_event("startup")
+async def start_ingestion_queue():
+    """启动答案存储的后台任务、提交队列的后台写入任务和事件循环延迟监控"""
+    response_saver.start()
+    await ingestion_queue.start()
+    loop_lag_monitor.start()
+
+
+@app.on_event("shutdown")
+async def flush_storage_on_shutdown():
+    """关闭服务时先写完排队中的答案，再把内存中的存储状态写回磁盘"""
+    await loop_lag_monitor.stop()
+    analysis_jobs.shutdown()
+    await ingestion_queue.stop()
+    response_saver.close()
+    llm_response_cache.close()
+    flush_all_stores()
+    async_storage.shutdown_executor()
+
+
 @app.get("/login.html", response_class=HTMLResponse)
 @app.get("/login", response_class=HTMLResponse)
 async def login_page():
     """返回登录页面"""
-    with open("static/login.html", "r", encoding="utf-8") as f:
-        return HTMLResponse(content=f.read())
+    return HTMLResponse(content=await async_storage.read_text_cached("static/login.html"))
 
 
 @app.get("/workspace", response_class=HTMLResponse)
 async def workspace():
     """返回工作空间页面"""
-    with open("static/workspace.html", "r", encoding="utf-8") as f:
-        return HTMLResponse(content=f.read())
+    return HTMLResponse(content=await async_storage.read_text_cached("static/workspace.html"))
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -192,6 +227,12 @@ async def index():
                         </div>
                     </div>
                     
+                    <!-- 流式生成的问题（逐题显示） -->
+                    <div id="streamingPreview" class="questions-preview" style="display: none;">
+                        <h4 id="streamingTitle">📝 已生成的问题</h4>
+                        <div id="streamingQuestions"></div>
+                    </div>
+                    
                     <!-- 时间估算 -->
                     <p id="timeEstimate" class="time-estimate">
                         预计 15-20 秒
@@ -258,6 +299,16 @@ async def get_survey():
     return JSONResponse(content=generated_survey)
 
 
+def semantic_cache_scope(session_id: str):
+    """
+    语义缓存作用域：SEMANTIC_CACHE_SCOPE=user（默认）时按登录用户隔离，未登录不使用语义缓存；
+    global 时所有请求共用一个作用域
+    """
+    if os.getenv("SEMANTIC_CACHE_SCOPE", "user").lower() == "global":
+        return ""
+    return session_manager.get_username(session_id) if session_id else None
+
+
 @app.post("/api/generate")
 async def generate_survey_api(request: dict):
     """生成问卷 API（支持流式输出）"""
@@ -269,111 +320,88 @@ async def generate_survey_api(request: dict):
     prompt = request.get("prompt", "")
     if not prompt:
         raise HTTPException(status_code=400, detail="Prompt is required")
+    session_id = request.get("session_id")
     
     from fastapi.responses import StreamingResponse
-    import asyncio
+    
+    def sse(payload: dict) -> str:
+        return f'data: {json.dumps(payload, ensure_ascii=False)}\n\n'
     
     async def generate_stream():
         try:
             # 第一步：分析需求
             yield 'data: {"type": "step", "message": "正在分析您的需求..."}\n\n'
-            yield 'data: {"type": "thinking", "message": "🤔 理解用户需求，确定问卷主题和目标受众..."}\n\n'
-            await asyncio.sleep(0.3)
             
-            # 进行需求扩写
-            try:
-                yield 'data: {"type": "thinking", "message": "💡 正在优化和扩展您的需求描述..."}\n\n'
-                enhanced_prompt = service.enhance_requirement(prompt)
-                # 如果扩写返回空或异常，使用原始prompt
-                if not enhanced_prompt or len(enhanced_prompt.strip()) < 5:
-                    enhanced_prompt = prompt
-                    yield 'data: {"type": "thinking", "message": "⚠️ 需求扩写遇到问题，使用原始输入继续..."}\n\n'
-                else:
-                    yield 'data: {"type": "thinking", "message": "✅ 需求扩写完成，已优化描述内容..."}\n\n'
-            except Exception as enhance_error:
-                print(f"需求扩写失败，使用原始输入: {enhance_error}")
+            # 语义缓存：相近的需求（按原始输入匹配）直接复用已生成的问卷，跳过扩写和生成
+            scope = semantic_cache_scope(session_id)
+            hit = await service.afind_similar_survey(prompt, scope)
+            if hit is not None:
                 enhanced_prompt = prompt
-                yield 'data: {"type": "thinking", "message": "⚠️ 需求扩写失败，使用原始输入继续..."}\n\n'
+                yield sse({
+                    "type": "thinking",
+                    "message": f"♻️ 找到相似的历史需求（相似度 {hit['similarity']:.0%}），直接复用已生成的问卷..."
+                })
+            else:
+                # 进行需求扩写
+                try:
+                    yield 'data: {"type": "thinking", "message": "💡 正在优化和扩展您的需求描述..."}\n\n'
+                    # 异步调用LLM，等待期间事件循环可以继续处理其他请求
+                    enhanced_prompt = await service.aenhance_requirement(prompt)
+                    # 如果扩写返回空或异常，使用原始prompt
+                    if not enhanced_prompt or len(enhanced_prompt.strip()) < 5:
+                        enhanced_prompt = prompt
+                        yield 'data: {"type": "thinking", "message": "⚠️ 需求扩写遇到问题，使用原始输入继续..."}\n\n'
+                    else:
+                        yield 'data: {"type": "thinking", "message": "✅ 需求扩写完成，已优化描述内容..."}\n\n'
+                except Exception as enhance_error:
+                    print(f"需求扩写失败，使用原始输入: {enhance_error}")
+                    enhanced_prompt = prompt
+                    yield 'data: {"type": "thinking", "message": "⚠️ 需求扩写失败，使用原始输入继续..."}\n\n'
             
             # 第二步：优化需求描述
             yield f'data: {{"type": "step", "message": "需求优化完成"}}\n\n'
-            await asyncio.sleep(0.5)
             
-            # 第三步：检索相关案例
+            # 第三步：检索相关案例并流式生成问卷
             yield 'data: {"type": "step", "message": "正在检索相关案例..."}\n\n'
-            yield 'data: {"type": "thinking", "message": "🔍 从知识库中搜索相似的问卷案例..."}\n\n'
-            await asyncio.sleep(0.5)
-            yield 'data: {"type": "thinking", "message": "📚 分析案例结构，提取最佳实践..."}\n\n'
-            await asyncio.sleep(0.3)
-            
-            # 第四步：生成问卷
-            yield 'data: {"type": "step", "message": "正在生成问卷内容..."}\n\n'
-            yield 'data: {"type": "thinking", "message": "🧠 AI开始构思问卷结构和问题设计..."}\n\n'
-            await asyncio.sleep(0.3)
             
             print(f"\n[INFO] Starting survey generation, prompt: {enhanced_prompt[:100]}...")
             
-            # 生成问卷（这是耗时操作，可能需要较长时间）
-            # 添加重试机制
-            max_retries = 3
-            retry_count = 0
+            # 流式生成问卷：每个问题解析完成即推送给前端
+            # 限流、超时和网络错误由 LLM 网关在尚未产出内容时按指数退避重试，这里不再重试
             generated_survey = None
+            question_count = 0
+            first_token = True
             
-            while retry_count < max_retries:
-                try:
-                    print(f"[INFO] Attempting survey generation (attempt {retry_count + 1}/{max_retries})")
-                    
-                    if retry_count == 0:
-                        yield 'data: {"type": "thinking", "message": "🎯 确定问卷目标：明确调研目的和预期结果..."}\n\n'
-                        await asyncio.sleep(0.5)
-                        yield 'data: {"type": "progress", "progress": 75, "message": "正在设计问题结构..."}\n\n'
-                        
-                        yield 'data: {"type": "thinking", "message": "📝 设计问题类型：选择题、量表题、开放题的最佳组合..."}\n\n'
-                        await asyncio.sleep(0.5)
-                        yield 'data: {"type": "progress", "progress": 80, "message": "正在生成问题内容..."}\n\n'
-                        
-                        yield 'data: {"type": "thinking", "message": "🔗 构建逻辑关系：确保问题间的连贯性和递进性..."}\n\n'
-                        await asyncio.sleep(0.5)
-                        yield 'data: {"type": "progress", "progress": 85, "message": "正在优化问题表述..."}\n\n'
-                        
-                        yield 'data: {"type": "thinking", "message": "✨ 优化问题表述：确保语言清晰、易懂、无歧义..."}\n\n'
-                        await asyncio.sleep(0.5)
-                        yield 'data: {"type": "progress", "progress": 90, "message": "正在完善问卷结构..."}\n\n'
-                        
-                        yield 'data: {"type": "thinking", "message": "🎨 完善问卷结构：添加标题、说明和感谢语..."}\n\n'
-                        await asyncio.sleep(0.5)
-                        yield 'data: {"type": "progress", "progress": 95, "message": "正在生成最终问卷..."}\n\n'
-                    
-                    generated_survey = service.create_survey(enhanced_prompt)
-                    print(f"[INFO] Survey generation successful: {generated_survey is not None}")
-                    
-                    if generated_survey:
-                        yield 'data: {"type": "thinking", "message": "🎉 问卷生成完成！正在验证和优化..."}\n\n'
-                        await asyncio.sleep(0.3)
-                        yield 'data: {"type": "progress", "progress": 98, "message": "正在验证问卷内容..."}\n\n'
-                    
-                    break  # 成功则跳出循环
-                except Exception as retry_error:
-                    retry_count += 1
-                    error_msg = str(retry_error)
-                    print(f"[ERROR] Survey generation failed (attempt {retry_count}): {error_msg}")
-                    if "Connection" in error_msg or "10054" in error_msg:
-                        print(f"\n[WARN] Network error, retrying {retry_count}/{max_retries}...")
-                        yield f'data: {{"type": "step", "message": "网络连接失败，正在重试 ({retry_count}/{max_retries})..."}}\n\n'
-                        await asyncio.sleep(2)  # 等待2秒后重试
-                    else:
-                        # 其他错误不需要重试，直接抛出
-                        raise
+            if hit is not None:
+                events = service.areplay_survey(hit["survey"])
+            else:
+                # 上面已查询过语义缓存，这里只按原始需求保存生成结果（与查询使用同一文本）
+                events = service.astream_survey(enhanced_prompt, scope=scope, semantic_prompt=prompt, lookup=False)
+            async for kind, payload in events:
+                if first_token:
+                    first_token = False
+                    yield 'data: {"type": "step", "message": "正在生成问卷内容..."}\n\n'
+                if kind == "field":
+                    key, value = payload
+                    yield sse({"type": "meta", "key": key, "value": value})
+                elif kind == "question":
+                    question_count += 1
+                    yield sse({"type": "question", "question": payload})
+                    # 提示词要求 8-12 题，按已生成题数估算进度
+                    yield sse({
+                        "type": "progress",
+                        "progress": min(70 + question_count * 2, 95),
+                        "message": f"已生成 {question_count} 个问题..."
+                    })
+                elif kind == "complete":
+                    generated_survey = payload
             
-            # 如果重试后还是失败
             if not generated_survey:
-                raise Exception("网络连接不稳定，已重试3次仍然失败，请稍后再试")
+                raise ValueError("问卷生成未返回结果")
             
             print(f"\n[OK] Survey generated successfully, {len(generated_survey.get('questions', []))} questions")
             
             # 验证生成的问卷是否有效
-            if not generated_survey:
-                raise ValueError("生成的问卷为空")
             if not generated_survey.get('questions'):
                 raise ValueError("生成的问卷没有包含任何问题")
             
@@ -453,29 +481,12 @@ async def generate_survey_api(request: dict):
             except UnicodeEncodeError:
                 print("[ERROR] Error details (Unicode encoding issue)")
             
-            # 提供更友好的错误提示
-            error_msg = str(e)
-            error_msg_lower = error_msg.lower()
-            
-            if "Connection" in error_msg or "10054" in error_msg or "远程主机" in error_msg:
-                user_msg = "网络连接失败，请检查网络连接或稍后重试"
-            elif "API key" in error_msg_lower or "authentication" in error_msg_lower:
-                user_msg = "API Key 配置错误，请检查 .env 文件中的 DASHSCOPE_API_KEY"
-            elif "timeout" in error_msg_lower or "timed out" in error_msg_lower:
-                user_msg = "请求超时，请稍后重试或尝试更短的提示词"
-            elif "403" in error_msg or "AllocationQuota" in error_msg or "quota" in error_msg_lower:
-                # DashScope API配额限制
-                if "Free" in error_msg or "free" in error_msg_lower:
-                    user_msg = "API免费配额已用完。请前往阿里云DashScope控制台升级到付费套餐，或等待配额重置。\n\n解决方案：\n1. 访问 https://dashscope.console.aliyun.com/ 查看配额使用情况\n2. 升级到付费套餐以继续使用\n3. 免费配额通常每月重置，请稍后再试"
-                else:
-                    user_msg = "API配额已用完。请前往阿里云DashScope控制台查看配额使用情况并升级套餐。"
-            elif "429" in error_msg or "rate limit" in error_msg_lower:
-                user_msg = "API请求频率过高，请稍等片刻后重试"
-            elif "401" in error_msg or "unauthorized" in error_msg_lower:
-                user_msg = "API认证失败，请检查 .env 文件中的 DASHSCOPE_API_KEY 是否正确"
+            # 提供更友好的错误提示（LLM 调用失败按网关给出的错误类型区分）
+            if isinstance(e, LLMError):
+                user_msg = e.user_message
             else:
                 # 截取错误消息的前200个字符，避免消息过长
-                user_msg = f"生成问卷失败：{error_msg[:200]}"
+                user_msg = f"生成问卷失败：{str(e)[:200]}"
             
             # 使用JSON安全序列化，避免SSE行中出现未转义的换行或引号导致前端解析失败
             error_payload = {"type": "error", "message": user_msg}
@@ -526,7 +537,7 @@ async def register_api(request: RegisterRequest):
                 content={"success": False, "message": "密码长度至少为6位"}
             )
         
-        success = user_store.register(username, password, email if email else None)
+        success = await run_io(user_store.register, username, password, email if email else None)
         
         if success:
             return JSONResponse(content={"success": True, "message": "注册成功"})
@@ -601,8 +612,13 @@ async def logout_api(request: LogoutRequest):
 
 
 @app.get("/api/user/surveys")
-async def get_user_surveys_api(session_id: str = None):
-    """获取用户的问卷列表"""
+async def get_user_surveys_api(session_id: str = None, page: int = 1, page_size: int = 0):
+    """
+    获取用户的问卷列表
+    
+    回答数和最近回答时间来自答案存储维护的计数器，不遍历答案目录；
+    page_size > 0 时分页返回（page 从 1 开始），否则返回全部。
+    """
     if not session_id:
         raise HTTPException(status_code=401, detail="未登录")
     
@@ -611,10 +627,25 @@ async def get_user_surveys_api(session_id: str = None):
         raise HTTPException(status_code=401, detail="会话已过期，请重新登录")
     
     surveys = user_survey_manager.get_user_surveys(username)
+    total = len(surveys)
+    page = max(page, 1)
+    if page_size > 0:
+        surveys = surveys[(page - 1) * page_size:page * page_size]
+    
+    def attach_counts():
+        for survey in surveys:
+            summary = response_saver.get_response_summary(survey["survey_id"])
+            survey["response_count"] = summary["response_count"]
+            survey["last_response_at"] = summary["last_submitted_at"]
+    
+    await run_io(attach_counts)
     
     return JSONResponse(content={
         "success": True,
-        "surveys": surveys
+        "surveys": surveys,
+        "total": total,
+        "page": page,
+        "page_size": page_size or total
     })
 
 
@@ -630,40 +661,27 @@ async def delete_user_survey_api(survey_id: str, session_id: str = None):
     
     try:
         # 从用户问卷列表中删除
-        deleted = user_survey_manager.delete_survey(username, survey_id)
+        deleted = await run_io(user_survey_manager.delete_survey, username, survey_id)
         if not deleted:
             return JSONResponse(
                 status_code=404,
                 content={"success": False, "message": "问卷不存在或不属于当前用户"}
             )
         
-        # 删除问卷文件
-        from pathlib import Path
-        surveys_dir = Path("data/surveys")
-        
-        # 查找并删除问卷文件
-        survey_file = None
-        for file_path in surveys_dir.glob("*.json"):
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    survey_data = json.load(f)
-                    if survey_data.get("id") == survey_id:
-                        survey_file = file_path
-                        break
-            except Exception:
-                continue
-        
-        if survey_file and survey_file.exists():
-            survey_file.unlink()
+        def remove_survey_files():
+            # 删除问卷文件（通过注册表定位，并同步移除缓存和索引条目）
+            survey_cache.invalidate(survey_id)
+            entry = survey_registry.remove(survey_id)
+            if entry:
+                survey_file = Path(entry["path"])
+                if survey_file.exists():
+                    survey_file.unlink()
+            
+            # 删除回答数据
+            response_saver.delete_survey(survey_id)
+            survey_columns_cache.invalidate(survey_id)
         
-        # 删除回答数据目录
-        responses_dir = Path("data/responses")
-        if responses_dir.exists():
-            for item in responses_dir.iterdir():
-                if item.is_dir() and survey_id in item.name:
-                    import shutil
-                    shutil.rmtree(item)
-                    break
+        await run_io(remove_survey_files)
         
         return JSONResponse(content={
             "success": True,
@@ -715,17 +733,13 @@ async def save_survey_api(request: dict):
         survey_data["id"] = survey_id
         survey_data["created_at"] = datetime.now().isoformat()
         
-        # 保存到内存和文件
-        global surveys_storage
-        surveys_storage[survey_id] = survey_data
-        
         # 如果用户已登录，关联到用户
         if session_id:
             try:
                 username = session_manager.get_username(session_id)
                 if username:
                     survey_title = survey_data.get("title", "未命名问卷")
-                    user_survey_manager.add_survey(username, survey_id, survey_title)
+                    await run_io(user_survey_manager.add_survey, username, survey_id, survey_title)
             except Exception as user_error:
                 print(f"关联用户失败: {user_error}")
                 # 即使关联失败，仍然发布问卷
@@ -751,9 +765,14 @@ async def save_survey_api(request: dict):
             filename = f"{survey_id}.json"
         
         file_path = surveys_dir / filename
-        with open(file_path, 'w', encoding='utf-8') as f:
-            import json
-            json.dump(survey_data, f, ensure_ascii=False, indent=2)
+        
+        def write_and_register():
+            async_storage.write_json_atomic(file_path, survey_data)
+            # 登记到问卷注册表，并放入问卷缓存
+            survey_registry.register(survey_id, file_path, survey_data.get("title", ""))
+            survey_cache.put(survey_id, survey_data)
+        
+        await run_io(write_and_register)
         
         print(f"[发布问卷] 成功发布问卷: {survey_id}, 文件: {filename}")
         
@@ -788,31 +807,21 @@ async def submit_response_api(request: dict):
     
     if not survey_id or not answers:
         raise HTTPException(status_code=400, detail="Survey ID and answers are required")
+    if not isinstance(answers, dict):
+        raise HTTPException(status_code=400, detail="Answers must be an object")
     
-    # 获取问卷信息，以便在答案中包含问卷标题
+    # 获取问卷信息，以便在答案中包含问卷标题（读文件放到线程池，避免阻塞事件循环）
     survey_info = {}
     survey_name = None
     
-    # 查找问卷文件（可能包含标题作为前缀）
-    surveys_dir = Path("data/surveys")
-    survey_file = None
-    if surveys_dir.exists():
-        # 首先尝试直接查找 survey_id
-        survey_file = surveys_dir / f"{survey_id}.json"
-        if not survey_file.exists():
-            # 查找所有包含该survey_id的文件
-            for file_path in surveys_dir.glob(f"*_{survey_id}.json"):
-                survey_file = file_path
-                break
-    
-    if survey_file and survey_file.exists():
-        with open(survey_file, 'r', encoding='utf-8') as f:
-            survey_data = json.load(f)
-            survey_info = {
-                "title": survey_data.get("title", ""),
-                "description": survey_data.get("description", "")
-            }
-            survey_name = survey_data.get("title", "")
+    # 通过注册表查找问卷
+    survey_data = await run_io(survey_cache.get, survey_id)
+    if survey_data:
+        survey_info = {
+            "title": survey_data.get("title", ""),
+            "description": survey_data.get("description", "")
+        }
+        survey_name = survey_data.get("title", "")
     
     # 构建答案数据（包含问卷信息）
     response_data = {
@@ -822,8 +831,15 @@ async def submit_response_api(request: dict):
         "answers": answers
     }
     
-    # 保存答案（会自动添加user_id和问卷名称）
-    file_path = response_saver.save_response(survey_id, response_data, user_id, survey_name)
+    # 入队等待组提交落盘（会自动添加user_id和问卷名称）
+    try:
+        file_path = await ingestion_queue.submit(survey_id, response_data, user_id, survey_name)
+    except IngestionQueueFull as e:
+        return JSONResponse(
+            status_code=503,
+            headers={"Retry-After": str(e.retry_after)},
+            content={"success": False, "message": "提交人数较多，请稍后重试"}
+        )
     
     return JSONResponse(content={
         "message": "Response submitted successfully",
@@ -832,45 +848,50 @@ async def submit_response_api(request: dict):
     })
 
 
+@app.get("/api/ingestion/metrics")
+async def get_ingestion_metrics():
+    """答案提交队列指标：队列深度、批量大小、提交延迟"""
+    return JSONResponse(content=ingestion_queue.metrics())
+
+
+@app.get("/api/runtime/metrics")
+async def get_runtime_metrics():
+    """事件循环延迟（p50/p99/max）和存储线程池排队情况"""
+    return JSONResponse(content=loop_lag_monitor.metrics())
+
+
+@app.get("/api/semantic-cache/metrics")
+async def get_semantic_cache_metrics():
+    """问卷语义缓存指标：命中率、条目数、相似度阈值、节省的生成时间"""
+    if service is None or service.semantic_cache is None:
+        return JSONResponse(content={"enabled": False})
+    return JSONResponse(content=service.semantic_cache.metrics())
+
+
+@app.get("/api/llm-gateway/metrics")
+async def get_llm_gateway_metrics():
+    """LLM网关指标：各模型当前并发上限、速率、在途/排队调用数、重试和限流次数"""
+    return JSONResponse(content=llm_gateway.metrics())
+
+
+@app.get("/api/llm-cache/metrics")
+async def get_llm_cache_metrics():
+    """LLM响应缓存指标：命中率、条目数、占用字节数、节省的LLM调用时间"""
+    return JSONResponse(content=await run_io(llm_response_cache.metrics))
+
+
+@app.get("/api/survey-cache/metrics")
+async def get_survey_cache_metrics():
+    """问卷缓存指标：条目数、命中/未命中、淘汰、失效次数"""
+    return JSONResponse(content=survey_cache.metrics())
+
+
 @app.get("/api/survey/{survey_id}")
 async def get_survey_by_id(survey_id: str):
     """根据ID获取问卷"""
-    global surveys_storage
-    
-    if survey_id in surveys_storage:
-        return JSONResponse(content=surveys_storage[survey_id])
-    
-    # 从文件加载
-    from pathlib import Path
-    surveys_dir = Path("data/surveys")
-    
-    # 首先尝试直接查找 {survey_id}.json（向后兼容）
-    survey_file = surveys_dir / f"{survey_id}.json"
-    
-    # 如果不存在，查找包含该 survey_id 的文件
-    if not survey_file.exists():
-        for file_path in surveys_dir.glob(f"*_{survey_id}.json"):
-            survey_file = file_path
-            break
-    
-    # 如果还是找不到，尝试查找所有文件并匹配ID
-    if not survey_file.exists():
-        for file_path in surveys_dir.glob("*.json"):
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    temp_data = json.load(f)
-                    if temp_data.get("id") == survey_id:
-                        survey_file = file_path
-                        break
-            except:
-                continue
-    
-    if survey_file.exists():
-        with open(survey_file, 'r', encoding='utf-8') as f:
-            import json
-            survey_data = json.load(f)
-            surveys_storage[survey_id] = survey_data
-            return JSONResponse(content=survey_data)
+    survey_data = await run_io(survey_cache.get, survey_id)
+    if survey_data:
+        return JSONResponse(content=survey_data)
     
     raise HTTPException(status_code=404, detail="Survey not found")
 
@@ -878,119 +899,204 @@ async def get_survey_by_id(survey_id: str):
 @app.get("/api/survey/{survey_id}/stats")
 async def get_survey_stats(survey_id: str):
     """获取问卷统计数据"""
-    stats = response_saver.get_statistics(survey_id)
+    stats = await run_io(response_saver.get_statistics, survey_id)
     return JSONResponse(content=stats)
 
 
+@app.get("/api/survey/{survey_id}/crosstab")
+async def get_survey_crosstab(survey_id: str, row: str, col: str):
+    """
+    交叉分析 API：两个单选/多选/量表题之间的列联表
+
+    返回人数、行/列百分比、卡方检验和 Cramér's V；问卷的列式视图按答案集指纹缓存
+    """
+    try:
+        result = await run_compute(crosstab_survey, survey_id, row, col)
+    except FileNotFoundError as e:
+        return JSONResponse(status_code=404, content={"success": False, "message": str(e)})
+    except KeyError as e:
+        return JSONResponse(status_code=404, content={"success": False, "message": e.args[0]})
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"success": False, "message": str(e)})
+
+    return JSONResponse(content={"success": True, **result})
+
+
+@app.get("/api/survey/{survey_id}/correlations")
+async def get_survey_correlations(survey_id: str, target: str = None, heatmap: bool = True):
+    """
+    量表题相关分析 API
+
+    返回 Pearson/Spearman 相关矩阵、各题缺失率和两两同时作答人数、以及各题对总体满意度题（target，默认按标题识别）
+    的关键驱动因素排序；heatmap=true 时附带相关矩阵热力图（base64）
+    """
+    try:
+        result = await run_compute(scale_correlations, survey_id, target, heatmap)
+    except FileNotFoundError as e:
+        return JSONResponse(status_code=404, content={"success": False, "message": str(e)})
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"success": False, "message": str(e)})
+
+    return JSONResponse(content={"success": True, **result})
+
+
 @app.post("/api/analyze/{survey_id}")
 async def analyze_survey_results(survey_id: str, request: FastAPIRequest):
-    """分析问卷结果 API - 支持开放题分析和全量分析两种模式"""
+    """
+    提交分析任务 API - 支持开放题分析和全量分析两种模式
+    
+    分析在后台任务池中执行，立即返回 job_id；
+    进度通过 GET /api/analyze/jobs/{job_id}/events（SSE）推送，结果通过 GET /api/analyze/jobs/{job_id} 获取；
+    问卷和答案集未变化时直接复用已保存的结果，force=true 强制重新分析
+    """
     try:
         # 获取请求体参数
         body = await request.json() if request.headers.get("content-type") == "application/json" else {}
         analysis_type = body.get("analysis_type", "open_ended")  # 默认仅开放题分析
+        force = bool(body.get("force", False))
         
-        print(f"\n[分析API] 开始分析问卷: {survey_id}, 分析类型: {analysis_type}")
-        
-        if analysis_type == "full":
-            # 全量分析模式
-            from app.services.full_analysis_service import FullAnalysisService
-            from app.services.analysis_engine import SurveyAnalysisEngine
-            
-            # 使用SurveyAnalysisEngine加载数据
-            engine = SurveyAnalysisEngine(llm_model="qwen-flash")
-            survey, responses = engine._load_data(survey_id)
-            
-            if not responses:
-                raise ValueError(f"问卷 {survey_id} 没有找到回答数据")
-            
-            # 执行全量分析
-            full_analyzer = FullAnalysisService(llm_model="qwen-flash", temperature=0.3)
-            full_analysis_result = full_analyzer.analyze_full_survey(survey, responses)
-            
-            result = {
-                "survey_id": survey_id,
-                "survey_title": survey.get("title", ""),
-                "total_responses": len(responses),
-                "analysis_type": "全量分析",
-                "status": "success",
-                "report_markdown": full_analysis_result["report_markdown"],
-                "visualizations": full_analysis_result.get("visualizations", {}),
-                "is_complete": full_analysis_result.get("is_complete", True)
-            }
-        else:
-            # 仅开放题分析模式（原有逻辑）
-            from app.services.analysis_engine import SurveyAnalysisEngine
-            
-            analyzer = SurveyAnalysisEngine(
-                llm_model="qwen-flash",
-                temperature=0.7
+        survey_data = await run_io(survey_cache.get, survey_id)
+        if not survey_data:
+            return JSONResponse(
+                status_code=404,
+                content={"success": False, "message": f"问卷不存在: {survey_id}"}
             )
-            
-            result = analyzer.analyze(survey_id)
-        
-        # 保存结果
-        from pathlib import Path
-        analyses_dir = Path("data/analyses")
-        analyses_dir.mkdir(parents=True, exist_ok=True)
-        analysis_file = analyses_dir / f"analysis_{survey_id}_{analysis_type}.json"
-        with open(analysis_file, 'w', encoding='utf-8') as f:
-            json.dump(result, f, ensure_ascii=False, indent=2)
         
-        print(f"[分析API] 分析完成，结果已保存")
+        job = analysis_jobs.submit(survey_id, analysis_type, force=force)
+        print(f"\n[分析API] 已提交分析任务: {job.job_id}, 问卷: {survey_id}, 分析类型: {analysis_type}, 强制: {force}")
         
-        return JSONResponse(content={
+        return JSONResponse(status_code=202, content={
             "success": True,
-            "survey_id": survey_id,
-            **result
+            **job.to_dict()
         })
         
-    except FileNotFoundError as e:
-        error_msg = f"问卷不存在或未找到回答数据: {str(e)}"
-        print(f"[分析API] 错误: {error_msg}")
+    except ValueError as e:
+        return JSONResponse(
+            status_code=400,
+            content={"success": False, "message": str(e)}
+        )
+    except AnalysisQueueFull as e:
+        return JSONResponse(
+            status_code=503,
+            headers={"Retry-After": "30"},
+            content={"success": False, "message": str(e)}
+        )
+
+
+@app.get("/api/analyze/jobs/{job_id}")
+async def get_analysis_job(job_id: str):
+    """获取分析任务状态；完成后返回与原同步接口相同格式的分析结果"""
+    job = analysis_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="分析任务不存在或已过期")
+    
+    if job.status == "failed":
+        return JSONResponse(
+            status_code=job.error_code,
+            content={"success": False, "message": job.error, **job.to_dict()}
+        )
+    
+    content = {"success": True, **job.to_dict()}
+    if job.result is not None:
+        content.update(job.result)
+        content["status"] = job.result.get("status", "success")
+        content["job_status"] = job.status
+    return JSONResponse(content=content)
+
+
+@app.get("/api/analyze/jobs/{job_id}/events")
+async def stream_analysis_job_events(job_id: str, request: FastAPIRequest):
+    """以 SSE 推送分析任务的阶段事件（load/stats/qualitative/charts/llm_report/done/failed）"""
+    from fastapi.responses import StreamingResponse
+    
+    job = analysis_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="分析任务不存在或已过期")
+    
+    async def event_stream():
+        changed = job.subscribe()
+        sent = 0
+        try:
+            while True:
+                changed.clear()
+                events = job.events[sent:]
+                for event in events:
+                    yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+                sent += len(events)
+                if job.finished and sent >= len(job.events):
+                    break
+                if await request.is_disconnected():
+                    # 客户端断开只结束推送，任务继续执行
+                    break
+                try:
+                    await asyncio.wait_for(changed.wait(), timeout=15)
+                except asyncio.TimeoutError:
+                    # 心跳，防止代理断开空闲连接
+                    yield ": keep-alive\n\n"
+        finally:
+            job.unsubscribe(changed)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/api/analyze/metrics")
+async def get_analysis_metrics():
+    """分析任务池指标：并发上限、排队/运行/完成/失败任务数，结果缓存命中率，以及统计接口的列式视图缓存"""
+    return JSONResponse(content={
+        **analysis_jobs.metrics(),
+        "result_cache": analysis_cache.metrics(),
+        "columns_cache": survey_columns_cache.metrics()
+    })
+
+
+@app.get("/api/analyze/{survey_id}/result")
+async def get_cached_analysis(survey_id: str, analysis_type: str = "open_ended"):
+    """
+    获取已保存的分析结果（不触发分析）
+    
+    stale=true 表示结果生成后问卷或答案已变化，需要重新分析才能反映最新数据
+    """
+    if analysis_type not in ANALYSIS_TYPES:
+        return JSONResponse(
+            status_code=400,
+            content={"success": False, "message": f"不支持的分析类型: {analysis_type}"}
+        )
+    
+    survey_data = await run_io(survey_cache.get, survey_id)
+    if not survey_data:
         return JSONResponse(
             status_code=404,
-            content={"success": False, "message": error_msg}
+            content={"success": False, "message": f"问卷不存在: {survey_id}"}
         )
-    except Exception as e:
-        import traceback
-        error_trace = traceback.format_exc()
-        error_msg = f"分析失败: {str(e)}"
-        print(f"[分析API] 错误: {error_msg}")
-        print(f"[分析API] 错误堆栈:\n{error_trace}")
+    
+    result = await run_io(analysis_cache.load, survey_id, analysis_type)
+    if result is None:
         return JSONResponse(
-            status_code=500,
-            content={"success": False, "message": error_msg}
+            status_code=404,
+            content={"success": False, "message": "该问卷尚未进行过此类分析"}
         )
+    
+    fingerprint = await run_io(survey_fingerprint, survey_id, survey_data, analysis_type, "qwen-flash")
+    return JSONResponse(content={
+        **result,
+        "success": True,
+        "stale": result.get("fingerprint") != fingerprint
+    })
 
 
 @app.get("/survey/{survey_id}", response_class=HTMLResponse)
 async def survey_detail_page(survey_id: str, action: str = None):
     """问卷详情页面"""
     try:
-        # 加载问卷数据
-        from pathlib import Path
-        surveys_dir = Path("data/surveys")
-        
-        # 查找问卷文件
-        survey_file = None
-        for file_path in surveys_dir.glob("*.json"):
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    survey_data = json.load(f)
-                    if survey_data.get("id") == survey_id:
-                        survey_file = file_path
-                        break
-            except Exception:
-                continue
-        
-        if not survey_file or not survey_file.exists():
+        # 通过问卷缓存加载问卷数据
+        survey_data = await run_io(survey_cache.get, survey_id)
+        if not survey_data:
             return HTMLResponse(content="<h1>问卷不存在</h1><p>找不到指定的问卷</p>", status_code=404)
         
-        # 读取问卷数据
-        with open(survey_file, 'r', encoding='utf-8') as f:
-            survey_data = json.load(f)
-        
         # 根据action参数返回不同页面
         if action == "analyze":
             # 分析页面
@@ -1006,37 +1112,11 @@ async def survey_detail_page(survey_id: str, action: str = None):
 @app.get("/fill/{survey_id}", response_class=HTMLResponse)
 async def fill_survey_page(survey_id: str):
     """独立的问卷填写页面"""
-    # 加载问卷数据
-    from pathlib import Path
-    surveys_dir = Path("data/surveys")
-    
-    # 首先尝试直接查找 {survey_id}.json（向后兼容）
-    survey_file = surveys_dir / f"{survey_id}.json"
-    
-    # 如果不存在，查找包含该 survey_id 的文件
-    if not survey_file.exists():
-        for file_path in surveys_dir.glob(f"*_{survey_id}.json"):
-            survey_file = file_path
-            break
-    
-    # 如果还是找不到，尝试查找所有文件并匹配ID
-    if not survey_file.exists():
-        for file_path in surveys_dir.glob("*.json"):
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    temp_data = json.load(f)
-                    if temp_data.get("id") == survey_id:
-                        survey_file = file_path
-                        break
-            except:
-                continue
-    
-    if not survey_file.exists():
+    # 通过问卷缓存加载问卷数据
+    survey_data = await run_io(survey_cache.get, survey_id)
+    if not survey_data:
         return HTMLResponse(content="<h1>问卷不存在</h1>", status_code=404)
     
-    with open(survey_file, 'r', encoding='utf-8') as f:
-        survey_data = json.load(f)
-    
     # 生成填写页面HTML
     html_content = f"""
     <!DOCTYPE html>
@@ -1689,6 +1769,8 @@ def get_analysis_page_html(survey_data):
                 const startBtn = document.getElementById('startAnalysisBtn');
                 const statusInfo = document.getElementById('statusInfo');
                 const resultsDiv = document.getElementById('analysisResults');
+                // 已显示过结果后再点击按钮即为"重新分析"，忽略结果缓存
+                let hasResult = false;
                 
                 // 绑定开始分析按钮
                 startBtn.addEventListener('click', async function() {{
@@ -1732,18 +1814,25 @@ def get_analysis_page_html(survey_data):
                     }}
                     
                     try {{
-                        // 调用分析API
+                        // 提交分析任务
                         const response = await fetch(`/api/analyze/${{surveyId}}`, {{
                             method: 'POST',
                             headers: {{
                                 'Content-Type': 'application/json'
                             }},
                             body: JSON.stringify({{
-                                analysis_type: analysisType
+                                analysis_type: analysisType,
+                                force: hasResult
                             }})
                         }});
                         
-                        const data = await response.json();
+                        const job = await response.json();
+                        if (!job.success) {{
+                            throw new Error(job.message || '提交分析任务失败');
+                        }}
+                        
+                        // 等待任务完成（SSE推送阶段进度）
+                        const data = await waitForAnalysisJob(job.job_id);
                         
                         if (data.success) {{
                             // 显示分析结果
@@ -1752,9 +1841,10 @@ def get_analysis_page_html(survey_data):
                             }} else {{
                                 displayAnalysisResults(data);
                             }}
+                            hasResult = true;
                             startBtn.disabled = false;
                             startBtn.textContent = '🔄 重新分析';
-                            statusInfo.textContent = '分析完成';
+                            statusInfo.textContent = data.cached ? '分析完成（答案未变化，使用已保存的结果）' : '分析完成';
                             statusInfo.style.color = '#4caf50';
                         }} else {{
                             throw new Error(data.message || '分析失败');
@@ -1776,6 +1866,58 @@ def get_analysis_page_html(survey_data):
                     }}
                 }});
                 
+                // 订阅分析任务进度，完成后获取结果；SSE不可用时退回轮询
+                function waitForAnalysisJob(jobId) {{
+                    const fetchResult = async () => {{
+                        const res = await fetch(`/api/analyze/jobs/${{jobId}}`);
+                        return res.json();
+                    }};
+                    
+                    return new Promise((resolve, reject) => {{
+                        let settled = false;
+                        const finish = (promise) => {{
+                            if (settled) return;
+                            settled = true;
+                            promise.then(resolve, reject);
+                        }};
+                        
+                        const poll = async () => {{
+                            try {{
+                                const data = await fetchResult();
+                                if (!data.success || data.job_status === 'succeeded') {{
+                                    finish(Promise.resolve(data));
+                                }} else {{
+                                    setTimeout(poll, 3000);
+                                }}
+                            }} catch (e) {{
+                                setTimeout(poll, 3000);
+                            }}
+                        }};
+                        
+                        if (!window.EventSource) {{
+                            poll();
+                            return;
+                        }}
+                        
+                        const source = new EventSource(`/api/analyze/jobs/${{jobId}}/events`);
+                        source.onmessage = (e) => {{
+                            const event = JSON.parse(e.data);
+                            statusInfo.textContent = event.message;
+                            const stageText = resultsDiv.querySelector('.loading-analysis p');
+                            if (stageText) stageText.textContent = '⏳ ' + event.message;
+                            if (event.stage === 'done' || event.stage === 'failed') {{
+                                source.close();
+                                finish(fetchResult());
+                            }}
+                        }};
+                        source.onerror = () => {{
+                            // 连接中断：任务仍在后台执行，改为轮询结果
+                            source.close();
+                            if (!settled) poll();
+                        }};
+                    }});
+                }}
+                
                 // 显示分析结果
                 function displayAnalysisResults(data) {{
                     const report = data.report;
@@ -2079,7 +2221,11 @@ def main():
         service = SurveyService(
             llm_model="qwen-max",  # 主模型用于需求分析
             temperature=0.7,
-            retrieval_k=3
+            retrieval_k=3,
+            # 相同需求（忽略空白和标点）复用已生成的扩写和问卷
+            cache_responses=os.getenv("LLM_CACHE_ENABLED", "false").lower() == "true",
+            # 语义相近的需求复用已生成的问卷（按用户隔离，知识库更新后失效）
+            semantic_cache=os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
         )
         
         print("[OK] Service initialized successfully!")
@@ -2155,54 +2301,21 @@ async def upload_rag_material(file: UploadFile = File(...)):
         
         # 如果文件已存在，添加时间戳
         file_path = materials_dir / safe_filename
-        if file_path.exists():
+        if await run_io(file_path.exists):
             name_part = file_path.stem
             ext_part = file_path.suffix
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             safe_filename = f"{name_part}_{timestamp}{ext_part}"
             file_path = materials_dir / safe_filename
         
-        # 保存文件
-        with open(file_path, 'wb') as f:
-            shutil.copyfileobj(file.file, f)
-        
-        file_size = file_path.stat().st_size
+        # 保存文件（拷贝放到存储线程池，避免大文件阻塞事件循环）
+        file_size = await async_storage.save_upload(file.file, file_path)
         
         print(f"[上传] 文件已保存: {safe_filename} ({file_size / 1024 / 1024:.2f} MB)")
         
-        # 自动更新向量数据库
+        # 自动更新向量数据库（PDF解析、向量化和索引更新都是阻塞调用，放到线程池）
         try:
-            from app.core.vector_store import SurveyVectorStore
-            
-            vector_store = SurveyVectorStore(
-                persist_directory="./data/chroma_db",
-                collection_name="exemplary_surveys"
-            )
-            
-            # 尝试加载现有向量存储
-            try:
-                vector_store.create_vector_store()
-                is_new = False
-            except:
-                is_new = True
-            
-            # 加载并处理PDF（已经切分）
-            documents = vector_store.load_and_split_pdf(str(file_path))
-            
-            if is_new:
-                # 创建新的向量存储
-                vector_store.create_vector_store(documents)
-                vector_store.persist()
-                print(f"[向量化] 向量数据库已创建，包含 {len(documents)} 个文档块")
-            else:
-                # 添加到现有向量存储（文档已经切分，直接添加）
-                vector_store.vector_store.add_documents(documents)
-                vector_store.persist()
-                print(f"[向量化] 已添加到向量数据库，包含 {len(documents)} 个文档块")
-            
-            # 更新索引文件
-            update_rag_index(safe_filename, file_path)
-            
+            documents = await run_compute(vectorize_rag_material, safe_filename, file_path)
         except Exception as e:
             print(f"[警告] 向量数据库更新失败: {e}")
             # 文件已保存，但向量化失败，返回警告而不是错误
@@ -2232,79 +2345,120 @@ async def upload_rag_material(file: UploadFile = File(...)):
         )
 
 
+def vectorize_rag_material(filename: str, file_path: Path) -> list:
+    """解析PDF并加入向量数据库，返回文档块列表（阻塞，在线程池中调用）"""
+    from app.core.vector_store import SurveyVectorStore
+    
+    vector_store = SurveyVectorStore(
+        persist_directory="./data/chroma_db",
+        collection_name="exemplary_surveys"
+    )
+    
+    # 尝试加载现有向量存储
+    try:
+        vector_store.create_vector_store()
+        is_new = False
+    except:
+        is_new = True
+    
+    # 加载并处理PDF（已经切分）
+    documents = vector_store.load_and_split_pdf(str(file_path))
+    
+    if is_new:
+        # 创建新的向量存储
+        vector_store.create_vector_store(documents)
+        vector_store.persist()
+        print(f"[向量化] 向量数据库已创建，包含 {len(documents)} 个文档块")
+    else:
+        # 添加到现有向量存储（文档已经切分，直接添加）
+        vector_store.vector_store.add_documents(documents)
+        vector_store.persist()
+        print(f"[向量化] 已添加到向量数据库，包含 {len(documents)} 个文档块")
+    
+    # 更新索引文件
+    update_rag_index(filename, file_path)
+    return documents
+
+
+# RAG索引的读取-修改-写入需要串行，否则并发上传时后写入的会丢掉先写入的条目
+_rag_index_lock = Lock()
+
+
 def update_rag_index(filename: str, file_path: Path):
     """更新RAG索引文件"""
     index_file = Path("rag_materials") / ".rag_index.json"
     
-    # 加载现有索引
+    # 计算文件哈希（不需要持有锁）
+    hash_value = async_storage.compute_file_md5(file_path)
+    stat = file_path.stat()
+    
+    with _rag_index_lock:
+        # 加载现有索引
+        if index_file.exists():
+            with open(index_file, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        else:
+            index = {}
+        
+        # 更新索引
+        index[filename] = {
+            "hash": hash_value,
+            "size": stat.st_size,
+            "modified": stat.st_mtime,
+            "processed_at": datetime.now().isoformat()
+        }
+        index["_last_updated"] = datetime.now().isoformat()
+        
+        # 保存索引
+        async_storage.write_json_atomic(index_file, index)
+
+
+def scan_rag_materials() -> list:
+    """读取RAG索引（没有索引时扫描文件夹），返回语料文件列表（阻塞，在线程池中调用）"""
+    materials_dir = Path("rag_materials")
+    index_file = materials_dir / ".rag_index.json"
+    
+    # 加载索引
+    materials = []
     if index_file.exists():
         with open(index_file, 'r', encoding='utf-8') as f:
             index = json.load(f)
+        
+        # 提取文件信息（排除内部字段）
+        for filename, info in index.items():
+            if filename.startswith('_'):
+                continue
+            
+            file_path = materials_dir / filename
+            if file_path.exists():
+                materials.append({
+                    "filename": filename,
+                    "size": info.get("size", file_path.stat().st_size),
+                    "processed_at": info.get("processed_at"),
+                    "modified": info.get("modified")
+                })
     else:
-        index = {}
-    
-    # 计算文件哈希
-    import hashlib
-    file_hash = hashlib.md5()
-    with open(file_path, 'rb') as f:
-        for chunk in iter(lambda: f.read(4096), b""):
-            file_hash.update(chunk)
-    hash_value = file_hash.hexdigest()
-    
-    # 更新索引
-    index[filename] = {
-        "hash": hash_value,
-        "size": file_path.stat().st_size,
-        "modified": file_path.stat().st_mtime,
-        "processed_at": datetime.now().isoformat()
-    }
-    index["_last_updated"] = datetime.now().isoformat()
+        # 如果没有索引，扫描文件夹
+        for pdf_file in materials_dir.glob("*.pdf"):
+            if pdf_file.is_file():
+                stat = pdf_file.stat()
+                materials.append({
+                    "filename": pdf_file.name,
+                    "size": stat.st_size,
+                    "processed_at": None,
+                    "modified": stat.st_mtime
+                })
     
-    # 保存索引
-    with open(index_file, 'w', encoding='utf-8') as f:
-        json.dump(index, f, ensure_ascii=False, indent=2)
+    # 按处理时间排序（最近处理的在前）
+    materials.sort(key=lambda x: x.get("processed_at") or "", reverse=True)
+    return materials
 
 
 @app.get("/api/rag-materials/list")
 async def list_rag_materials():
     """获取已上传的RAG语料文件列表"""
     try:
-        materials_dir = Path("rag_materials")
-        index_file = materials_dir / ".rag_index.json"
-        
-        # 加载索引
-        materials = []
-        if index_file.exists():
-            with open(index_file, 'r', encoding='utf-8') as f:
-                index = json.load(f)
-            
-            # 提取文件信息（排除内部字段）
-            for filename, info in index.items():
-                if filename.startswith('_'):
-                    continue
-                
-                file_path = materials_dir / filename
-                if file_path.exists():
-                    materials.append({
-                        "filename": filename,
-                        "size": info.get("size", file_path.stat().st_size),
-                        "processed_at": info.get("processed_at"),
-                        "modified": info.get("modified")
-                    })
-        else:
-            # 如果没有索引，扫描文件夹
-            for pdf_file in materials_dir.glob("*.pdf"):
-                if pdf_file.is_file():
-                    stat = pdf_file.stat()
-                    materials.append({
-                        "filename": pdf_file.name,
-                        "size": stat.st_size,
-                        "processed_at": None,
-                        "modified": stat.st_mtime
-                    })
-        
-        # 按处理时间排序（最近处理的在前）
-        materials.sort(key=lambda x: x.get("processed_at") or "", reverse=True)
+        materials = await run_io(scan_rag_materials)
         
         return JSONResponse(content={
             "success": True,
@@ -2327,14 +2481,16 @@ async def get_rag_status():
     try:
         from app.core.vector_store import SurveyVectorStore
         
-        vector_store = SurveyVectorStore(
-            persist_directory="./data/chroma_db",
-            collection_name="exemplary_surveys"
-        )
+        def load_vector_stats():
+            vector_store = SurveyVectorStore(
+                persist_directory="./data/chroma_db",
+                collection_name="exemplary_surveys"
+            )
+            vector_store.create_vector_store()
+            return vector_store.get_stats()
         
         try:
-            vector_store.create_vector_store()
-            stats = vector_store.get_stats()
+            stats = await run_io(load_vector_stats)
             
             return JSONResponse(content={
                 "success": True,
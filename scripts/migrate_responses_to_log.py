@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+答案存储迁移脚本
+
+将 data/responses/ 下"一份答案一个JSON文件"的旧目录一次性迁移为追加式分段日志
+迁移后需在 .env 中设置 RESPONSE_STORAGE_MODE=log
+
+使用：
+    python scripts/migrate_responses_to_log.py              # 迁移并把原文件移到备份目录
+    python scripts/migrate_responses_to_log.py --dry-run    # 只统计，不写入
+    python scripts/migrate_responses_to_log.py --no-backup  # 迁移后直接删除原文件
+"""
+
+import argparse
+import json
+import shutil
+import sys
+from pathlib import Path
+
+# Windows终端编码修复
+if sys.platform == 'win32':
+    try:
+        sys.stdout.reconfigure(encoding='utf-8')
+        sys.stderr.reconfigure(encoding='utf-8')
+    except:
+        pass
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.utils.response_log import ResponseLog
+
+
+BATCH_SIZE = 1000
+
+
+def migrate_directory(log: ResponseLog, survey_dir: Path, backup_root: Path, dry_run: bool) -> int:
+    """
+    迁移单个问卷目录
+
+    按文件名（时间戳开头）排序后分批追加到日志，整目录写入并落盘后才移走原文件，
+    中途失败时原文件保持不动，可以安全重跑。
+
+    Returns:
+        迁移的答案数量
+    """
+    files = sorted(survey_dir.glob("*.json"))
+    if not files:
+        return 0
+    if dry_run:
+        return len(files)
+
+    before = log.count(survey_dir)
+    batch = []
+    for file_path in files:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            batch.append(json.load(f))
+        if len(batch) >= BATCH_SIZE:
+            log.append_many(survey_dir, batch, fsync=True)
+            batch = []
+    if batch:
+        log.append_many(survey_dir, batch, fsync=True)
+    log.flush_index(survey_dir)
+
+    migrated = log.count(survey_dir) - before
+    if migrated != len(files):
+        raise RuntimeError(f"写入数量不一致：文件 {len(files)} 份，日志新增 {migrated} 条")
+
+    if backup_root:
+        target = backup_root / survey_dir.name
+        target.mkdir(parents=True, exist_ok=True)
+        for file_path in files:
+            shutil.move(str(file_path), str(target / file_path.name))
+    else:
+        for file_path in files:
+            file_path.unlink()
+
+    return migrated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="将单文件答案迁移为分段日志")
+    parser.add_argument("--responses-dir", default="data/responses", help="答案根目录")
+    parser.add_argument("--backup-dir", default="data/responses_backup", help="原文件备份目录")
+    parser.add_argument("--no-backup", action="store_true", help="迁移后直接删除原文件")
+    parser.add_argument("--dry-run", action="store_true", help="只统计待迁移数量")
+    args = parser.parse_args()
+
+    responses_dir = Path(args.responses_dir)
+    if not responses_dir.exists():
+        print(f"答案目录不存在: {responses_dir}")
+        return 1
+
+    backup_root = None if args.no_backup else Path(args.backup_dir)
+    log = ResponseLog()
+
+    print("=" * 60)
+    print("答案存储迁移：单文件 -> 分段日志")
+    print("=" * 60)
+
+    total = 0
+    failed = []
+    for survey_dir in sorted(responses_dir.iterdir()):
+        if not survey_dir.is_dir():
+            continue
+        try:
+            count = migrate_directory(log, survey_dir, backup_root, args.dry_run)
+        except Exception as e:
+            print(f"  ✗ {survey_dir.name}: {e}")
+            failed.append(survey_dir.name)
+            continue
+        if count:
+            action = "待迁移" if args.dry_run else "已迁移"
+            print(f"  ✓ {survey_dir.name}: {action} {count} 份答案")
+        total += count
+
+    print("\n" + "=" * 60)
+    print(f"{'待迁移' if args.dry_run else '已迁移'}答案总数: {total}")
+    if failed:
+        print(f"失败目录: {len(failed)} 个（原文件未改动，可修复后重跑）")
+        return 1
+    if not args.dry_run and total:
+        print("请在 .env 中设置 RESPONSE_STORAGE_MODE=log 后重启服务")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
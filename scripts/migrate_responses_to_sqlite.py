@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+答案存储迁移脚本（文件布局 -> SQLite）
+
+将 data/responses/ 下的单文件答案和分段日志导入 SQLite 数据库，原文件保持不动
+迁移后需在 .env 中设置 RESPONSE_STORAGE_MODE=sqlite
+
+使用：
+    python scripts/migrate_responses_to_sqlite.py              # 导入到 data/responses.db
+    python scripts/migrate_responses_to_sqlite.py --dry-run    # 只统计，不写入
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Windows终端编码修复
+if sys.platform == 'win32':
+    try:
+        sys.stdout.reconfigure(encoding='utf-8')
+        sys.stderr.reconfigure(encoding='utf-8')
+    except:
+        pass
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.utils.response_saver import ResponseSaver
+from app.utils.response_sqlite import SQLiteResponseStore
+
+
+BATCH_SIZE = 1000
+
+
+def survey_id_from_dir(survey_dir: Path) -> str:
+    """目录名为 {问卷名称}_{survey_id} 或 {survey_id}"""
+    return survey_dir.name.rsplit("_", 1)[-1]
+
+
+def migrate_directory(saver: ResponseSaver, store: SQLiteResponseStore, survey_dir: Path, dry_run: bool) -> int:
+    """
+    导入单个问卷目录
+
+    目标库中已有该问卷的答案时跳过，避免重复导入；中途失败时清掉已导入的部分，可以安全重跑。
+
+    Returns:
+        导入的答案数量
+    """
+    survey_id = survey_id_from_dir(survey_dir)
+    total = saver.count_directory(survey_dir)
+    if not total or dry_run:
+        return total
+    if store.count_responses(survey_id):
+        print(f"  - {survey_dir.name}: 数据库中已有答案，跳过")
+        return 0
+
+    try:
+        batch = []
+        for response in saver.iter_directory(survey_dir):
+            batch.append({
+                "survey_id": survey_id,
+                "response_data": response,
+                "user_id": response.get("user_id")
+            })
+            if len(batch) >= BATCH_SIZE:
+                store.save_responses_batch(batch, fsync=False)
+                batch = []
+        store.save_responses_batch(batch, fsync=True)
+
+        migrated = store.count_responses(survey_id)
+        if migrated != total:
+            raise RuntimeError(f"写入数量不一致：原有 {total} 份，数据库 {migrated} 条")
+    except Exception:
+        store.delete_survey(survey_id)
+        raise
+    return migrated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="将文件布局的答案导入 SQLite")
+    parser.add_argument("--responses-dir", default="data/responses", help="答案根目录")
+    parser.add_argument("--db-path", default="data/responses.db", help="SQLite 数据库路径")
+    parser.add_argument("--dry-run", action="store_true", help="只统计待迁移数量")
+    args = parser.parse_args()
+
+    responses_dir = Path(args.responses_dir)
+    if not responses_dir.exists():
+        print(f"答案目录不存在: {responses_dir}")
+        return 1
+
+    saver = ResponseSaver(base_dir=args.responses_dir)
+    store = SQLiteResponseStore(args.db_path)
+
+    print("=" * 60)
+    print("答案存储迁移：文件布局 -> SQLite")
+    print("=" * 60)
+
+    total = 0
+    failed = []
+    for survey_dir in sorted(responses_dir.iterdir()):
+        if not survey_dir.is_dir():
+            continue
+        try:
+            count = migrate_directory(saver, store, survey_dir, args.dry_run)
+        except Exception as e:
+            print(f"  ✗ {survey_dir.name}: {e}")
+            failed.append(survey_dir.name)
+            continue
+        if count:
+            action = "待迁移" if args.dry_run else "已迁移"
+            print(f"  ✓ {survey_dir.name}: {action} {count} 份答案")
+        total += count
+
+    store.close()
+    print("\n" + "=" * 60)
+    print(f"{'待迁移' if args.dry_run else '已迁移'}答案总数: {total}")
+    if failed:
+        print(f"失败目录: {len(failed)} 个")
+        return 1
+    if not args.dry_run and total:
+        print("请在 .env 中设置 RESPONSE_STORAGE_MODE=sqlite 后重启服务")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+问卷统计检查点校验/重建脚本
+
+统计接口读取的是保存答案时增量维护的聚合检查点（答案目录下的 stats.ckpt）。
+本脚本用全部答案重新计算统计，与检查点比对或直接覆盖。
+
+使用：
+    python scripts/rebuild_response_stats.py --verify         # 只校验，不一致时返回非零
+    python scripts/rebuild_response_stats.py                  # 重建所有问卷的检查点
+    python scripts/rebuild_response_stats.py <目录名> ...      # 只处理指定的答案目录
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Windows终端编码修复
+if sys.platform == 'win32':
+    try:
+        sys.stdout.reconfigure(encoding='utf-8')
+        sys.stderr.reconfigure(encoding='utf-8')
+    except:
+        pass
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.utils.response_saver import ResponseSaver
+
+
+def main():
+    parser = argparse.ArgumentParser(description="校验或重建问卷统计检查点")
+    parser.add_argument("dirs", nargs="*", help="答案目录名（默认处理全部）")
+    parser.add_argument("--responses-dir", default="data/responses", help="答案根目录")
+    parser.add_argument("--verify", action="store_true", help="只校验，不写入")
+    args = parser.parse_args()
+
+    saver = ResponseSaver(base_dir=args.responses_dir)
+    if args.dirs:
+        survey_dirs = [saver.base_dir / name for name in args.dirs]
+    else:
+        survey_dirs = sorted(p for p in saver.base_dir.iterdir() if p.is_dir())
+
+    mismatched = []
+    for survey_dir in survey_dirs:
+        if not survey_dir.exists():
+            print(f"  ✗ {survey_dir.name}: 目录不存在")
+            mismatched.append(survey_dir.name)
+            continue
+        if args.verify:
+            if saver.verify_statistics(survey_dir):
+                print(f"  ✓ {survey_dir.name}: 一致")
+            else:
+                print(f"  ✗ {survey_dir.name}: 检查点缺失或与答案不一致")
+                mismatched.append(survey_dir.name)
+        else:
+            aggregate = saver.rebuild_statistics(survey_dir)
+            print(f"  ✓ {survey_dir.name}: 已重建（{aggregate.response_count} 份答案）")
+
+    if mismatched:
+        print(f"\n{len(mismatched)} 个目录需要处理，可去掉 --verify 重建")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
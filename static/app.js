@@ -26,6 +26,9 @@ async function generateSurvey() {
         thinkingMessages.innerHTML = '';
     }
     
+    // 清空流式生成的问题预览
+    resetStreamingPreview();
+    
     // 初始化进度条
     updateProgress(0, '准备开始');
     
@@ -33,7 +36,11 @@ async function generateSurvey() {
         const response = await fetch('/api/generate', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ prompt: surveyPrompt.value.trim() })
+            // 带上会话，服务端按用户隔离问卷语义缓存
+            body: JSON.stringify({
+                prompt: surveyPrompt.value.trim(),
+                session_id: localStorage.getItem('session_id')
+            })
         });
         
         if (!response.ok) {
@@ -93,6 +100,12 @@ async function generateSurvey() {
                             showThinkingMessage(data.message);
                             // 思考过程中也逐步增加进度
                             incrementProgress();
+                        } else if (data.type === 'meta') {
+                            // 问卷标题等字段生成完成
+                            showStreamingMeta(data.key, data.value);
+                        } else if (data.type === 'question') {
+                            // 单个问题生成完成，立即显示
+                            appendStreamingQuestion(data.question);
                         } else if (data.type === 'complete') {
                             if (data.survey) {
                                 survey = data.survey;
@@ -217,6 +230,40 @@ function incrementProgress() {
     }
 }
 
+// 清空流式生成的问题预览
+function resetStreamingPreview() {
+    const streamingPreview = document.getElementById('streamingPreview');
+    const streamingQuestions = document.getElementById('streamingQuestions');
+    const streamingTitle = document.getElementById('streamingTitle');
+    if (streamingPreview) streamingPreview.style.display = 'none';
+    if (streamingQuestions) streamingQuestions.innerHTML = '';
+    if (streamingTitle) streamingTitle.textContent = '📝 已生成的问题';
+}
+
+// 显示流式生成的问卷字段（目前只显示标题）
+function showStreamingMeta(key, value) {
+    const streamingTitle = document.getElementById('streamingTitle');
+    if (key === 'title' && value && streamingTitle) {
+        streamingTitle.textContent = '📋 ' + value;
+        document.getElementById('streamingPreview').style.display = 'block';
+    }
+}
+
+// 追加一个流式生成的问题
+function appendStreamingQuestion(question) {
+    const streamingPreview = document.getElementById('streamingPreview');
+    const streamingQuestions = document.getElementById('streamingQuestions');
+    if (!streamingPreview || !streamingQuestions || !question) return;
+    
+    streamingPreview.style.display = 'block';
+    const displayNumber = streamingQuestions.children.length + 1;
+    streamingQuestions.insertAdjacentHTML(
+        'beforeend',
+        generateQuestionsPreview([{ ...question, displayNumber }])
+    );
+    streamingQuestions.lastElementChild.scrollIntoView({ behavior: 'smooth', block: 'nearest' });
+}
+
 // 生成问题预览HTML
 function generateQuestionsPreview(questions) {
     if (!questions || questions.length === 0) {
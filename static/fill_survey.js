@@ -423,7 +423,15 @@ function submitResponse() {
             user_id: userId
         })
     })
-    .then(response => response.json())
+    .then(response => {
+        if (!response.ok) {
+            // 503 表示提交队列繁忙，提示用户稍后重试
+            return response.json().catch(() => ({})).then(data => {
+                throw new Error(data.message || data.detail || `HTTP ${response.status}`);
+            });
+        }
+        return response.json();
+    })
     .then(data => {
         showNotification('答案已成功提交！感谢您的参与。', 'success');
         // 清空答案
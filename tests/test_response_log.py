@@ -0,0 +1,80 @@
+"""
+追加式分段答案日志测试
+运行: python -m pytest tests/test_response_log.py
+"""
+
+import multiprocessing
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.utils.response_log import ResponseLog
+
+
+def _record(i: int) -> dict:
+    return {"response_id": f"r{i}", "answers": {"q1": i}}
+
+
+def test_idle_tail_segments_are_sealed_and_compacted(tmp_path):
+    """低流量问卷：活动分段写不满，空闲封存后小分段被合并"""
+    survey_dir = tmp_path / "survey_1"
+    log = ResponseLog(seal_idle_seconds=0)
+    log.graveyard_seconds = 0
+
+    for batch in range(3):
+        log.append_many(survey_dir, [_record(batch * 1000 + i) for i in range(1000)])
+        assert log.seal_idle(survey_dir)
+
+    segments = log._snapshot(survey_dir)
+    assert len(segments) == 3 and all(seg["sealed"] for seg in segments)
+
+    assert log.compact_all(tmp_path) == 3
+    assert len(log._snapshot(survey_dir)) == 1
+    assert log.count(survey_dir) == 3000
+    assert [r["answers"]["q1"] for r in log.iter_records(survey_dir)] == list(range(3000))
+    assert [r["answers"]["q1"] for r in log.iter_records(survey_dir, start=2500)] == list(range(2500, 3000))
+
+    # 宽限期过后旧分段被删除，新的写入进入新的活动分段
+    log.compact_all(tmp_path)
+    assert len(list(survey_dir.glob("seg_*"))) == 1
+    log.append(survey_dir, _record(3000))
+    assert log.count(survey_dir) == 3001
+
+
+def test_active_segment_is_not_sealed_before_idle(tmp_path):
+    survey_dir = tmp_path / "survey_1"
+    log = ResponseLog(seal_idle_seconds=3600)
+    log.append_many(survey_dir, [_record(i) for i in range(10)])
+
+    assert not log.seal_idle(survey_dir)
+    assert log.compact_all(tmp_path) == 0
+
+
+def _append_worker(survey_dir: str, worker: int, batches: int):
+    log = ResponseLog(segment_max_records=700, seal_idle_seconds=0)
+    for batch in range(batches):
+        log.append_many(Path(survey_dir), [_record(worker * 100000 + batch * 10 + i) for i in range(10)])
+        if batch % 7 == 0:
+            log.compact_all(Path(survey_dir).parent)
+    log.flush_index()
+
+
+def test_concurrent_processes_do_not_lose_records(tmp_path):
+    """多个 worker 进程同时追加、封存和压缩同一问卷目录"""
+    survey_dir = tmp_path / "survey_1"
+    survey_dir.mkdir()
+    workers = [
+        multiprocessing.Process(target=_append_worker, args=(str(survey_dir), w, 40))
+        for w in range(4)
+    ]
+    for p in workers:
+        p.start()
+    for p in workers:
+        p.join()
+    assert all(p.exitcode == 0 for p in workers)
+
+    log = ResponseLog()
+    ids = [r["response_id"] for r in log.iter_records(survey_dir)]
+    assert len(ids) == len(set(ids)) == 4 * 40 * 10
+    assert log.count(survey_dir) == 1600